@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from app.core.profiling import list_profiles, profile_path
+from app.models.schemas import GuessResult, RoomProfileRequest
+from app.services.game_service import GameService
+
+# 仅在设置ENABLE_PROFILING时由app.main注册
+router = APIRouter(prefix="/api/admin")
+
+@router.post("/profile/room", response_model=GuessResult)
+async def profile_room(request: RoomProfileRequest):
+    """采集房间接下来N条上游消息的处理过程"""
+    client = GameService.active_clients.get(request.room_id)
+    if not client:
+        return GuessResult(success=False, message="没有找到指定房间的连接")
+    if not client.start_frame_profiling(request.frames):
+        return GuessResult(success=False, message="已有性能分析在进行中")
+    return GuessResult(success=True, message=f"将采集房间 {request.room_id} 接下来的 {request.frames} 条消息")
+
+@router.get("/profiles")
+async def get_profiles():
+    """列出已保存的性能分析结果"""
+    return {"profiles": list_profiles()}
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str):
+    """下载性能分析结果（pstats格式，可用snakeviz等工具查看）"""
+    path = profile_path(profile_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="找不到指定的性能分析结果")
+    return FileResponse(path, media_type="application/octet-stream", filename=profile_id)
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, HTTPException
-from app.models.schemas import RoomConnection, PlayerGuess, GuessResult, RecommendationResponse, ConstraintUpdate
+from fastapi import APIRouter, HTTPException, Request, Response
+from app.models.schemas import RoomConnection, PlayerGuess, GuessResult, StrategyUpdate, PacingResponse, PlayerSearchResponse, QueueStatsResponse, DatasetStatusResponse, RecommendationRequest, RecommendationResponse, ConstraintUpdate
 from app.services.game_service import GameService
 
 router = APIRouter(prefix="/api")
@@ -41,6 +41,48 @@ async def auto_guess(connection: RoomConnection):
     except Exception as e:
         return GuessResult(success=False, message=f"自动猜测过程中出错: {str(e)}")
 
+@router.post("/strategy", response_model=GuessResult)
+async def set_strategy(update: StrategyUpdate):
+    """设置房间的猜测排序策略"""
+    try:
+        result = await GameService.set_ranking_strategy(update.room_id, update.strategy)
+        return GuessResult(success=result["success"], message=result["message"])
+    except Exception as e:
+        return GuessResult(success=False, message=f"设置排序策略失败: {str(e)}")
+
+@router.get("/pacing/{room_id}", response_model=PacingResponse)
+async def get_pacing(room_id: str):
+    """获取房间自动猜测的自适应间隔"""
+    try:
+        return PacingResponse(success=True, pacing=GameService.get_pacing(room_id))
+    except HTTPException as e:
+        return PacingResponse(success=False, message=e.detail)
+
+@router.get("/queue/{room_id}", response_model=QueueStatsResponse)
+async def get_queue_stats(room_id: str):
+    """获取房间上游消息处理队列的深度和溢出统计"""
+    try:
+        return QueueStatsResponse(success=True, stats=GameService.get_queue_stats(room_id))
+    except HTTPException as e:
+        return QueueStatsResponse(success=False, message=e.detail)
+
+@router.get("/dataset", response_model=DatasetStatusResponse)
+async def get_dataset_status():
+    """获取当前玩家数据版本以及各房间本轮使用的版本"""
+    try:
+        return DatasetStatusResponse(success=True, dataset=GameService.get_dataset_status())
+    except Exception as e:
+        return DatasetStatusResponse(success=False, message=f"获取数据集状态失败: {str(e)}")
+
+@router.get("/players/search", response_model=PlayerSearchResponse)
+async def search_players(q: str = "", limit: int = 20, offset: int = 0):
+    """按昵称和姓名搜索全部玩家，支持分页"""
+    try:
+        result = GameService.search_players(q, limit=limit, offset=offset)
+        return PlayerSearchResponse(success=True, results=result['results'], total=result['total'])
+    except Exception as e:
+        return PlayerSearchResponse(success=False, message=f"搜索失败: {str(e)}")
+
 @router.post("/update-constraints", response_model=RecommendationResponse)
 async def update_constraints(constraint_update: ConstraintUpdate, connection: RoomConnection):
     """更新约束条件并获取新的推荐"""
@@ -67,16 +109,33 @@ async def player_ready(connection: RoomConnection):
         return GuessResult(success=False, message=f"准备失败: {str(e)}")
     
 @router.post("/recommendations", response_model=RecommendationResponse)
-async def get_recommendations(connection: RoomConnection):
-    """获取推荐玩家列表"""
+async def get_recommendations(query: RecommendationRequest, request: Request, response: Response):
+    """获取推荐玩家列表，支持游标分页；版本未变化时返回空响应"""
     try:
-        result = await GameService.get_recommendations(connection.room_id)
+        # 同时支持请求体中的etag和标准的If-None-Match请求头
+        etag = query.etag or request.headers.get("if-none-match", "").strip('"') or None
+        result = await GameService.get_recommendations(
+            query.room_id,
+            cursor=query.cursor,
+            limit=query.limit,
+            etag=etag
+        )
+        if result['not_modified']:
+            if request.headers.get("if-none-match"):
+                return Response(status_code=304, headers={"ETag": f'"{result["etag"]}"'})
+            return RecommendationResponse(success=True, etag=result['etag'], not_modified=True)
+        
+        response.headers["ETag"] = f'"{result["etag"]}"'
         return RecommendationResponse(
             success=True, 
             recommendations=result['recommendations'],
             game_metadata=result['game_metadata'],
-            constraints=result['constraints']
+            constraints=result['constraints'],
+            etag=result['etag'],
+            next_cursor=result['next_cursor'],
+            total=result['total']
         )
+    except HTTPException as e:
+        return RecommendationResponse(success=False, message=f"获取推荐失败: {e.detail}")
     except Exception as e:
         return RecommendationResponse(success=False, message=f"获取推荐失败: {str(e)}")
-    
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, HTTPException
+from app.models.schemas import AutoGuessBatch, GuessResult
+from app.services.scheduler import scheduler
+
+router = APIRouter(prefix="/api/scheduler")
+
+@router.post("/rooms")
+async def schedule_rooms(batch: AutoGuessBatch):
+    """为多个房间提交自动猜测，超过并发上限的房间排队等待"""
+    sessions = [scheduler.submit(room_id, batch.max_guesses) for room_id in batch.room_ids]
+    return {"summary": scheduler.summary(), "rooms": [scheduler.status(s.room_id) for s in sessions]}
+
+@router.get("/rooms")
+async def get_rooms():
+    """获取所有房间的自动猜测状态"""
+    return {"summary": scheduler.summary(), "rooms": scheduler.all_status()}
+
+@router.get("/rooms/{room_id}")
+async def get_room(room_id: str):
+    """获取单个房间的自动猜测状态"""
+    status = scheduler.status(room_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="该房间没有自动猜测会话")
+    return status
+
+@router.delete("/rooms/{room_id}", response_model=GuessResult)
+async def cancel_room(room_id: str):
+    """取消房间的自动猜测；会话已结束时移除其记录"""
+    if await scheduler.cancel(room_id):
+        return GuessResult(success=True, message=f"已取消房间 {room_id} 的自动猜测")
+    if scheduler.status(room_id):
+        scheduler.remove(room_id)
+        return GuessResult(success=True, message=f"已移除房间 {room_id} 的会话记录")
+    return GuessResult(success=False, message="该房间没有自动猜测会话")
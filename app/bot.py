@@ -0,0 +1,160 @@
+"""无界面的自动猜测机器人：不加载FastAPI、模板和静态文件，一个进程可以同时运行多个房间
+
+    python -m app.bot ROOM_ID [ROOM_ID ...] --quiet
+    python -m app.bot --rooms-file rooms.txt --keep-playing
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+from app.core import player_data, solver_pool
+from app.core.game_client import BlastTvGameClient
+from app.core.solver import DEFAULT_STRATEGY, RANKING_STRATEGIES
+
+# 进入这些阶段时发送准备就绪消息
+READY_PHASES = ("lobby", "end")
+
+
+def log(room_id: str, text: str):
+    """机器人自身的进度输出到stderr，--quiet只屏蔽客户端的处理日志"""
+    print(f"{time.strftime('%H:%M:%S')} [{room_id}] {text}", file=sys.stderr, flush=True)
+
+
+class ConsoleBroadcaster:
+    """代替GameService接收客户端的状态更新，只输出猜测结果"""
+
+    async def broadcast_update(self, room_id: str, update_data: Dict[str, Any]):
+        if update_data.get("type") == "GUESS_RESULT":
+            result = update_data.get("result") or {}
+            outcome = "✅ 猜中" if result.get("isSuccess") else "❌ 未猜中"
+            log(room_id, f"猜测 {result.get('nickname')}: {outcome}，剩余 {update_data.get('remaining_guesses')} 次")
+
+    async def push_recommendation_delta(self, room_id: str):
+        pass
+
+
+async def play_room(room_id: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """连接房间并在每个阶段做出相应操作：大厅和轮次结束时准备就绪，游戏阶段自动猜测"""
+    stats = {"room_id": room_id, "state": "connecting", "series": 0, "series_won": 0, "rounds": 0, "round_wins": 0}
+    client = BlastTvGameClient(room_id)
+    client.broadcaster = ConsoleBroadcaster()
+    client.ranking_strategy = args.strategy
+    client.register_handler("all", client.process_game_messages)
+
+    if not await client.connect():
+        stats["state"] = "connect_failed"
+        log(room_id, "无法连接到游戏服务器")
+        return stats
+    await client.start_receiver()
+    stats["state"] = "running"
+    log(room_id, "已连接")
+
+    played_in_series = False
+    round_done = False  # 当前游戏阶段已经完成自动猜测
+    wins_seen = 0
+    try:
+        while client.connected:
+            # 先清除事件再读取阶段，处理期间发生的阶段变化不会丢失
+            client.phase_event.clear()
+            phase = client.current_game_phase
+            if phase != "game":
+                round_done = False
+            if client.player_wins > wins_seen:
+                stats["round_wins"] += client.player_wins - wins_seen
+            wins_seen = client.player_wins
+
+            if phase == "game" and not round_done:
+                round_done = True
+                played_in_series = True
+                stats["rounds"] += 1
+                log(room_id, f"第 {stats['rounds']} 局开始，自动猜测")
+                await client.start_auto_guessing(args.max_guesses)
+                continue
+            if phase == "end" and client.game_complete and played_in_series:
+                stats["series"] += 1
+                stats["series_won"] += 1
+                played_in_series = False
+                log(room_id, f"🏆 赢得整个比赛 ({client.player_wins}/{client._calculate_required_wins(client.best_of)})")
+                if not args.keep_playing:
+                    stats["state"] = "finished"
+                    break
+            elif phase == "lobby" and played_in_series:
+                # 比赛结束回到大厅但未达到所需胜场
+                stats["series"] += 1
+                played_in_series = False
+                log(room_id, "比赛结束，未获得最终胜利")
+                if not args.keep_playing:
+                    stats["state"] = "finished"
+                    break
+
+            if phase in READY_PHASES:
+                await client.player_ready()
+
+            if client.phase_event.is_set():
+                continue
+            try:
+                await asyncio.wait_for(client.phase_event.wait(), timeout=args.idle_timeout)
+            except asyncio.TimeoutError:
+                stats["state"] = "idle_timeout"
+                log(room_id, f"{args.idle_timeout:.0f} 秒内游戏阶段没有变化，退出")
+                break
+        else:
+            stats["state"] = "disconnected"
+            log(room_id, "与游戏服务器的连接已断开")
+    except asyncio.CancelledError:
+        stats["state"] = "cancelled"
+        raise
+    except Exception as e:
+        stats["state"] = "error"
+        stats["message"] = str(e)
+        log(room_id, f"运行出错: {str(e)}")
+    finally:
+        await client.close()
+    return stats
+
+
+async def run(rooms: List[str], args: argparse.Namespace) -> List[Dict[str, Any]]:
+    player_data.start_watcher()
+    solver_pool.start()
+    try:
+        return await asyncio.gather(*(play_room(room_id, args) for room_id in rooms))
+    finally:
+        player_data.stop_watcher()
+        solver_pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="无界面运行自动猜测机器人")
+    parser.add_argument("rooms", nargs="*", help="房间ID")
+    parser.add_argument("--rooms-file", default=None, help="每行一个房间ID的文件")
+    parser.add_argument("--max-guesses", type=int, default=8, help="每局最多猜测次数")
+    parser.add_argument("--strategy", choices=sorted(RANKING_STRATEGIES), default=DEFAULT_STRATEGY, help="排序策略")
+    parser.add_argument("--keep-playing", action="store_true", help="一场比赛结束后继续参加下一场")
+    parser.add_argument("--idle-timeout", type=float, default=600, help="游戏阶段多久没有变化后退出（秒）")
+    parser.add_argument("--quiet", action="store_true", help="不输出客户端的处理日志")
+    args = parser.parse_args()
+
+    rooms = list(args.rooms)
+    if args.rooms_file:
+        with open(args.rooms_file, 'r', encoding='utf-8') as f:
+            rooms += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    rooms = list(dict.fromkeys(rooms))
+    if not rooms:
+        parser.error("至少需要一个房间ID")
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull if args.quiet else sys.stdout):
+        try:
+            results = asyncio.run(run(rooms, args))
+        except KeyboardInterrupt:
+            results = []
+    for stats in results:
+        print(json.dumps(stats, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,29 @@
 from app.core.util import custom_uuid_implementation
+from app.core import solver_pool
+from app.core.solver import (DEFAULT_STRATEGY, constraints_key, feedback_from_result, feedback_to_result,
+                             select_candidate, team_key)
+from app.core.profiling import RoomFrameProfiler, start_session
+from app.core.pacing import GuessPacer
+from app.core.player_data import Dataset, current_dataset, load_dataset
+from app.core.recorder import RECORDING_ENABLED, TrafficRecorder
 from collections import deque
-from typing import Optional, Callable, Deque, Dict, List, Any, Tuple
+from typing import Optional, Awaitable, Callable, Deque, Dict, List, Any, Tuple
+import contextlib
 import json
+import reprlib
 import asyncio
 import websockets
 import ssl
 import traceback
 
+# 每个房间待处理的上游消息上限，队列满时接收器等待消费者（背压）
+INBOUND_QUEUE_SIZE = 256
+
+# 表示上游拒绝猜测或限流的消息类型
+REJECTION_MESSAGE_TYPES = {"ERROR", "GUESS_REJECTED", "RATE_LIMITED", "TOO_MANY_REQUESTS"}
+# 自动猜测连续被拒绝或失败的次数上限，超过后停止，被拒绝的猜测不计入猜测次数
+MAX_CONSECUTIVE_FAILURES = 8
+
 class BlastTvGameClient:
     def __init__(self, room_id: str):
         self.room_id = room_id
@@ -23,10 +40,15 @@ class BlastTvGameClient:
         
         self.message_queue: Deque[Dict[str, Any]] = deque(maxlen=100)
         self.receiver_task = None
+        # 上游消息按到达顺序进入有界队列，由唯一的消费者任务逐条处理
+        self.inbound: asyncio.Queue = asyncio.Queue(maxsize=INBOUND_QUEUE_SIZE)
+        self.consumer_task = None
+        self.inbound_stats = {"enqueued": 0, "processed": 0, "overflows": 0, "max_depth": 0}
         self.message_handlers = {}
         self.stop_receiving = False
         
         self.guess_results = []
+        self.opponent_results = []  # 本轮对手的猜测结果，与我方的结果针对同一个答案
         self.accumulated_constraints = {}
         self.guessing = False
         self.current_guess_result = None
@@ -35,8 +57,24 @@ class BlastTvGameClient:
         self.current_game_phase = None
         self.game_complete = False
         self.processed_end_messages = set()
+        # 上游players消息每次都带全部猜测记录，按玩家记录已看到的数量和最后一条的ID，只处理新增部分
+        self.guess_cursors: Dict[str, Tuple[int, Optional[str]]] = {}
+        self.handled_guess_cursor: Optional[Tuple[int, Optional[str]]] = None  # 我方最后一条已处理为猜测结果的记录位置
+        self.winning_guess: Optional[Dict[str, Any]] = None  # 本轮我方猜中的记录
+        self._diffed_frame = None
+        self._frame_guesses: Dict[str, List[Dict[str, Any]]] = {}
         self.best_of = "best_of_3" 
         self.game_meta = {} 
+        self.ranking_strategy = DEFAULT_STRATEGY  # get_next_guess使用的排序策略
+        self.dataset: Optional[Dataset] = None  # 本轮使用的玩家数据版本，数据集热替换时进行中的轮次不切换
+        self.frame_profiler: Optional[RoomFrameProfiler] = None  # 按需开启的消息处理性能分析
+        self.last_profile_id = None
+        self.guess_result_event = asyncio.Event()  # 每处理完一个猜测结果时触发
+        self.phase_event = asyncio.Event()  # 游戏阶段变化时触发
+        self.broadcaster = None  # 接收状态更新的服务，未设置时使用Web服务的GameService
+        self.pacer = GuessPacer()  # 自动猜测的自适应间隔
+        self.solver_gate = None  # 多房间调度时由调度器设置，用于公平分配求解器计算
+        self.recorder: Optional[TrafficRecorder] = None  # 设置RECORD_TRAFFIC时录制上下行消息
 
         try:
             with open("countries.json", 'r', encoding='utf-8') as f:
@@ -52,6 +90,8 @@ class BlastTvGameClient:
                 self.websocket = await websockets.connect(self.full_url, ssl=self.ssl_context)
                 self.connected = True
                 print("成功连接到游戏服务器")
+                if RECORDING_ENABLED and self.recorder is None:
+                    self.recorder = TrafficRecorder(self.room_id, self.connection_id or self.uuid)
                 return True
             except Exception as e:
                 print(f"连接失败: {str(e)}，重试中...")
@@ -76,6 +116,8 @@ class BlastTvGameClient:
         
         try:
             await self.websocket.send(json.dumps(ready_message))
+            if self.recorder:
+                self.recorder.record("out", ready_message)
             print("已发送准备就绪消息")
             return True
         except Exception as e:
@@ -117,6 +159,8 @@ class BlastTvGameClient:
         
         try:
             await self.websocket.send(json.dumps(guess_message))
+            if self.recorder:
+                self.recorder.record("out", guess_message)
             print(f"已发送猜测消息，目标玩家ID: {player_id}")
             return True
         except Exception as e:
@@ -135,50 +179,21 @@ class BlastTvGameClient:
             return True
             
         self.stop_receiving = False
+        self.consumer_task = asyncio.create_task(self._message_consumer())
         self.receiver_task = asyncio.create_task(self._message_receiver())
         print("消息接收器已启动")
         return True
 
     async def _message_receiver(self):
-        """后台消息接收器，持续接收消息并分发处理"""
+        """后台消息接收器，持续接收消息并放入房间的处理队列"""
         try:
             while not self.stop_receiving and self.connected:
                 try:
                     message = await self.receive_message()
                     if message:
-                        # 增强调试信息，显示更多消息内容
-                        msg_type = message.get('type', '未知类型')
-                        print(f"接收到消息: {msg_type}")
-                        
-                        # 对于未知类型的消息，打印更详细的信息便于调试
-                        if msg_type == '未知类型':
-                            # 安全地打印消息的前100个字符
-                            msg_preview = str(message)[:100] + ('...' if len(str(message)) > 100 else '')
-                            print(f"未知类型消息内容预览: {msg_preview}")
-                            
-                            # 检测关键字段，即使没有type字段也能处理
-                            if 'phase' in message:
-                                print(f"检测到未分类的阶段更新消息: phase={message['phase']}")
-                                # 创建处理任务
-                                asyncio.create_task(self.process_game_messages(message))
-                            elif 'players' in message:
-                                print(f"检测到未分类的玩家更新消息，包含{len(message['players'])}名玩家")
-                                # 创建处理任务
-                                asyncio.create_task(self.process_game_messages(message))
-                            elif 'meta' in message:
-                                print(f"检测到未分类的元数据消息")
-                                # 创建处理任务
-                                asyncio.create_task(self.process_game_messages(message))
-                        
-                        # 添加到消息队列
-                        self.message_queue.append(message)
-                        
-                        # 分发消息给处理器
-                        self.dispatch_message(message)
-                        
-                        # 特别处理猜测相关消息
-                        if self.guessing and (message.get('type') == 'GUESS_RESULT' or 'players' in message):
-                            await self.handle_guess_result(message)
+                        if self.recorder:
+                            self.recorder.record("in", message)
+                        await self.enqueue_message(message)
                 except Exception as e:
                     print(f"消息接收器错误: {str(e)}")
                     import traceback
@@ -189,8 +204,122 @@ class BlastTvGameClient:
             print("消息接收器已停止")
             self.receiver_task = None
 
-    def dispatch_message(self, message: Dict[str, Any]):
-        """分发消息到注册的处理器，添加消息去重机制和无类型消息处理"""
+    async def enqueue_message(self, message: Dict[str, Any]):
+        """把上游消息放入处理队列；队列已满时记录溢出并等待消费者腾出空间"""
+        if self.inbound.full():
+            self.inbound_stats["overflows"] += 1
+            print(f"⚠️ 房间 {self.room_id} 的消息队列已满({self.inbound.maxsize})，接收器等待处理")
+        await self.inbound.put(message)
+        self.inbound_stats["enqueued"] += 1
+        self.inbound_stats["max_depth"] = max(self.inbound_stats["max_depth"], self.inbound.qsize())
+
+    async def _message_consumer(self):
+        """房间唯一的消息处理任务
+
+        消息严格按到达顺序逐条处理：一条消息的处理器（包括状态更新、猜测结果处理和
+        向浏览器的广播）全部完成后才会开始处理下一条，因此guessing、guess_results等
+        状态只会在这个任务中被修改。
+        """
+        try:
+            while True:
+                message = await self.inbound.get()
+                try:
+                    if self.frame_profiler is None:
+                        await self._handle_frame(message)
+                    else:
+                        await self._handle_profiled_frame(message)
+                except Exception as e:
+                    print(f"处理消息出错: {str(e)}")
+                    traceback.print_exc()
+                finally:
+                    self.inbound_stats["processed"] += 1
+                    self.inbound.task_done()
+        finally:
+            self.consumer_task = None
+
+    def queue_stats(self) -> Dict[str, Any]:
+        return dict(self.inbound_stats, depth=self.inbound.qsize(), capacity=self.inbound.maxsize)
+
+    async def _handle_frame(self, message: Dict[str, Any]):
+        """处理一条上游消息"""
+        # 增强调试信息，显示更多消息内容
+        msg_type = message.get('type', '未知类型')
+        print(f"接收到消息: {msg_type}")
+        
+        # 对于未知类型的消息，打印更详细的信息便于调试
+        if msg_type == '未知类型':
+            # 只格式化消息的开头部分，不把整条消息（可能包含全部猜测记录）转换为字符串
+            print(f"未知类型消息内容预览: {reprlib.repr(message)}")
+            
+            # 检测关键字段，这些消息由dispatch_message交给"all"处理器
+            if 'phase' in message:
+                print(f"检测到未分类的阶段更新消息: phase={message['phase']}")
+            elif 'players' in message:
+                print(f"检测到未分类的玩家更新消息，包含{len(message['players'])}名玩家")
+            elif 'meta' in message:
+                print(f"检测到未分类的元数据消息")
+        
+        # 添加到消息队列
+        self.message_queue.append(message)
+        
+        # 猜测等待结果期间收到拒绝或限流信号时，立即结束等待并退避
+        if self.guessing:
+            reason = self._rejection_reason(message)
+            if reason:
+                self.pacer.rejected_by_server(reason)
+                self.guessing = False
+                self.guess_result_event.set()
+                return
+        
+        # 分发消息给处理器，异步处理器在当前消息内执行完毕
+        pending = self.dispatch_message(message)
+        if pending is not None:
+            await pending
+        
+        # 特别处理猜测相关消息
+        if self.guessing and (message.get('type') == 'GUESS_RESULT' or 'players' in message):
+            await self.handle_guess_result(message)
+        
+        # 对手的猜测结果同样缩小候选范围
+        if 'players' in message and self.harvest_opponent_guesses(message):
+            await self._service().push_recommendation_delta(self.room_id)
+
+    @staticmethod
+    def _rejection_reason(message: Dict[str, Any]) -> Optional[str]:
+        """判断上游消息是否表示猜测被拒绝或限流，返回原因"""
+        msg_type = str(message.get('type', '')).upper()
+        if msg_type in REJECTION_MESSAGE_TYPES or msg_type.endswith('_ERROR'):
+            payload = message.get('payload')
+            detail = payload.get('message') if isinstance(payload, dict) else None
+            return f"{msg_type}: {detail}" if detail else msg_type
+        if 'error' in message:
+            return str(message['error'])
+        return None
+
+    async def _handle_profiled_frame(self, message: Dict[str, Any]):
+        """在性能分析下处理消息，采集满指定数量后保存结果"""
+        profiler = self.frame_profiler
+        with profiler.capture():
+            await self._handle_frame(message)
+        if profiler.finished:
+            self.frame_profiler = None
+            self.last_profile_id = profiler.session.save()
+
+    def start_frame_profiling(self, frames: int) -> bool:
+        """采集接下来frames条上游消息的处理过程，已有采集在进行时返回False"""
+        if self.frame_profiler is not None:
+            return False
+        session = start_session(f"room-{self.room_id}")
+        if session is None:
+            return False
+        self.frame_profiler = RoomFrameProfiler(self.room_id, frames, session)
+        return True
+
+    def dispatch_message(self, message: Dict[str, Any]) -> Optional[Awaitable]:
+        """分发消息到注册的处理器，添加消息去重机制和无类型消息处理
+
+        同步处理器直接执行；异步处理器返回其协程，由调用方等待，保证消息按顺序处理。
+        """
         # 检查是否是无类型消息但包含重要状态信息
         contains_important_data = False
         if 'type' not in message:
@@ -204,12 +333,15 @@ class BlastTvGameClient:
             if 'payload' in message and 'id' in message['payload']:
                 message_fingerprint = f"guess_{message['payload']['id']}"
         elif 'players' in message:
-            for player in message['players']:
-                if player.get('id') == self.connection_id and 'guesses' in player and player['guesses']:
-                    latest_guess = player['guesses'][-1]
-                    if 'id' in latest_guess:
-                        message_fingerprint = f"guess_{latest_guess['id']}"
-                    break
+            own_id = self.connection_id if self.connection_id else self.uuid
+            own_guesses = self._new_guesses(message).get(own_id)
+            if own_guesses:
+                if 'id' in own_guesses[-1]:
+                    message_fingerprint = f"guess_{own_guesses[-1]['id']}"
+            elif self.guess_cursors.get(own_id, (0, None))[0]:
+                # 我方的猜测记录没有新增，与之前处理过的消息重复
+                print("跳过没有新猜测的玩家消息")
+                return
         
         # 如果是已经处理过的消息，跳过
         if message_fingerprint and hasattr(self, 'processed_messages'):
@@ -227,18 +359,43 @@ class BlastTvGameClient:
         if message_type in self.message_handlers:
             handler = self.message_handlers[message_type]
             if asyncio.iscoroutinefunction(handler):
-                # 创建异步任务处理消息，避免阻塞
-                asyncio.create_task(handler(message))
-            else:
-                handler(message)
+                return handler(message)
+            handler(message)
         # 处理无类型但包含重要数据的消息
         elif contains_important_data and 'all' in self.message_handlers:
             handler = self.message_handlers['all']
             if asyncio.iscoroutinefunction(handler):
-                asyncio.create_task(handler(message))
-            else:
-                handler(message)
+                return handler(message)
+            handler(message)
+        return None
                 
+    def _new_guesses(self, message: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """返回本帧中每名玩家新增的猜测，同一帧只计算一次
+
+        只比较每名玩家猜测记录的长度和已看到的最后一条，开销与新增的猜测数量成正比；
+        记录变短或最后一条不一致时（新一轮开始），从头开始计算。
+        """
+        if self._diffed_frame is message:
+            return self._frame_guesses
+        self._diffed_frame = message
+        self._frame_guesses = {}
+        own_id = self.connection_id if self.connection_id else self.uuid
+        for player in message.get('players') or ():
+            player_id = player.get('id')
+            guesses = player.get('guesses') or []
+            seen, last_id = self.guess_cursors.get(player_id, (0, None))
+            if seen > len(guesses) or (seen and guesses[seen - 1].get('id') != last_id):
+                seen = 0
+                if player_id == own_id:
+                    self.winning_guess = None
+            if len(guesses) > seen:
+                new_guesses = guesses[seen:]
+                self._frame_guesses[player_id] = new_guesses
+                if player_id == own_id:
+                    self.winning_guess = next((g for g in new_guesses if g.get('isSuccess')), self.winning_guess)
+            self.guess_cursors[player_id] = (len(guesses), guesses[-1].get('id') if guesses else None)
+        return self._frame_guesses
+    
     def register_handler(self, message_type: str, handler: Callable):
         self.message_handlers[message_type] = handler
         
@@ -250,6 +407,15 @@ class BlastTvGameClient:
         """安全关闭WebSocket连接"""
         await self.stop_receiver()
         
+        # 连接关闭时保存尚未采集完的性能分析
+        if self.frame_profiler is not None:
+            self.last_profile_id = self.frame_profiler.session.save()
+            self.frame_profiler = None
+        
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+        
         if self.websocket:
             temp_ws = self.websocket
             self.websocket = None  # 立即清除引用避免重复关闭
@@ -281,7 +447,8 @@ class BlastTvGameClient:
             round_winner_id = meta.get('currentRoundWinnerId')
             
             # 检查是否我方获胜，并且避免重复计数
-            if round_winner_id and round_winner_id == self.connection_id:
+            own_id = self.connection_id if self.connection_id else self.uuid
+            if round_winner_id and round_winner_id == own_id:
                 # 获取比赛模式信息
                 best_of = meta.get("bestOf", "best_of_3")
                 required_wins = self._calculate_required_wins(best_of)
@@ -300,18 +467,15 @@ class BlastTvGameClient:
                     self.game_complete = True
                     return True
             
-            # 显示轮次结束信息
+            # 显示轮次结束信息（猜中的记录在逐帧比较猜测记录时已经找到）
             if 'players' in message:
-                for player in message['players']:
-                    if player.get('id') == self.connection_id:
-                        if player.get('guesses') and any(g.get('isSuccess', False) for g in player['guesses']):
-                            # 玩家猜对了
-                            successful_guess = next((g for g in player['guesses'] if g.get('isSuccess', False)), None)
-                            if successful_guess:
-                                print(f"\n✅ 成功猜出正确答案: {successful_guess.get('firstName')} {successful_guess.get('lastName')}")
+                self._new_guesses(message)
+            if self.winning_guess:
+                print(f"\n✅ 成功猜出正确答案: {self.winning_guess.get('firstName')} {self.winning_guess.get('lastName')}")
             
             # 触发状态更新，强制重置剩余猜测次数为8
             self.guess_results = []
+            self.opponent_results = []
             
             # 异步任务无法在同步方法中调用，所以在process_game_messages中处理
             
@@ -374,6 +538,10 @@ class BlastTvGameClient:
             if old_phase != self.current_game_phase:
                 state_changed = True
                 update_data["game_phase"] = self.current_game_phase
+                self.phase_event.set()
+                if self.current_game_phase == 'game':
+                    # 新一轮开始时使用当前生效的数据集版本
+                    self.dataset = current_dataset()
                 print(f"游戏阶段变化: {old_phase} -> {self.current_game_phase}")
             
             # 当阶段变为lobby时，重置胜利计数器
@@ -389,6 +557,7 @@ class BlastTvGameClient:
                 # 重置累积的约束条件
                 self.accumulated_constraints = {}
                 self.guess_results = []
+                self.opponent_results = []
                 print("🔄 重置所有累积约束条件和猜测记录")
             
             # 检测轮次结束，需要重置状态但保留约束条件
@@ -424,8 +593,7 @@ class BlastTvGameClient:
             }
             
             # 立即广播完整状态
-            from app.services.game_service import GameService
-            await GameService.broadcast_update(self.room_id, full_update_data)
+            await self._service().broadcast_update(self.room_id, full_update_data)
             print(f"📣 已广播完整状态更新: {full_update_data}")
             return  # 提前返回，避免后面重复广播
         
@@ -445,8 +613,7 @@ class BlastTvGameClient:
             update_data["type"] = "STATE_UPDATE"
             
             # 广播状态更新
-            from app.services.game_service import GameService
-            await GameService.broadcast_update(self.room_id, update_data)
+            await self._service().broadcast_update(self.room_id, update_data)
         
         # 猜测结果处理
         if message_type == 'GUESS_RESULT' or ('players' in message and self.guessing):
@@ -471,33 +638,17 @@ class BlastTvGameClient:
             result = message['payload']
             print("从简化消息格式中提取结果")
         elif 'players' in message:
-            # 寻找玩家列表中的猜测记录
+            # 只取我方在本帧中新增的猜测，已处理的猜测不会再次出现
             conn_id = self.connection_id if self.connection_id else self.uuid
-            for player in message['players']:
-                if player.get('id') == conn_id and 'guesses' in player:
-                    guesses = player['guesses']
-                    if guesses:
-                        # 在处理前检查这个猜测是否已经处理过
-                        latest_guess = guesses[-1]
-                        guess_id = latest_guess.get('id')
-                        
-                        # 使用猜测ID进行去重
-                        if guess_id and hasattr(self, 'processed_guess_ids') and guess_id in self.processed_guess_ids:
-                            print(f"🔄 此猜测结果({guess_id})已处理，跳过")
-                            self.guessing = False
-                            return False
-                        
-                        # 初始化处理过的猜测ID集合
-                        if not hasattr(self, 'processed_guess_ids'):
-                            self.processed_guess_ids = set()
-                        
-                        # 记录此ID为已处理
-                        if guess_id:
-                            self.processed_guess_ids.add(guess_id)
-                        
-                        result = latest_guess
-                        print("从玩家列表中提取最新猜测结果")
-                        break
+            own_guesses = self._new_guesses(message).get(conn_id)
+            cursor = self.guess_cursors.get(conn_id)
+            if not own_guesses or cursor == self.handled_guess_cursor:
+                # 可能只有对手的新猜测，或同一帧再次传入，继续等待我方的结果
+                print("🔄 玩家列表中没有我方新的猜测结果，跳过")
+                return False
+            result = own_guesses[-1]
+            self.handled_guess_cursor = cursor
+            print("从玩家列表中提取最新猜测结果")
         
         # 如果无法提取结果，则返回
         if not result:
@@ -535,44 +686,102 @@ class BlastTvGameClient:
             "player_wins": self.player_wins
         }
         
-        from app.services.game_service import GameService
-        await GameService.broadcast_update(self.room_id, update_data)
+        await self._service().broadcast_update(self.room_id, update_data)
         
         # 重要：确保在处理完结果后设置guessing为False
         self.guessing = False
+        self.guess_result_event.set()
         print("猜测状态已重置，可以进行下一次猜测")
+        
+        # 为房间计算一次新的推荐并推送给所有浏览器，保证在下一条消息的广播之前送达
+        await self._service().push_recommendation_delta(self.room_id)
         return True
     
+    def harvest_opponent_guesses(self, message: Dict[str, Any]) -> int:
+        """把本帧中对手新增的猜测解析为约束条件，加入本轮的对手结果，返回新增数量
+
+        同一房间的所有玩家猜的是同一个答案，对手的反馈与我方的反馈一样可以用来筛选候选人。
+        只在游戏阶段收集，轮次结束后的完整记录不会带入下一轮。
+        """
+        if self.current_game_phase != 'game':
+            return 0
+        own_id = self.connection_id if self.connection_id else self.uuid
+        added = 0
+        for player_id, guesses in self._new_guesses(message).items():
+            if player_id == own_id:
+                continue
+            for guess in guesses:
+                if 'id' not in guess and 'playerId' in guess:
+                    guess = dict(guess, id=guess['playerId'])
+                if 'id' not in guess:
+                    continue
+                result = dict(guess, opponent_id=player_id)
+                result['constraints'] = self.parse_guess_result(result)
+                self.opponent_results.append(result)
+                added += 1
+        if added:
+            print(f"👀 从对手的猜测中获得 {added} 条反馈，本轮共 {len(self.opponent_results)} 条")
+        return added
+    
+    def excluded_player_ids(self, guess_results: Optional[List[Dict]] = None) -> set:
+        """不再推荐的玩家：我方猜过的玩家（或给定结果中的玩家）和对手猜错的玩家"""
+        if guess_results is None:
+            guess_results = self.guess_results
+        excluded = {result['id'] for result in guess_results if 'id' in result}
+        excluded.update(result['id'] for result in self.opponent_results if not result.get('isSuccess'))
+        return excluded
+    
+    def _service(self):
+        """状态更新和推荐推送的接收方；无界面运行时由调用方设置broadcaster，避免加载Web框架"""
+        if self.broadcaster is None:
+            from app.services.game_service import GameService
+            self.broadcaster = GameService
+        return self.broadcaster
+    
     def parse_guess_result(self, guess_result: Dict[str, Any]) -> Dict[str, Any]:
-        """根据游戏规则解析猜测结果，提取约束条件"""
+        """根据游戏规则解析猜测结果，提取约束条件
+
+        每种反馈都解析为恰好描述该反馈的约束，符合约束的玩家与solver.simulate_feedback
+        得到相同反馈的玩家一致，minimax和lookahead策略据此划分候选集合。
+        """
         constraints = {}
         
         # 解析国籍约束
         if 'nationality' in guess_result:
             nat_result = guess_result['nationality']['result']
             nat_value = guess_result['nationality'].get('value')
+            region = self.get_country_region(nat_value)
             
             if nat_result == "CORRECT":
                 constraints['nationality'] = {'exact': nat_value}
             elif nat_result == "INCORRECT_CLOSE":
                 # 同一区域
-                region = self.get_country_region(nat_value)
                 if region:
                     constraints['nationality_region'] = {'region': region}
                 constraints['nationality'] = {'exclude': nat_value}
+            elif nat_result == "INCORRECT":
+                # 不同国家，也不在同一区域
+                if region:
+                    constraints['nationality_region'] = {'exclude': region}
+                constraints['nationality'] = {'exclude': nat_value}
         
-        # 解析团队约束
+        # 解析团队约束，按队伍ID比较（上游的队伍数据比数据集多出若干字段）
         if 'team' in guess_result:
             team_result = guess_result['team']['result']
             team_data = guess_result['team'].get('data')
+            team_id = team_key(team_data)
             
             if team_result == "CORRECT":
-                constraints['team'] = {'exact': team_data}
+                constraints['team'] = {'exact': team_id}
+                if isinstance(team_data, dict) and team_data.get('name'):
+                    constraints['team']['name'] = team_data['name']
+            elif team_result == "INCORRECT" and team_id is not None:
+                constraints['team'] = {'exclude': team_id}
         
         # 解析年龄约束
         if 'age' in guess_result:
             age_result = guess_result['age']['result']
-            age_value = guess_result['age'].get('value', 0)
+            age_value = guess_result['age'].get('value') or 0
             
             if age_result == "CORRECT":
                 constraints['age'] = {'exact': age_value}
@@ -598,7 +807,7 @@ class BlastTvGameClient:
         # 解析Major出场次数约束
         if 'majorAppearances' in guess_result:
             major_result = guess_result['majorAppearances']['result']
-            major_value = guess_result['majorAppearances'].get('value', 0)
+            major_value = guess_result['majorAppearances'].get('value') or 0
             
             if major_result == "CORRECT":
                 constraints['majorAppearances'] = {'exact': major_value}
@@ -607,18 +816,12 @@ class BlastTvGameClient:
             elif major_result == "LOW_CLOSE":
                 constraints['majorAppearances'] = {'min': major_value + 1, 'max': major_value + 3}
             elif major_result == "HIGH_NOT_CLOSE":
-                # 不设置max=0，而是使用相对宽松的约束
-                if major_value > 4:
-                    constraints['majorAppearances'] = {'max': major_value - 4}
-                else:
-                    # 如果猜测值小于等于4，则设置较宽松的范围
-                    constraints['majorAppearances'] = {'max': 3}
+                # 数据集与上游不一致时由软约束处理（Major次数的权重最低），这里不再放宽范围
+                constraints['majorAppearances'] = {'max': major_value - 4}
             elif major_result == "LOW_NOT_CLOSE":
                 constraints['majorAppearances'] = {'min': major_value + 4}
         
-        # 退役状态
-        if 'isRetired' in guess_result:
-            constraints['isRetired'] = {'exact': guess_result['isRetired']}
+        # 上游结果中的isRetired是被猜测玩家的退役状态，没有对应的反馈，不构成约束
             
         return constraints
     
@@ -657,21 +860,34 @@ class BlastTvGameClient:
             # 检查国家区域
             if 'nationality_region' in constraints and match:
                 current_key = 'nationality_region'  # 设置当前键
+                region = self.get_country_region(player.get('nationality'))
                 if 'region' in constraints['nationality_region']:
-                    region = self.get_country_region(player.get('nationality'))
                     if region != constraints['nationality_region']['region']:
                         match = False
+                if 'exclude' in constraints['nationality_region']:
+                    if region == constraints['nationality_region']['exclude']:
+                        match = False
+                if 'exclude_list' in constraints['nationality_region']:
+                    if region in constraints['nationality_region']['exclude_list']:
+                        match = False
                 
                 if not match:
                     filtered_counts[current_key] += 1
                     total_filtered += 1
                     continue
             
-            # 检查团队
+            # 检查团队（按队伍ID）
             if 'team' in constraints and match:
                 current_key = 'team'  # 设置当前键
+                team_id = team_key(player.get('team'))
                 if 'exact' in constraints['team']:
-                    if player.get('team') != constraints['team']['exact']:
+                    if team_id != team_key(constraints['team']['exact']):
+                        match = False
+                if 'exclude' in constraints['team']:
+                    if team_id == team_key(constraints['team']['exclude']):
+                        match = False
+                if 'exclude_list' in constraints['team']:
+                    if team_id in constraints['team']['exclude_list']:
                         match = False
                 
                 if not match:
@@ -682,7 +898,7 @@ class BlastTvGameClient:
             # 检查年龄
             if 'age' in constraints and match:
                 current_key = 'age'  # 设置当前键
-                age = player.get('age', 0)
+                age = player.get('age') or 0
                 if 'exact' in constraints['age']:
                     if age != constraints['age']['exact']:
                         match = False
@@ -717,7 +933,7 @@ class BlastTvGameClient:
             # 检查Major出场次数
             if 'majorAppearances' in constraints and match:
                 current_key = 'majorAppearances'  # 设置当前键
-                appearances = player.get('majorAppearances', 0)
+                appearances = player.get('majorAppearances') or 0
                 if 'exact' in constraints['majorAppearances']:
                     if appearances != constraints['majorAppearances']['exact']:
                         match = False
@@ -753,108 +969,80 @@ class BlastTvGameClient:
         
         return filtered_players
     
-    async def get_next_guess(self, players_file="players_with_entropy.json") -> Optional[Dict]:
+    def players_dataset(self) -> Dataset:
+        """本房间使用的玩家数据：游戏阶段固定为本轮开始时的版本，其他阶段跟随当前版本"""
+        if self.current_game_phase != 'game' or self.dataset is None:
+            self.dataset = current_dataset()
+        return self.dataset
+    
+    async def get_next_guess(self, players_file=None) -> Optional[Dict]:
         """根据之前的猜测结果，确定下一个最佳猜测对象"""
         try:
-            # 加载玩家数据
-            with open(players_file, 'r', encoding='utf-8') as f:
-                all_players = json.load(f)
-            
-            # 创建已猜测玩家ID集合
-            guessed_player_ids = set()
-            for result in self.guess_results:
-                if 'id' in result:
-                    guessed_player_ids.add(result['id'])
-            
-            # 排除已猜测的玩家
-            available_players = [p for p in all_players if p.get('id') not in guessed_player_ids]
-            print(f"排除已猜测玩家后剩余 {len(available_players)} 名可用玩家")
-            
-            # 合并当前轮次和累积的约束条件
-            combined_constraints = self.accumulated_constraints.copy()
-            
-            # 从当前轮次的猜测结果中获取约束条件
-            current_round_constraints = {}
-            for result in self.guess_results:
-                if 'constraints' in result:
-                    # 使用新的合并方法逐步合并每个猜测结果的约束
-                    current_round_constraints = self.merge_constraints(
-                        current_round_constraints, 
-                        result['constraints']
-                    )
-            
-            # 再合并当前轮次和累积的约束条件
-            combined_constraints = self.merge_constraints(
-                combined_constraints, 
-                current_round_constraints
-            )
-            
-            print(f"合并后的约束条件: {json.dumps(combined_constraints, indent=2)}")
-            
-            # 使用合并的约束条件查找最佳候选人
-            result = self.find_best_candidate(available_players, combined_constraints)
-            
-            # 如果没有找到匹配的候选人，尝试逐步放宽约束
-            if not result:
-                print("未找到匹配所有约束条件的候选人，尝试放宽约束...")
-                
-                # 首先尝试移除majorAppearances约束，这个约束可能最严格
-                relaxed_constraints = combined_constraints.copy()
-                if 'majorAppearances' in relaxed_constraints:
-                    del relaxed_constraints['majorAppearances']
-                    print("移除majorAppearances约束条件")
-                    result = self.find_best_candidate(available_players, relaxed_constraints)
-                
-                # 如果仍然没有结果，尝试只保留国籍和角色约束
-                if not result:
-                    essential_constraints = {}
-                    if 'nationality' in combined_constraints:
-                        essential_constraints['nationality'] = combined_constraints['nationality']
-                    if 'nationality_region' in combined_constraints:
-                        essential_constraints['nationality_region'] = combined_constraints['nationality_region']
-                    if 'role' in combined_constraints:
-                        essential_constraints['role'] = combined_constraints['role']
-                    
-                    print(f"仅保留关键约束条件: {json.dumps(essential_constraints, indent=2)}")
-                    result = self.find_best_candidate(available_players, essential_constraints)
-                
-                # 如果仍然没有结果，尝试只保留国籍约束
-                if not result and ('nationality' in combined_constraints or 'nationality_region' in combined_constraints):
-                    nationality_constraints = {}
-                    if 'nationality' in combined_constraints:
-                        nationality_constraints['nationality'] = combined_constraints['nationality']
-                    if 'nationality_region' in combined_constraints:
-                        nationality_constraints['nationality_region'] = combined_constraints['nationality_region']
-                    
-                    print(f"仅保留国籍约束条件: {json.dumps(nationality_constraints, indent=2)}")
-                    result = self.find_best_candidate(available_players, nationality_constraints)
-                
-                # 如果一切尝试都失败，返回熵值最高的未猜测玩家
-                if not result:
-                    print("所有约束条件尝试都失败，选择熵值最高的未猜测玩家")
-                    if available_players:
-                        available_players.sort(key=lambda p: p.get('entropy_value', 0), reverse=True)
-                        result = available_players[0]
-                        print(f"选择熵值最高的玩家: {result.get('nickname')} (无约束匹配)")
-            
-            return result
+            dataset = load_dataset(players_file) if players_file else None
+            async with self.solver_turn():
+                return await self._select_next_guess(self.guess_results, dataset)
         except Exception as e:
             print(f"获取下一个猜测出错: {str(e)}")
             traceback.print_exc()
             return None
     
+    def solver_turn(self):
+        """获取一次求解器计算的执行权；未由调度器管理时直接执行"""
+        if self.solver_gate is None:
+            return contextlib.nullcontext()
+        return self.solver_gate.turn(self.room_id)
+    
+    def combined_constraints(self, guess_results: Optional[List[Dict]] = None) -> Dict:
+        """合并累积约束条件和当前轮次（或给定）猜测结果中的约束条件"""
+        if guess_results is None:
+            guess_results = self.guess_results
+        
+        # 从当前轮次的猜测结果（包括对手的结果）中获取约束条件
+        current_round_constraints = {}
+        for result in self.opponent_results + list(guess_results):
+            if 'constraints' in result:
+                # 使用新的合并方法逐步合并每个猜测结果的约束
+                current_round_constraints = self.merge_constraints(
+                    current_round_constraints, 
+                    result['constraints']
+                )
+        
+        # 再合并当前轮次和累积的约束条件
+        return self.merge_constraints(
+            self.accumulated_constraints.copy(), 
+            current_round_constraints
+        )
+    
+    async def _select_next_guess(self, guess_results: List[Dict], dataset: Optional[Dataset] = None) -> Optional[Dict]:
+        """在给定的猜测结果下选择下一个猜测，guess_results可以包含假设的结果"""
+        # 创建已猜测玩家ID集合（包括对手猜错的玩家）
+        guessed_player_ids = self.excluded_player_ids(guess_results)
+        
+        # 合并当前轮次和累积的约束条件
+        combined_constraints = self.combined_constraints(guess_results)
+        
+        print(f"合并后的约束条件: {json.dumps(combined_constraints, indent=2)}")
+        
+        # 单次遍历: 优先选择完全符合约束的候选人，没有时选择违反约束（按可信度加权）最少的候选人。
+        # 计算在求解器执行器中进行，不阻塞事件循环
+        result, violations = await solver_pool.select_next_guess(
+            guessed_player_ids, combined_constraints, self.ranking_strategy, self.countries_data,
+            dataset or self.players_dataset())
+        if result and violations:
+            print(f"未找到匹配所有约束条件的候选人，选择违反约束最少的玩家: {result.get('nickname')} (加权违反数 {violations})")
+        
+        return result
+    
     def find_best_candidate(self, players: List[Dict], constraints: Dict) -> Optional[Dict]:
-        """根据约束条件和熵值找到最佳猜测候选人"""
+        """根据约束条件和房间的排序策略找到最佳猜测候选人"""
         # 先筛选符合条件的玩家
         filtered_players = self.filter_players(players, constraints)
         
         if not filtered_players:
             return None
         
-        # 按熵值排序，选择熵值最高的玩家
-        filtered_players.sort(key=lambda p: p.get('entropy_value', 0), reverse=True)
-        
-        return filtered_players[0] if filtered_players else None
+        # 在筛选后的候选集合上应用排序策略
+        return select_candidate(filtered_players, self.ranking_strategy, self.countries_data)
     
     def get_country_region(self, country_code):
         """获取国家所属的区域"""
@@ -887,15 +1075,17 @@ class BlastTvGameClient:
         
         # 清除当前状态
         self.guess_results = []
+        self.opponent_results = []
         self.guessing = False
         self.current_guess_result = None
         self.guess_success = False
         
         # 清除消息处理相关的临时状态
-        if hasattr(self, 'processed_guess_ids'):
-            self.processed_guess_ids.clear()
         if hasattr(self, 'processed_messages'):
             self.processed_messages.clear()
+        self.guess_cursors.clear()
+        self.handled_guess_cursor = None
+        self.winning_guess = None
         
         print(f"游戏状态已重置：清空了{old_results_len}个猜测结果，保留了{len(self.accumulated_constraints)}个约束条件")
         print(f"当前约束条件: {json.dumps(self.accumulated_constraints, indent=2)}")
@@ -920,6 +1110,11 @@ class BlastTvGameClient:
                 print(f"键 '{key}' 使用精确约束 {value['exact']}")
                 continue
                 
+            # 已有精确约束时，排除类约束不会提供更多信息
+            if ('exact' in existing or 'region' in existing) and not ('exact' in value or 'region' in value) \
+                    and ('exclude' in value or 'exclude_list' in value):
+                continue
+            
             # 2. 排除类约束 ('exclude', 'exclude_list')
             if ('exclude' in value or 'exclude_list' in value) and ('exclude' in existing or 'exclude_list' in existing):
                 # 合并两个排除列表
@@ -999,79 +1194,179 @@ class BlastTvGameClient:
         print(f"合并约束条件结果: {json.dumps(result, indent=2)}")
         return result
     
+    async def _precompute_follow_ups(self, guess: Dict, base_results: List[Dict]) -> Dict:
+        """在猜测结果返回之前，为每种可能的反馈预先计算下一个猜测"""
+        guessed_player_ids = self.excluded_player_ids(base_results)
+        guessed_player_ids.add(guess.get('id'))
+        
+        # 使用与get_next_guess相同的候选集合推算可能出现的反馈
+        async with self.solver_turn():
+            outcomes = await solver_pool.feedback_outcomes(
+                guess, guessed_player_ids, self.combined_constraints(base_results), self.countries_data,
+                self.players_dataset())
+        
+        table = {}
+        # 先计算可能性最大的反馈，结果提前返回时更容易命中
+        for feedback in outcomes:
+            # 每个分支之间让出事件循环，不影响猜测结果的接收
+            await asyncio.sleep(0)
+            async with self.solver_turn():
+                hypothetical = feedback_to_result(guess, feedback)
+                hypothetical['constraints'] = self.parse_guess_result(hypothetical)
+                table[feedback] = (hypothetical['constraints'],
+                                   await self._select_next_guess(base_results + [hypothetical]))
+        print(f"已为 {len(table)} 种可能的反馈预先计算下一个猜测")
+        return table
+    
+    def _take_follow_up(self, task: Optional[asyncio.Task], guess: Dict, base_len: int,
+                        opponent_len: int = 0) -> Optional[Dict]:
+        """根据实际的猜测结果从预计算表中取出下一个猜测，未命中时返回None"""
+        if task is None:
+            return None
+        if not task.done():
+            task.cancel()
+            print("预计算尚未完成，直接计算下一个猜测")
+            return None
+        if task.cancelled() or task.exception() is not None:
+            return None
+        
+        # 只有当前轮次正好多了这一次猜测的结果时才能使用预计算表
+        if len(self.guess_results) != base_len + 1 or self.guess_results[-1].get('id') != guess.get('id'):
+            return None
+        # 等待期间收到对手的新反馈时，预计算的结果不再是最优的
+        if len(self.opponent_results) != opponent_len:
+            return None
+        actual = self.guess_results[-1]
+        entry = task.result().get(feedback_from_result(actual))
+        if not entry:
+            return None
+        
+        # 预计算时假设的约束条件必须与实际结果解析出的一致（队伍按ID比较）
+        constraints, next_player = entry
+        if constraints_key(constraints) != constraints_key(actual.get('constraints') or {}):
+            return None
+        print("⚡ 命中预计算的下一个猜测")
+        return next_player
+    
     async def start_auto_guessing(self, max_guesses=8):
         """开始自动猜测流程"""
         # 总是重置猜测状态和成功标志
-        guess_count = 0
+        guess_count = 0  # 上游接受并返回结果的猜测次数
+        failures = 0  # 连续被拒绝、超时或发送失败的次数
         self.guess_success = False
         
         # 确保注册适当的处理器
         self.register_handler("GUESS_RESULT", self.handle_guess_result)
         self.register_handler("all", self.process_game_messages)
         
-        while not self.guess_success and guess_count < max_guesses:
-            guess_count += 1
-            
-            try:
-                # 获取下一个最佳猜测
-                next_player = await self.get_next_guess()
-                if not next_player:
-                    print("没有找到合适的猜测候选人，中止猜测")
+        # 上一次猜测在等待结果期间预计算的后续猜测
+        follow_up_task = None
+        last_guess = None
+        last_base_len = 0
+        last_opponent_len = 0
+        
+        try:
+            while not self.guess_success and guess_count < max_guesses:
+                if failures >= MAX_CONSECUTIVE_FAILURES:
+                    print(f"连续 {failures} 次猜测被拒绝或失败，中止猜测")
                     return False
-                    
-                player_id = next_player.get('id')
-                if not player_id:
-                    print("错误: 候选人缺少ID，跳过")
-                    continue
-                
-                print(f"自动猜测 [{guess_count}/{max_guesses}]: {next_player.get('nickname')} ({next_player.get('firstName', '')} {next_player.get('lastName', '')})")
                 
-                # 发送猜测请求
-                self.guessing = True
-                success = await self.send_guess(player_id)
-                if not success:
-                    print("发送猜测失败，重试...")
-                    self.guessing = False
-                    await asyncio.sleep(2)
-                    continue
-                
-                # 等待猜测结果
-                max_wait = 15  # 最多等待15秒
-                wait_time = 0
-                while self.guessing and wait_time < max_wait:
-                    await asyncio.sleep(0.5)
-                    wait_time += 0.5
+                try:
+                    # 优先使用预计算的结果，未命中时再计算下一个最佳猜测
+                    next_player = self._take_follow_up(follow_up_task, last_guess, last_base_len, last_opponent_len)
+                    follow_up_task = None
+                    if not next_player:
+                        next_player = await self.get_next_guess()
+                    if not next_player:
+                        print("没有找到合适的猜测候选人，中止猜测")
+                        return False
+                        
+                    player_id = next_player.get('id')
+                    if not player_id:
+                        print("错误: 候选人缺少ID，跳过")
+                        failures += 1
+                        continue
                     
-                    # 每隔1秒检查一次消息队列，并处理所有消息
-                    if int(wait_time) != int(wait_time - 0.5):
-                        messages = list(self.message_queue)  # 复制队列而不清空
-                        for msg in messages:
-                            if msg.get('type') == 'GUESS_RESULT' or 'players' in msg:
-                                await self.handle_guess_result(msg)
-                
-                # 检查猜测是否成功
-                if self.guess_success:
-                    return True
-                
-                # 猜测间隔，避免请求过于频繁
-                await asyncio.sleep(1)
-                
-            except Exception as e:
-                print(f"猜测过程中出错: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                await asyncio.sleep(3)  # 出错后稍等片刻再继续
-        
-        return self.guess_success
+                    print(f"自动猜测 [{guess_count + 1}/{max_guesses}]: {next_player.get('nickname')} ({next_player.get('firstName', '')} {next_player.get('lastName', '')})")
+                    
+                    # 发送猜测请求
+                    self.guessing = True
+                    self.guess_result_event.clear()
+                    rejected_before = self.pacer.rejected
+                    success = await self.send_guess(player_id)
+                    if not success:
+                        print("发送猜测失败，重试...")
+                        self.guessing = False
+                        self.pacer.error("发送失败")
+                        failures += 1
+                        await asyncio.sleep(self.pacer.delay())
+                        continue
+                    self.pacer.guess_sent()
+                    
+                    # 利用等待结果的时间预计算每种反馈下的下一个猜测
+                    last_guess = next_player
+                    last_base_len = len(self.guess_results)
+                    last_opponent_len = len(self.opponent_results)
+                    follow_up_task = asyncio.create_task(
+                        self._precompute_follow_ups(next_player, list(self.guess_results)))
+                    
+                    # 等待消息处理任务处理完猜测结果
+                    await self.wait_for_guess_result(timeout=15)
+                    
+                    if self.guessing:
+                        # 超时没有收到结果，按被拒绝处理
+                        self.guessing = False
+                        self.pacer.rejected_by_server("结果超时")
+                        failures += 1
+                    elif self.pacer.rejected == rejected_before:
+                        # 只有上游接受的猜测计入猜测次数
+                        self.pacer.result_received()
+                        guess_count += 1
+                        failures = 0
+                    else:
+                        failures += 1
+                    
+                    # 检查猜测是否成功
+                    if self.guess_success:
+                        return True
+                    
+                    # 按自适应间隔等待，避免请求过于频繁
+                    await asyncio.sleep(self.pacer.delay())
+                    
+                except Exception as e:
+                    print(f"猜测过程中出错: {str(e)}")
+                    import traceback
+                    traceback.print_exc()
+                    self.pacer.error(str(e))
+                    failures += 1
+                    await asyncio.sleep(self.pacer.delay())  # 出错后退避再继续
+            
+            return self.guess_success
+        finally:
+            if follow_up_task is not None and not follow_up_task.done():
+                follow_up_task.cancel()
     
+    async def wait_for_guess_result(self, timeout: float) -> bool:
+        """等待消息处理任务处理完当前猜测的结果，超时返回False"""
+        if not self.guessing:
+            return True
+        try:
+            await asyncio.wait_for(self.guess_result_event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
     async def stop_receiver(self):
-        """停止消息接收器"""
+        """停止消息接收器和消息处理任务"""
         self.stop_receiving = True
-        if self.receiver_task:
-            self.receiver_task.cancel()
-            try:
-                await self.receiver_task
-            except asyncio.CancelledError:
-                pass
+        for task in (self.receiver_task, self.consumer_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        if self.receiver_task or self.consumer_task:
             self.receiver_task = None
+            self.consumer_task = None
             print("消息接收器已停止")
\ No newline at end of file
@@ -0,0 +1,92 @@
+import time
+from typing import Any, Dict, Optional
+
+# 间隔的上下限（秒）
+MIN_INTERVAL = 0.0
+MAX_INTERVAL = 10.0
+INITIAL_INTERVAL = 0.25
+# 没有拒绝信号时每次成功缩短的比例，以及被拒绝后的放大倍数
+DECREASE_FACTOR = 0.5
+BACKOFF_FACTOR = 2.0
+# 被拒绝时的间隔乘以该系数作为学习到的安全下限
+FLOOR_MARGIN = 1.5
+# 连续成功多少次后放宽一次学习到的下限，允许重新试探更短的间隔
+FLOOR_DECAY_AFTER = 8
+FLOOR_DECAY = 0.8
+LATENCY_ALPHA = 0.3
+
+
+class GuessPacer:
+    """根据猜测结果的延迟和上游的拒绝信号自适应调整两次猜测之间的间隔
+
+    没有拒绝时间隔按比例缩短到学习到的下限；被拒绝、限流或超时时按倍数退避，
+    并把当时的间隔记为新的安全下限。
+    """
+
+    def __init__(self, initial: float = INITIAL_INTERVAL, min_interval: float = MIN_INTERVAL,
+                 max_interval: float = MAX_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = initial
+        self.floor = min_interval
+        self.latency: Optional[float] = None  # 结果延迟的指数移动平均
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = 0
+        self.streak = 0
+        self.last_signal: Optional[str] = None
+        self._sent_at: Optional[float] = None
+
+    def _clamp(self, value: float) -> float:
+        return min(self.max_interval, max(self.min_interval, value))
+
+    def delay(self) -> float:
+        """下一次猜测前需要等待的秒数"""
+        return self.interval
+
+    def guess_sent(self):
+        self._sent_at = time.monotonic()
+
+    def result_received(self):
+        """收到猜测结果，更新延迟统计并缩短间隔"""
+        if self._sent_at is not None:
+            latency = time.monotonic() - self._sent_at
+            self.latency = latency if self.latency is None else \
+                LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * self.latency
+            self._sent_at = None
+
+        self.accepted += 1
+        self.streak += 1
+        if self.streak % FLOOR_DECAY_AFTER == 0:
+            self.floor = max(self.min_interval, self.floor * FLOOR_DECAY)
+        self.interval = self._clamp(max(self.floor, self.interval * DECREASE_FACTOR))
+
+    def rejected_by_server(self, reason: str):
+        """上游拒绝猜测、限流或结果超时，记录安全下限并退避"""
+        self._sent_at = None
+        self.rejected += 1
+        self.streak = 0
+        self.last_signal = reason
+        # 如果已经在退避中，当前间隔本身就可能不安全，下限至少要覆盖一次结果延迟
+        self.floor = self._clamp(max(self.floor, self.interval * FLOOR_MARGIN, self.latency or 0))
+        self.interval = self._clamp(max(self.floor, self.interval * BACKOFF_FACTOR, 0.5))
+        print(f"猜测被上游拒绝({reason})，猜测间隔调整为 {self.interval:.2f} 秒")
+
+    def error(self, reason: str):
+        """本地发送失败或处理出错，只退避不改变学习到的下限"""
+        self._sent_at = None
+        self.errors += 1
+        self.streak = 0
+        self.last_signal = reason
+        self.interval = self._clamp(max(self.interval * BACKOFF_FACTOR, 0.5))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "interval": round(self.interval, 3),
+            "floor": round(self.floor, 3),
+            "latency": None if self.latency is None else round(self.latency, 3),
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "last_signal": self.last_signal,
+        }
@@ -0,0 +1,315 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.core.player_snapshot import PlayerSnapshot
+
+SNAPSHOT_SUFFIX = ".bin"
+DEFAULT_PLAYERS_FILE = "players_with_entropy.json"
+# scripts/build_dataset.py生成的数据集清单
+MANIFEST_FILE = os.environ.get("DATASET_MANIFEST", "dataset_manifest.json")
+# 后台检查数据集新版本的间隔（秒），0表示不检查
+WATCH_INTERVAL = float(os.environ.get("DATASET_WATCH_INTERVAL", "5"))
+# 保留的最近数据集版本数量，轮次进行中的房间仍可能使用旧版本
+RETAINED_VERSIONS = 3
+# 后台检查运行时，每个版本复制一份以版本号命名的文件，数据文件被替换后求解器工作进程仍能加载旧版本
+VERSIONS_DIR = os.environ.get("DATASET_VERSIONS_DIR") or os.path.join(
+    tempfile.gettempdir(), f"friberg-datasets-{os.getpid()}")
+
+
+class Dataset:
+    """一个版本的玩家数据及其派生索引，热替换时整体切换"""
+
+    def __init__(self, path: str, signature: Tuple[int, int], version: str, players: Sequence[Dict[str, Any]]):
+        self.path = path
+        self.signature = signature
+        self.version = version
+        self.players = players
+        self.indexes: Dict[str, Any] = {}
+        self.loaded_at = time.time()
+        # 求解器工作进程加载的文件，保留了版本副本时为副本路径
+        self.worker_path = path
+
+
+# 按文件路径缓存已解析的数据集，文件未变化时直接复用
+_players_cache: Dict[str, Dataset] = {}
+_manifest_cache: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+# 最近的数据集版本: 版本号 -> 数据集
+_versions: "OrderedDict[str, Dataset]" = OrderedDict()
+# 派生索引的构建函数，新版本在后台切换前预先构建: 索引名 -> 构建函数(玩家列表)
+_index_builders: Dict[str, Callable[[Sequence[Dict[str, Any]]], Any]] = {}
+
+_current: Optional[Dataset] = None
+_watcher: Optional[asyncio.Task] = None
+_retain_copies = False  # 后台检查运行时为新加载的版本保留副本
+_WHITESPACE = re.compile(r"\s*")
+
+
+def _file_signature(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def load_manifest(manifest_file: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """读取数据集清单，不存在时返回None；未指定时使用调用时的MANIFEST_FILE"""
+    if manifest_file is None:
+        manifest_file = MANIFEST_FILE
+    try:
+        signature = _file_signature(manifest_file)
+    except OSError:
+        return None
+    cached = _manifest_cache.get(manifest_file)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except Exception as e:
+        print(f"读取数据集清单失败: {str(e)}")
+        return None
+    _manifest_cache[manifest_file] = (signature, manifest)
+    return manifest
+
+
+def resolve_players_file(players_file: Optional[str] = None) -> str:
+    """确定玩家数据文件: 显式指定 > 清单中的二进制快照 > 清单中的JSON文件 > 默认文件"""
+    if players_file:
+        return players_file
+    manifest = load_manifest()
+    if manifest:
+        manifest_dir = os.path.dirname(MANIFEST_FILE)
+        snapshot_file = manifest.get('snapshot_file')
+        if snapshot_file and os.path.exists(os.path.join(manifest_dir, snapshot_file)):
+            return os.path.join(manifest_dir, snapshot_file)
+        if manifest.get('players_file'):
+            return os.path.join(manifest_dir, manifest['players_file'])
+    return DEFAULT_PLAYERS_FILE
+
+
+def _parse_players(text: str) -> List[Dict[str, Any]]:
+    """逐个解析JSON数组中的玩家，后台线程解析大文件时不会长时间占用GIL"""
+    decoder = json.JSONDecoder()
+    index = _WHITESPACE.match(text, 0).end()
+    if not text.startswith("[", index):
+        return json.loads(text)
+    players = []
+    index = _WHITESPACE.match(text, index + 1).end()
+    if text.startswith("]", index):
+        return players
+    while True:
+        player, index = decoder.raw_decode(text, index)
+        players.append(player)
+        index = _WHITESPACE.match(text, index).end()
+        if text.startswith(",", index):
+            index = _WHITESPACE.match(text, index + 1).end()
+        elif text.startswith("]", index):
+            return players
+        else:
+            raise ValueError(f"玩家数据格式错误，位置 {index}")
+
+
+def _version_copy(path: str, version: str) -> str:
+    return os.path.join(VERSIONS_DIR, version + os.path.splitext(path)[1])
+
+
+def _read_dataset(path: str, incremental: bool = False) -> Dataset:
+    signature = _file_signature(path)
+    copy_path = None
+    if path.endswith(SNAPSHOT_SUFFIX):
+        if _retain_copies:
+            # 先复制再从副本读取版本号，复制期间文件被替换也不会把新内容记为旧版本
+            os.makedirs(VERSIONS_DIR, exist_ok=True)
+            tmp_path = os.path.join(VERSIONS_DIR, f"loading-{os.getpid()}{SNAPSHOT_SUFFIX}")
+            shutil.copyfile(path, tmp_path)
+            players = PlayerSnapshot(tmp_path)
+            copy_path = _version_copy(path, players.version)
+            os.replace(tmp_path, copy_path)
+        else:
+            # 二进制快照按需从内存映射中读取字段，启动时不解析全部玩家
+            players = PlayerSnapshot(path)
+        version = players.version
+    else:
+        with open(path, 'rb') as f:
+            raw = f.read()
+        version = hashlib.sha1(raw).hexdigest()[:12]
+        players = _parse_players(raw.decode('utf-8')) if incremental else json.loads(raw.decode('utf-8'))
+        if _retain_copies:
+            copy_path = _version_copy(path, version)
+            if not os.path.exists(copy_path):
+                os.makedirs(VERSIONS_DIR, exist_ok=True)
+                with open(f"{copy_path}.tmp", 'wb') as f:
+                    f.write(raw)
+                os.replace(f"{copy_path}.tmp", copy_path)
+    manifest = load_manifest()
+    if manifest and resolve_players_file() == path and manifest.get('version') != version:
+        print(f"⚠️ 玩家数据版本 {version} 与数据集清单版本 {manifest.get('version')} 不一致")
+    dataset = Dataset(path, signature, version, players)
+    if copy_path:
+        dataset.worker_path = copy_path
+    return dataset
+
+
+def _remember(dataset: Dataset):
+    _players_cache[dataset.path] = dataset
+    _versions[dataset.version] = dataset
+    _versions.move_to_end(dataset.version)
+    while len(_versions) > RETAINED_VERSIONS:
+        _, old = _versions.popitem(last=False)
+        if _players_cache.get(old.path) is old:
+            del _players_cache[old.path]
+        if old.worker_path != old.path:
+            try:
+                os.remove(old.worker_path)
+            except OSError:
+                pass
+
+
+def _load(path: str) -> Dataset:
+    """读取并缓存玩家数据，文件未变化时直接复用已解析的结果"""
+    signature = _file_signature(path)
+    cached = _players_cache.get(path)
+    if cached and cached.signature == signature:
+        return cached
+
+    dataset = _read_dataset(path)
+    _remember(dataset)
+    print(f"已加载玩家数据 {path}: {len(dataset.players)} 名玩家 (版本 {dataset.version})")
+    return dataset
+
+
+def current_dataset() -> Dataset:
+    """当前生效的数据集
+
+    后台检查运行时，新版本只由watch_dataset在构建完成后切换，请求路径上不会重新加载；
+    未运行时（脚本、基准测试）与以前一样，每次调用检查文件是否变化。
+    """
+    global _current
+    if _current is None or _watcher is None:
+        _current = _load(resolve_players_file())
+    return _current
+
+
+def load_dataset(players_file: Optional[str] = None) -> Dataset:
+    """获取指定文件的数据集，未指定时为当前生效的数据集"""
+    if players_file:
+        return _load(players_file)
+    return current_dataset()
+
+
+def load_players(players_file: Optional[str] = None) -> Sequence[Dict[str, Any]]:
+    """获取玩家列表（只读共享，调用方不要修改其中的玩家）"""
+    return load_dataset(players_file).players
+
+
+def dataset_version(players_file: Optional[str] = None) -> str:
+    """获取玩家数据的内容版本号"""
+    return load_dataset(players_file).version
+
+
+def players_for_version(path: str, version: str) -> Optional[Sequence[Dict[str, Any]]]:
+    """获取指定版本的玩家数据（在求解器工作进程中调用，path为Dataset.worker_path）；
+    该版本已不在内存中，且文件已被替换或版本副本已被清理时返回None"""
+    dataset = _versions.get(version)
+    if dataset is None:
+        try:
+            dataset = _load(path)
+        except OSError:
+            return None
+    return dataset.players if dataset.version == version else None
+
+
+def register_index(name: str, builder: Callable[[Sequence[Dict[str, Any]]], Any]):
+    """注册派生索引，新版本切换前在后台构建"""
+    _index_builders[name] = builder
+
+
+def get_index(dataset: Dataset, name: str) -> Any:
+    """获取数据集的派生索引，尚未构建时立即构建"""
+    index = dataset.indexes.get(name)
+    if index is None:
+        index = dataset.indexes[name] = _index_builders[name](dataset.players)
+    return index
+
+
+def _build_dataset(path: str) -> Dataset:
+    """在后台线程中加载新版本并构建全部派生索引"""
+    dataset = _read_dataset(path, incremental=True)
+    for name, builder in list(_index_builders.items()):
+        dataset.indexes[name] = builder(dataset.players)
+    return dataset
+
+
+async def watch_dataset(interval: float = WATCH_INTERVAL):
+    """定期检查数据文件，发现新版本后在后台构建，完成后原子地切换为当前数据集"""
+    global _current
+    loop = asyncio.get_running_loop()
+    failed = None
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            path = resolve_players_file()
+            signature = _file_signature(path)
+            current = current_dataset()
+            if (path, signature) in ((current.path, current.signature), failed):
+                continue
+
+            start = time.perf_counter()
+            dataset = await loop.run_in_executor(None, _build_dataset, path)
+            if dataset.version == current.version and dataset.path == current.path:
+                # 文件被重写但内容未变化
+                current.signature = dataset.signature
+                continue
+            _remember(dataset)
+            _current = dataset
+            failed = None
+            print(f"🔄 已切换到玩家数据版本 {dataset.version} ({len(dataset.players)} 名玩家，"
+                  f"后台构建耗时 {time.perf_counter() - start:.2f} 秒)，进行中的轮次继续使用版本 {current.version}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            failed = (path, signature)
+            print(f"加载新的玩家数据失败，继续使用版本 {_current.version if _current else '无'}: {str(e)}")
+
+
+def start_watcher(interval: float = WATCH_INTERVAL) -> bool:
+    """启动后台检查任务（需要在事件循环中调用）"""
+    global _current, _watcher, _retain_copies
+    if interval <= 0 or _watcher is not None:
+        return False
+    _retain_copies = True
+    if _current is not None and _current.worker_path == _current.path:
+        # 启动检查前已加载的版本没有副本，重新加载一次
+        _players_cache.pop(_current.path, None)
+        _current = None
+    current_dataset()
+    _watcher = asyncio.get_running_loop().create_task(watch_dataset(interval))
+    return True
+
+
+def stop_watcher():
+    global _watcher, _retain_copies
+    if _watcher is not None:
+        _watcher.cancel()
+        _watcher = None
+        _retain_copies = False
+        shutil.rmtree(VERSIONS_DIR, ignore_errors=True)
+
+
+def dataset_status() -> Dict[str, Any]:
+    dataset = current_dataset()
+    return {
+        "version": dataset.version,
+        "path": dataset.path,
+        "players": len(dataset.players),
+        "loaded_at": dataset.loaded_at,
+        "retained_versions": list(_versions),
+        "watching": _watcher is not None,
+    }
@@ -0,0 +1,170 @@
+import bisect
+import heapq
+import itertools
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.player_data import get_index, load_dataset, register_index
+
+SEARCH_FIELDS = ("nickname", "firstName", "lastName")
+NGRAM = 3
+SHORT_PREFIX = NGRAM  # 不超过该长度的前缀预先建好有序结果列表
+# NFKD分解后仍不含基本拉丁字母的常见字符
+_FOLD = str.maketrans({"ø": "o", "ł": "l", "đ": "d", "ß": "ss", "æ": "ae", "œ": "oe", "ı": "i", "þ": "th"})
+
+# 结果相关度，数值越小越靠前
+TIER_EXACT = 0       # 昵称完全匹配
+TIER_NICK_PREFIX = 1  # 昵称前缀匹配
+TIER_NAME_PREFIX = 2  # 名字中某个词的前缀匹配
+TIER_SUBSTRING = 3    # 任意位置包含
+
+
+def normalize(text: Optional[str]) -> str:
+    """转为小写并去掉重音符号，例如 "Dörtkardeş" -> "dortkardes" """
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(text).casefold())
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return stripped.translate(_FOLD)
+
+
+def _ngrams(text: str) -> set:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class PlayerSearchIndex:
+    """昵称和姓名的前缀索引与三元组索引，构建一次后每次查询只访问匹配的玩家
+
+    短前缀（不超过SHORT_PREFIX个字符）的匹配结果预先按熵值排好序，分页时只需切片；
+    更长的前缀用有序词表二分查找，任意位置的子串用三元组倒排表求交集。
+    """
+
+    def __init__(self, players: Sequence[Dict[str, Any]]):
+        self.players = players
+        count = len(players)
+        # 同等相关度下按熵值从高到低排列；按该顺序建索引，倒排表天然有序
+        order = sorted(range(count), key=lambda row: -(players[row].get("entropy_value") or 0))
+        self.rank = [0] * count
+        for position, row in enumerate(order):
+            self.rank[row] = position
+
+        self.nicknames = [normalize(player.get("nickname")) for player in players]
+        self.texts = [" ".join(normalize(player.get(field)) for field in SEARCH_FIELDS).strip()
+                      for player in players]
+
+        self._exact: Dict[str, List[int]] = {}
+        self._nick_prefix: Dict[str, List[int]] = {}
+        self._name_prefix: Dict[str, List[int]] = {}
+        prefix_entries: List[Tuple[str, int]] = []
+        grams: Dict[str, set] = {}
+        for row in order:
+            nickname = self.nicknames[row]
+            text = self.texts[row]
+            self._exact.setdefault(nickname, []).append(row)
+            nick_prefixes = {nickname[:n] for n in range(1, min(len(nickname), SHORT_PREFIX) + 1)}
+            for prefix in nick_prefixes:
+                self._nick_prefix.setdefault(prefix, []).append(row)
+
+            name_prefixes = set()
+            for token in set(text.split()):
+                prefix_entries.append((token, row))
+                name_prefixes.update(token[:n] for n in range(1, min(len(token), SHORT_PREFIX) + 1))
+            for prefix in name_prefixes - nick_prefixes:
+                self._name_prefix.setdefault(prefix, []).append(row)
+
+            for gram in _ngrams(text):
+                grams.setdefault(gram, set()).add(row)
+
+        prefix_entries.sort()
+        self._tokens = [token for token, _ in prefix_entries]
+        self._token_rows = [row for _, row in prefix_entries]
+        self._grams = {gram: frozenset(rows) for gram, rows in grams.items()}
+
+    def _prefix_rows(self, prefix: str) -> set:
+        start = bisect.bisect_left(self._tokens, prefix)
+        end = bisect.bisect_left(self._tokens, prefix + "\uffff", start)
+        return set(self._token_rows[start:end])
+
+    def _substring_rows(self, query: str) -> set:
+        """用三元组倒排表从最少的开始求交集得到候选，再逐个确认包含关系"""
+        postings = []
+        for gram in _ngrams(query):
+            rows = self._grams.get(gram)
+            if rows is None:
+                return set()
+            postings.append(rows)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for rows in postings[1:]:
+            candidates &= rows
+            if not candidates:
+                break
+        if len(query) == NGRAM:
+            return candidates
+        return {row for row in candidates if query in self.texts[row]}
+
+    def _search_short(self, query: str, limit: int, offset: int) -> Tuple[List[int], int]:
+        """短查询: 直接在预排序的列表上分页"""
+        exact = self._exact.get(query, [])
+        nick = self._nick_prefix.get(query, [])
+        name = self._name_prefix.get(query, [])
+        gram_rows = self._grams.get(query, frozenset()) if len(query) == NGRAM else frozenset()
+
+        def substring_rows():
+            # 只有翻页到子串匹配部分时才需要计算
+            prefix_rows = set(nick).union(name)
+            yield from sorted((row for row in gram_rows if row not in prefix_rows), key=self.rank.__getitem__)
+
+        tiers = itertools.chain(
+            exact,
+            (row for row in nick if self.nicknames[row] != query),
+            name,
+            substring_rows(),
+        )
+        # 三元组倒排表已包含所有前缀匹配的玩家
+        total = len(gram_rows) if gram_rows else len(nick) + len(name)
+        return list(itertools.islice(tiers, offset, offset + limit)), total
+
+    def _tier(self, row: int, query: str) -> int:
+        nickname = self.nicknames[row]
+        if nickname == query:
+            return TIER_EXACT
+        if nickname.startswith(query):
+            return TIER_NICK_PREFIX
+        return TIER_NAME_PREFIX
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """返回(当前页的玩家, 匹配总数)"""
+        query = " ".join(normalize(query).split())
+        if not query:
+            return [], 0
+
+        if " " not in query and len(query) <= SHORT_PREFIX:
+            page, total = self._search_short(query, limit, offset)
+            return [self.players[row] for row in page], total
+
+        if " " in query:
+            # 多个词时按完整文本的子串匹配，例如 "oleksandr kostyliev"
+            matched = {row: TIER_SUBSTRING for row in self._substring_rows(query)}
+        else:
+            matched = {row: self._tier(row, query) for row in self._prefix_rows(query)}
+            for row in self._substring_rows(query):
+                matched.setdefault(row, TIER_SUBSTRING)
+
+        page = heapq.nsmallest(offset + limit, matched, key=lambda row: (matched[row], self.rank[row]))[offset:]
+        return [self.players[row] for row in page], len(matched)
+
+
+def _build_search_index(players: Sequence[Dict[str, Any]]) -> PlayerSearchIndex:
+    index = PlayerSearchIndex(players)
+    print(f"已构建玩家搜索索引: {len(index.players)} 名玩家")
+    return index
+
+
+# 新的数据集版本在后台切换前预先构建搜索索引
+register_index("search", _build_search_index)
+
+
+def get_search_index(players_file: Optional[str] = None) -> PlayerSearchIndex:
+    """返回当前数据集的搜索索引，随数据集版本一起切换"""
+    return get_index(load_dataset(players_file), "search")
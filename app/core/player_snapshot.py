@@ -0,0 +1,224 @@
+import math
+import mmap
+import struct
+import sys
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional
+
+# 文件布局（小端序）:
+#   头部  magic, 格式版本, 玩家数量, 字符串数量, 字符串区字节数, 数据版本号(16字节)
+#   字符串偏移表 uint32 * (字符串数量 + 1)
+#   字符串区 UTF-8
+#   定长列，每列按8字节对齐，顺序见COLUMNS
+MAGIC = b"BLSTPLR1"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIII16s")
+NONE_INDEX = 0xFFFFFFFF  # 字符串列中表示None
+NONE_INT = -1            # 整数列中表示None
+
+# (列名, struct格式)；字符串列存储字符串表中的下标
+COLUMNS = (
+    ("id", "I"),
+    ("nickname", "I"),
+    ("firstName", "I"),
+    ("lastName", "I"),
+    ("image_url", "I"),
+    ("nationality", "I"),
+    ("role", "I"),
+    ("team_id", "I"),
+    ("team_name", "I"),
+    ("team_shortName", "I"),
+    ("entropy_value", "d"),
+    ("entropy_rank", "i"),
+    ("age", "h"),
+    ("majorAppearances", "h"),
+    ("isRetired", "b"),
+)
+STRING_COLUMNS = {"id", "nickname", "firstName", "lastName", "image_url", "nationality", "role",
+                  "team_id", "team_name", "team_shortName"}
+
+# 还原出的玩家字段，与players_with_entropy.json中的字段一致
+PLAYER_FIELDS = ("id", "nickname", "firstName", "lastName", "isRetired", "nationality", "team",
+                 "age", "majorAppearances", "role", "entropy_rank", "entropy_value", "image_url")
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _column_layout(count: int, start: int) -> Dict[str, int]:
+    layout = {}
+    offset = start
+    for name, fmt in COLUMNS:
+        offset = _align(offset)
+        layout[name] = offset
+        offset += struct.calcsize(fmt) * count
+    return layout
+
+
+def encode_snapshot(players: List[Dict[str, Any]], version: str) -> bytes:
+    """把玩家列表编码为二进制快照"""
+    strings: Dict[str, int] = {}
+
+    def intern(value) -> int:
+        if value is None:
+            return NONE_INDEX
+        return strings.setdefault(str(value), len(strings))
+
+    def int_or_none(value) -> int:
+        return NONE_INT if value is None else int(value)
+
+    columns: Dict[str, list] = {name: [] for name, _ in COLUMNS}
+    for player in players:
+        team = player.get("team") if isinstance(player.get("team"), dict) else None
+        for name in ("id", "nickname", "firstName", "lastName", "image_url", "nationality", "role"):
+            columns[name].append(intern(player.get(name)))
+        columns["team_id"].append(intern(team.get("id")) if team else NONE_INDEX)
+        columns["team_name"].append(intern(team.get("name")) if team else NONE_INDEX)
+        columns["team_shortName"].append(intern(team.get("shortName")) if team else NONE_INDEX)
+        entropy = player.get("entropy_value")
+        columns["entropy_value"].append(math.nan if entropy is None else float(entropy))
+        columns["entropy_rank"].append(int_or_none(player.get("entropy_rank")))
+        columns["age"].append(int_or_none(player.get("age")))
+        columns["majorAppearances"].append(int_or_none(player.get("majorAppearances")))
+        retired = player.get("isRetired")
+        columns["isRetired"].append(NONE_INT if retired is None else int(bool(retired)))
+
+    encoded_strings = [s.encode("utf-8") for s in strings]
+    offsets = [0]
+    for data in encoded_strings:
+        offsets.append(offsets[-1] + len(data))
+    blob = b"".join(encoded_strings)
+
+    count = len(players)
+    buffer = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, count, len(encoded_strings), len(blob),
+                                   version.encode("ascii")[:16]))
+    buffer += struct.pack(f"<{len(offsets)}I", *offsets)
+    buffer += blob
+
+    layout = _column_layout(count, len(buffer))
+    for name, fmt in COLUMNS:
+        buffer += b"\0" * (layout[name] - len(buffer))
+        buffer += struct.pack(f"<{count}{fmt}", *columns[name])
+    return bytes(buffer)
+
+
+class PlayerRecord(Mapping):
+    """快照中一名玩家的只读视图，按需从列中读取字段，用法与玩家字典相同"""
+
+    __slots__ = ("_snapshot", "_row")
+
+    def __init__(self, snapshot: "PlayerSnapshot", row: int):
+        self._snapshot = snapshot
+        self._row = row
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._snapshot._field(self._row, key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        for key in PLAYER_FIELDS:
+            if self._snapshot._field(self._row, key) is not _MISSING:
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"PlayerRecord({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+
+_MISSING = object()
+
+
+class PlayerSnapshot(Sequence):
+    """以内存映射方式读取的玩家快照，多个进程共享同一份页缓存"""
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise RuntimeError("玩家快照只支持小端序平台")
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+
+        magic, format_version, count, string_count, blob_len, version = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"不支持的玩家快照格式: {path}")
+        self.version = version.rstrip(b"\0").decode("ascii")
+        self._count = count
+
+        offsets_start = HEADER.size
+        blob_start = offsets_start + (string_count + 1) * 4
+        self._string_offsets = view[offsets_start:blob_start].cast("I")
+        self._blob = view[blob_start:blob_start + blob_len]
+
+        layout = _column_layout(count, blob_start + blob_len)
+        self._columns = {}
+        for name, fmt in COLUMNS:
+            start = layout[name]
+            self._columns[name] = view[start:start + struct.calcsize(fmt) * count].cast(fmt)
+        self._string = lru_cache(maxsize=8192)(self._decode_string)
+
+    def _decode_string(self, index: int) -> str:
+        return bytes(self._blob[self._string_offsets[index]:self._string_offsets[index + 1]]).decode("utf-8")
+
+    def _optional_string(self, column: str, row: int) -> Optional[str]:
+        index = self._columns[column][row]
+        return None if index == NONE_INDEX else self._string(index)
+
+    def _optional_int(self, column: str, row: int) -> Optional[int]:
+        value = self._columns[column][row]
+        return None if value == NONE_INT else value
+
+    def _field(self, row: int, key: str) -> Any:
+        if key == "team":
+            if self._columns["team_id"][row] == NONE_INDEX:
+                return None
+            return {
+                "id": self._optional_string("team_id", row),
+                "name": self._optional_string("team_name", row),
+                "shortName": self._optional_string("team_shortName", row),
+            }
+        if key == "image_url":
+            # 原始数据中没有图片的玩家不包含该字段
+            value = self._optional_string(key, row)
+            return _MISSING if value is None else value
+        if key in STRING_COLUMNS:
+            return self._optional_string(key, row)
+        if key == "entropy_value":
+            value = self._columns[key][row]
+            return None if math.isnan(value) else value
+        if key == "isRetired":
+            value = self._columns[key][row]
+            return None if value == NONE_INT else bool(value)
+        if key in ("entropy_rank", "age", "majorAppearances"):
+            return self._optional_int(key, row)
+        return _MISSING
+
+    def column(self, name: str) -> memoryview:
+        """直接访问某一列的原始数据（字符串列为字符串表下标）"""
+        return self._columns[name]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [PlayerRecord(self, row) for row in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return PlayerRecord(self, index)
+
+    def __iter__(self) -> Iterator[PlayerRecord]:
+        for row in range(self._count):
+            yield PlayerRecord(self, row)
+
@@ -0,0 +1,106 @@
+import contextlib
+import cProfile
+import os
+import re
+import time
+import uuid
+from typing import Dict, List, Optional
+
+# 是否启用性能分析入口；未启用时不注册中间件和管理接口，没有任何额外开销
+PROFILING_ENABLED = os.environ.get("ENABLE_PROFILING", "").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_HEADER = "x-profile"
+MAX_PROFILES = 50
+
+_PROFILE_ID_PATTERN = re.compile(r"^[\w.-]+\.prof$")
+# cProfile在同一线程内不能嵌套启用，同一时间只允许一个采集会话
+_active_session: Optional["ProfileSession"] = None
+
+
+class ProfileSession:
+    """一次cProfile采集，结束后保存为可下载的.prof文件"""
+
+    def __init__(self, label: str):
+        self.label = re.sub(r"[^\w.-]+", "_", label).strip("_")[:60] or "profile"
+        self.profiler = cProfile.Profile()
+
+    @contextlib.contextmanager
+    def capture(self):
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+
+    def save(self) -> str:
+        """保存采集结果并释放会话，返回profile id"""
+        global _active_session
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.label}-{uuid.uuid4().hex[:6]}.prof"
+        self.profiler.dump_stats(os.path.join(PROFILE_DIR, profile_id))
+        if _active_session is self:
+            _active_session = None
+        _prune_profiles()
+        print(f"📊 性能分析结果已保存: {profile_id}")
+        return profile_id
+
+    def discard(self):
+        global _active_session
+        if _active_session is self:
+            _active_session = None
+
+
+def start_session(label: str) -> Optional[ProfileSession]:
+    """开始一个采集会话；已有会话在进行时返回None"""
+    global _active_session
+    if _active_session is not None:
+        return None
+    _active_session = ProfileSession(label)
+    return _active_session
+
+
+class RoomFrameProfiler:
+    """采集某个房间接下来N个上游消息的处理过程"""
+
+    def __init__(self, room_id: str, frames: int, session: ProfileSession):
+        self.room_id = room_id
+        self.remaining = frames
+        self.session = session
+
+    @contextlib.contextmanager
+    def capture(self):
+        with self.session.capture():
+            yield
+        self.remaining -= 1
+
+    @property
+    def finished(self) -> bool:
+        return self.remaining <= 0
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """返回profile文件路径，id非法或文件不存在时返回None"""
+    if not _PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id)
+    return path if os.path.isfile(path) else None
+
+
+def list_profiles() -> List[Dict[str, object]]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if _PROFILE_ID_PATTERN.match(name):
+            stat = os.stat(os.path.join(PROFILE_DIR, name))
+            profiles.append({"id": name, "size": stat.st_size, "created_at": stat.st_mtime})
+    return profiles
+
+
+def _prune_profiles():
+    """只保留最近的MAX_PROFILES个文件"""
+    for profile in list_profiles()[MAX_PROFILES:]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, profile["id"]))
+        except OSError:
+            pass
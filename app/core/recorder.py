@@ -0,0 +1,130 @@
+import asyncio
+import gzip
+import json
+import os
+import re
+import time
+from typing import Any, Dict, Iterator, Optional
+
+# 是否录制上游流量；录制文件可离线回放，用于复现真实对局的性能测试
+RECORDING_ENABLED = os.environ.get("RECORD_TRAFFIC", "").lower() in ("1", "true", "yes")
+RECORD_DIR = os.environ.get("RECORD_DIR", "recordings")
+RECORD_FORMAT = 1
+# 每写入多少帧刷新一次压缩流，进程异常退出时最多丢失这么多帧
+FLUSH_EVERY = 20
+
+
+class TrafficRecorder:
+    """把房间的上下行消息按单调时钟时间戳写入gzip压缩的JSONL文件
+
+    第一行为文件头，之后每行为 {"t": 相对录制开始的秒数, "dir": "in"|"out", "frame": 消息}。
+    """
+
+    def __init__(self, room_id: str, connection_id: Optional[str] = None, directory: str = RECORD_DIR):
+        os.makedirs(directory, exist_ok=True)
+        safe_room = re.sub(r"[^\w.-]+", "_", room_id)[:60] or "room"
+        self.path = os.path.join(directory, f"{safe_room}-{time.strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+        self.frames = 0
+        self._start = time.monotonic()
+        self._file = gzip.open(self.path, "wt", encoding="utf-8")
+        # 回放时客户端需要使用录制时的连接ID，才能在players消息中认出我方的猜测
+        self._write({"format": RECORD_FORMAT, "room_id": room_id, "connection_id": connection_id,
+                     "started_at": time.time()})
+        print(f"📼 正在录制房间 {room_id} 的流量: {self.path}")
+
+    def _write(self, entry: Dict[str, Any]):
+        self._file.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+        self._file.write("\n")
+
+    def record(self, direction: str, frame: Dict[str, Any]):
+        if self._file is None:
+            return
+        self._write({"t": round(time.monotonic() - self._start, 6), "dir": direction, "frame": frame})
+        self.frames += 1
+        if self.frames % FLUSH_EVERY == 0:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            print(f"📼 录制结束，共 {self.frames} 帧: {self.path}")
+
+
+def _read_header(f, path: str) -> Dict[str, Any]:
+    header = json.loads(f.readline())
+    if header.get("format") != RECORD_FORMAT:
+        raise ValueError(f"不支持的录制文件格式: {path}")
+    return header
+
+
+def read_recording(path: str) -> Iterator[Dict[str, Any]]:
+    """依次读出录制文件中的帧（不含文件头）"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        _read_header(f, path)
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def recorded_connection_id(path: str) -> Optional[str]:
+    """录制时客户端的连接ID；文件头中没有时（旧的录制文件）取第一条上行猜测消息中的connectionId"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        connection_id = _read_header(f, path).get("connection_id")
+    if connection_id:
+        return connection_id
+    for entry in read_recording(path):
+        frame = entry["frame"]
+        if entry["dir"] == "out" and frame.get("type") == "GUESS":
+            return (frame.get("payload") or {}).get("connectionId")
+    return None
+
+
+async def replay(path: str, client=None, speed: Optional[float] = 1.0) -> Dict[str, Any]:
+    """把录制的上游消息按原始节奏（或加速）送回客户端的消息处理流程
+
+    speed为倍速，None或0表示不等待、尽快回放。上行的猜测消息不会发出，
+    只用于还原客户端当时处于等待猜测结果的状态。返回回放统计。
+    """
+    if client is None:
+        from app.core.game_client import BlastTvGameClient
+        client = BlastTvGameClient(f"replay-{os.path.basename(path)}")
+    # 使用录制时的连接ID，否则新客户端的随机ID认不出录制消息中我方的猜测
+    connection_id = recorded_connection_id(path)
+    if connection_id:
+        client.uuid = connection_id
+    # 与GameService.get_client注册相同的处理器
+    client.register_handler("all", client.process_game_messages)
+    client.register_handler("GUESS_RESULT", client.handle_guess_result)
+
+    stats = {"inbound": 0, "outbound": 0, "handle_time": 0.0, "guesses": 0}
+    wall_start = time.perf_counter()
+    replay_start = time.monotonic()
+    for entry in read_recording(path):
+        if speed:
+            delay = entry["t"] / speed - (time.monotonic() - replay_start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        frame = entry["frame"]
+        if entry["dir"] == "out":
+            stats["outbound"] += 1
+            if frame.get("type") == "GUESS":
+                client.guessing = True
+                client.pacer.guess_sent()
+            continue
+
+        stats["inbound"] += 1
+        start = time.perf_counter()
+        last_result = client.current_guess_result
+        # 与房间的消息处理任务相同，逐条处理，上一条处理完才处理下一条
+        await client._handle_frame(frame)
+        stats["handle_time"] += time.perf_counter() - start
+        # 轮次结束时猜测记录会被清空，按处理过的猜测结果累计次数
+        if client.current_guess_result is not None and client.current_guess_result is not last_result:
+            stats["guesses"] += 1
+
+    stats["elapsed"] = time.perf_counter() - wall_start
+    stats["player_wins"] = client.player_wins
+    return stats
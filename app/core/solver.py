@@ -0,0 +1,330 @@
+import hashlib
+import heapq
+import json
+import math
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.core.transposition import TranspositionTable, candidate_key
+
+# minimax策略中完整评估的候选人数量（按熵值部分选择）
+MINIMAX_TOP_K = 24
+# lookahead策略: 搜索深度、每层评估的候选人数量、使用搜索的最大候选集合，以及叶节点估算时假设的平均分支数
+LOOKAHEAD_DEPTH = 2
+LOOKAHEAD_TOP_K = 12
+LOOKAHEAD_MAX_CANDIDATES = 1500
+LOOKAHEAD_LEAF_BRANCHING = 6
+
+Feedback = Tuple[Any, ...]
+
+# 软约束排序时每类约束的可信度权重：国籍信息最可靠，Major次数最容易与数据集不一致
+CONSTRAINT_WEIGHTS = {
+    'nationality': 8,
+    'nationality_region': 8,
+    'role': 4,
+    'age': 2,
+    'team': 2,
+    'isRetired': 2,
+    'majorAppearances': 1,
+}
+NUMERIC_FIELDS = ('age', 'majorAppearances')
+
+
+def _entropy(player: Dict[str, Any]) -> float:
+    return player.get('entropy_value') or 0
+
+
+def team_key(team: Any) -> Optional[str]:
+    """队伍的比较键（队伍ID），上游结果中的队伍数据与数据集中的字段不完全相同"""
+    if isinstance(team, dict):
+        return team.get('id')
+    return team
+
+
+def _compare_numeric(guess_value, secret_value) -> str:
+    """按游戏规则比较数值字段: 相差3以内为CLOSE，HIGH表示猜测值偏大"""
+    guess_value = guess_value or 0
+    secret_value = secret_value or 0
+    diff = guess_value - secret_value
+    if diff == 0:
+        return "CORRECT"
+    closeness = "CLOSE" if abs(diff) <= 3 else "NOT_CLOSE"
+    return f"{'HIGH' if diff > 0 else 'LOW'}_{closeness}"
+
+
+def simulate_feedback(guess: Dict[str, Any], secret: Dict[str, Any], countries: Dict[str, Any]) -> Feedback:
+    """模拟以secret为答案时猜测guess得到的反馈，与parse_guess_result解析的字段一致"""
+    if guess.get('nationality') == secret.get('nationality'):
+        nationality = "CORRECT"
+    else:
+        guess_region = countries.get(guess.get('nationality'), {}).get('region')
+        secret_region = countries.get(secret.get('nationality'), {}).get('region')
+        nationality = "INCORRECT_CLOSE" if guess_region and guess_region == secret_region else "INCORRECT"
+
+    guess_team = team_key(guess.get('team'))
+    team = "CORRECT" if guess_team is not None and guess_team == team_key(secret.get('team')) else "INCORRECT"
+    role = "CORRECT" if guess.get('role') == secret.get('role') else "INCORRECT"
+
+    return (
+        guess.get('id') == secret.get('id'),
+        nationality,
+        team,
+        _compare_numeric(guess.get('age'), secret.get('age')),
+        role,
+        _compare_numeric(guess.get('majorAppearances'), secret.get('majorAppearances')),
+    )
+
+
+def feedback_to_result(guess: Dict[str, Any], feedback: Feedback) -> Dict[str, Any]:
+    """把模拟的反馈还原为与上游GUESS_RESULT负载相同结构的猜测结果"""
+    success, nationality, team, age, role, major = feedback
+    return {
+        'id': guess.get('id'),
+        'firstName': guess.get('firstName'),
+        'lastName': guess.get('lastName'),
+        'nickname': guess.get('nickname'),
+        'nationality': {'value': guess.get('nationality'), 'result': nationality},
+        'team': {'data': guess.get('team'), 'result': team},
+        'age': {'value': guess.get('age'), 'result': age},
+        'role': {'value': guess.get('role'), 'result': role},
+        'majorAppearances': {'value': guess.get('majorAppearances'), 'result': major},
+        'isRetired': guess.get('isRetired'),
+        'isSuccess': success,
+    }
+
+
+def feedback_from_result(result: Dict[str, Any]) -> Feedback:
+    """从上游的猜测结果中提取与simulate_feedback相同结构的反馈"""
+    def field(name):
+        value = result.get(name)
+        return value.get('result') if isinstance(value, dict) else None
+
+    return (
+        bool(result.get('isSuccess')),
+        field('nationality'),
+        field('team'),
+        field('age'),
+        field('role'),
+        field('majorAppearances'),
+    )
+
+
+def rank_by_entropy(candidates: List[Dict[str, Any]], countries: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """选择静态熵值最高的候选人"""
+    if not candidates:
+        return None
+    return max(candidates, key=_entropy)
+
+
+def worst_case_remaining(guess: Dict[str, Any], candidates: List[Dict[str, Any]],
+                         countries: Dict[str, Any], bound: Optional[int] = None) -> int:
+    """计算猜测guess后最坏情况下剩余的候选人数量，超过bound时提前返回"""
+    buckets = Counter()
+    worst = 0
+    for secret in candidates:
+        feedback = simulate_feedback(guess, secret, countries)
+        if feedback[0]:
+            # 猜中的分支不会留下候选人
+            continue
+        buckets[feedback] += 1
+        if buckets[feedback] > worst:
+            worst = buckets[feedback]
+            if bound is not None and worst > bound:
+                return worst
+    return worst
+
+
+def rank_by_minimax(candidates: List[Dict[str, Any]], countries: Dict[str, Any],
+                    top_k: int = MINIMAX_TOP_K) -> Optional[Dict[str, Any]]:
+    """选择使最坏情况剩余候选人最少的猜测，只完整评估熵值最高的top_k名候选人"""
+    if len(candidates) <= 2:
+        return rank_by_entropy(candidates, countries)
+
+    pool = heapq.nlargest(top_k, candidates, key=_entropy)
+    best_player = None
+    best_worst = None
+    for guess in pool:
+        # 已有更优解时，超过当前最优值即可停止评估（分支定界）
+        worst = worst_case_remaining(guess, candidates, countries, bound=best_worst)
+        if best_worst is None or worst < best_worst:
+            best_player = guess
+            best_worst = worst
+    print(f"minimax策略选择: {best_player.get('nickname')} (最坏情况剩余 {best_worst} 名候选人)")
+    return best_player
+
+
+def _partition(guess: Dict[str, Any], candidates: List[Dict[str, Any]],
+               countries: Dict[str, Any]) -> Dict[Feedback, List[Dict[str, Any]]]:
+    """按猜测guess得到的反馈把候选集合分组"""
+    groups = defaultdict(list)
+    for secret in candidates:
+        groups[simulate_feedback(guess, secret, countries)].append(secret)
+    return groups
+
+
+def _leaf_estimate(count: int) -> float:
+    """搜索深度用尽时，估算在count名候选人中还需要的猜测次数"""
+    if count <= 2:
+        return (0.0, 1.0, 1.5)[count]
+    return 1 + math.log(count) / math.log(LOOKAHEAD_LEAF_BRANCHING)
+
+
+# 同一进程中所有房间和轮次共用的置换表:
+# (候选集合位集合, 剩余深度, (数据版本, 国家数据指纹)) -> (期望猜测次数, 最佳猜测ID)
+# 搜索结果取决于玩家属性和国家数据，热替换后不同版本的房间不会共用表项
+# 进程池模式下每个求解器工作进程各自持有一张表，工作进程之间不共享
+lookahead_table = TranspositionTable()
+_countries_fingerprint: Tuple[Optional[Dict[str, Any]], str] = (None, "")
+
+
+def countries_fingerprint(countries: Dict[str, Any]) -> str:
+    """国家数据的内容指纹，连续传入同一个对象时直接复用"""
+    global _countries_fingerprint
+    if _countries_fingerprint[0] is not countries:
+        digest = hashlib.sha1(json.dumps(countries, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:12]
+        _countries_fingerprint = (countries, digest)
+    return _countries_fingerprint[1]
+
+
+def expected_guesses(candidates: List[Dict[str, Any]], countries: Dict[str, Any], depth: int = LOOKAHEAD_DEPTH,
+                     scope: Optional[Hashable] = None) -> Tuple[float, Optional[Dict[str, Any]]]:
+    """向前搜索depth步，返回答案在候选集合中均匀分布时还需要的最少期望猜测次数及对应的猜测
+
+    scope标识玩家数据版本和国家数据，为None时不使用置换表。
+    """
+    count = len(candidates)
+    if count <= 2 or depth <= 0:
+        return _leaf_estimate(count), (max(candidates, key=_entropy) if candidates else None)
+
+    key = None
+    if scope is not None:
+        key = (candidate_key(player.get('id') for player in candidates), depth, scope)
+        cached = lookahead_table.get(key)
+        if cached is not None:
+            cost, guess_id = cached
+            return cost, next((player for player in candidates if player.get('id') == guess_id), None)
+
+    best_player = None
+    best_cost = math.inf
+    for guess in heapq.nlargest(LOOKAHEAD_TOP_K, candidates, key=_entropy):
+        cost = 1.0
+        for feedback, group in _partition(guess, candidates, countries).items():
+            if feedback[0]:
+                # 猜中的分支不需要再猜
+                continue
+            cost += len(group) / count * expected_guesses(group, countries, depth - 1, scope)[0]
+            if cost >= best_cost:
+                break
+        if cost < best_cost:
+            best_player = guess
+            best_cost = cost
+
+    if key is not None:
+        lookahead_table.put(key, (best_cost, best_player.get('id')))
+    return best_cost, best_player
+
+
+def rank_by_lookahead(candidates: List[Dict[str, Any]], countries: Dict[str, Any],
+                      version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """向前搜索两步，选择使期望猜测次数最少的候选人；候选集合过大时退回熵值排序
+
+    version为候选人所属的玩家数据版本，未提供时不缓存搜索结果。
+    """
+    if len(candidates) > LOOKAHEAD_MAX_CANDIDATES:
+        print(f"候选人数量 {len(candidates)} 超过 {LOOKAHEAD_MAX_CANDIDATES}，lookahead策略改用熵值排序")
+        return rank_by_entropy(candidates, countries)
+    scope = (version, countries_fingerprint(countries)) if version else None
+    cost, best_player = expected_guesses(candidates, countries, scope=scope)
+    if best_player is not None:
+        print(f"lookahead策略选择: {best_player.get('nickname')} (预计共需 {cost:.2f} 次猜测)")
+    return best_player
+
+
+RANKING_STRATEGIES: Dict[str, Callable[[List[Dict[str, Any]], Dict[str, Any]], Optional[Dict[str, Any]]]] = {
+    "entropy": rank_by_entropy,
+    "minimax": rank_by_minimax,
+    "lookahead": rank_by_lookahead,
+}
+
+DEFAULT_STRATEGY = "entropy"
+
+
+def select_candidate(candidates: List[Dict[str, Any]], strategy: str, countries: Dict[str, Any],
+                     version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """使用指定排序策略从候选集合中选出下一个猜测，version为候选人所属的玩家数据版本"""
+    ranker = RANKING_STRATEGIES.get(strategy, RANKING_STRATEGIES[DEFAULT_STRATEGY])
+    if ranker is rank_by_lookahead:
+        # 只有lookahead跨调用缓存搜索结果，需要区分数据版本
+        return ranker(candidates, countries, version)
+    return ranker(candidates, countries)
+
+
+def _team_rule(rule: Dict[str, Any]) -> Dict[str, Any]:
+    """队伍约束按队伍ID比较，约束中的队伍可能是ID，也可能是完整的队伍数据；名称只用于显示"""
+    return {k: (v if k == 'exclude_list' else team_key(v)) for k, v in rule.items() if k != 'name'}
+
+
+def constraints_key(constraints: Dict[str, Any]) -> Dict[str, Any]:
+    """约束条件的比较形式，与上游队伍数据的额外字段和名称无关"""
+    if 'team' not in constraints:
+        return constraints
+    return dict(constraints, team=_team_rule(constraints['team']))
+
+
+def _violates(value, rule: Dict[str, Any]) -> bool:
+    if 'exact' in rule and value != rule['exact']:
+        return True
+    if 'exclude' in rule and value == rule['exclude']:
+        return True
+    if 'exclude_list' in rule and value in rule['exclude_list']:
+        return True
+    if 'min' in rule and value < rule['min']:
+        return True
+    if 'max' in rule and value > rule['max']:
+        return True
+    return False
+
+
+def constraint_violations(player: Dict[str, Any], constraints: Dict[str, Any], countries: Dict[str, Any]) -> int:
+    """计算玩家违反的约束条件的加权数量，0表示完全符合（与filter_players的判断一致）"""
+    total = 0
+    for key, rule in constraints.items():
+        weight = CONSTRAINT_WEIGHTS.get(key)
+        if weight is None:
+            continue
+        if key == 'nationality_region':
+            region = countries.get(player.get('nationality'), {}).get('region')
+            if ('region' in rule and region != rule['region']) or _violates(region, rule):
+                total += weight
+            continue
+        if key == 'team':
+            if _violates(team_key(player.get('team')), _team_rule(rule)):
+                total += weight
+            continue
+        value = player.get(key)
+        if key in NUMERIC_FIELDS:
+            value = value or 0
+        if _violates(value, rule):
+            total += weight
+    return total
+
+
+def select_with_soft_constraints(candidates: List[Dict[str, Any]], constraints: Dict[str, Any], strategy: str,
+                                 countries: Dict[str, Any],
+                                 version: Optional[str] = None) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+    """单次遍历按(加权违反数, 排序策略)选择猜测，返回候选人及其加权违反数
+
+    有完全符合约束的候选人时结果与先筛选再排序相同；没有时不需要逐步放宽约束重新筛选。
+    """
+    fewest = None
+    group: List[Dict[str, Any]] = []
+    for player in candidates:
+        violations = constraint_violations(player, constraints, countries)
+        if fewest is None or violations < fewest:
+            fewest = violations
+            group = [player]
+        elif violations == fewest:
+            group.append(player)
+    if not group:
+        return None, None
+    return select_candidate(group, strategy, countries, version), fewest
@@ -0,0 +1,163 @@
+import asyncio
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.player_data import Dataset, load_dataset, load_players, players_for_version
+from app.core.solver import Feedback, constraint_violations, select_with_soft_constraints, simulate_feedback
+
+# 求解器计算的执行方式: process（进程池，默认）| thread（线程池）| inline（直接在事件循环中计算）
+# 求解器是纯Python代码，计算时不会释放GIL，只有进程池能让事件循环在计算期间保持响应
+EXECUTOR_MODES = ("process", "thread", "inline")
+SOLVER_EXECUTOR = os.environ.get("SOLVER_EXECUTOR", "process").lower()
+if SOLVER_EXECUTOR not in EXECUTOR_MODES:
+    SOLVER_EXECUTOR = "process"
+SOLVER_WORKERS = max(1, int(os.environ.get("SOLVER_WORKERS", "0")) or min(4, os.cpu_count() or 1))
+
+_executor: Optional[Executor] = None
+
+
+# ---- 在工作进程中执行的计算 ----
+# 参数和返回值只有数据文件路径、版本号、玩家ID和下标，工作进程自行打开同一个数据文件；
+# 二进制快照通过内存映射读取，所有进程共享操作系统的页缓存，玩家数据不需要复制或序列化
+
+def _available(players: Sequence[Dict[str, Any]], guessed_ids: Iterable[str]) -> List[Tuple[int, Dict[str, Any]]]:
+    guessed_ids = set(guessed_ids)
+    return [(index, player) for index, player in enumerate(players) if player.get('id') not in guessed_ids]
+
+
+def _matching(entries: List[Tuple[int, Dict[str, Any]]], constraints: Dict[str, Any],
+              countries: Dict[str, Any]) -> List[Tuple[int, Dict[str, Any]]]:
+    """完全符合约束条件的玩家，没有时返回全部可用玩家（与filter_players的回退一致）"""
+    matching = [entry for entry in entries if constraint_violations(entry[1], constraints, countries) == 0]
+    return matching or entries
+
+
+def _warm_worker(path: str):
+    load_players(path)
+
+
+def _in_worker(func: Callable, path: str, version: str, *args):
+    """在工作进程中按指定版本的玩家数据计算；工作进程无法获得该版本时返回None"""
+    players = players_for_version(path, version)
+    if players is None:
+        return None
+    return func(players, *args)
+
+
+def _rank(players: Sequence[Dict[str, Any]], guessed_ids: List[str], constraints: Dict[str, Any],
+          countries: Dict[str, Any]) -> List[int]:
+    ranked = _matching(_available(players, guessed_ids), constraints, countries)
+    ranked.sort(key=lambda entry: entry[1].get('entropy_value', 0), reverse=True)
+    return [index for index, _ in ranked]
+
+
+def _select(players: Sequence[Dict[str, Any]], guessed_ids: List[str], constraints: Dict[str, Any], strategy: str,
+            countries: Dict[str, Any], version: str) -> Tuple[Optional[int], Optional[int]]:
+    entries = _available(players, guessed_ids)
+    candidates = [player for _, player in entries]
+    result, violations = select_with_soft_constraints(candidates, constraints, strategy, countries, version)
+    index = None
+    if result is not None:
+        index = next(entries[k][0] for k, player in enumerate(candidates) if player is result)
+    return index, violations
+
+
+def _outcomes(players: Sequence[Dict[str, Any]], guess: Dict[str, Any], guessed_ids: List[str],
+              constraints: Dict[str, Any], countries: Dict[str, Any]) -> List[Feedback]:
+    candidates = _matching(_available(players, guessed_ids), constraints, countries)
+    outcomes = Counter(simulate_feedback(guess, player, countries) for _, player in candidates)
+    return [feedback for feedback, _ in outcomes.most_common()]
+
+
+# ---- 事件循环一侧 ----
+
+def _create_executor() -> Optional[Executor]:
+    if SOLVER_EXECUTOR == "process":
+        # spawn启动的工作进程不会继承事件循环和网络连接
+        return ProcessPoolExecutor(max_workers=SOLVER_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_warm_worker, initargs=(load_dataset().worker_path,))
+    if SOLVER_EXECUTOR == "thread":
+        return ThreadPoolExecutor(max_workers=SOLVER_WORKERS, thread_name_prefix="solver")
+    return None
+
+
+def start():
+    """应用启动时创建执行器并预先加载工作进程中的玩家数据"""
+    global _executor
+    if _executor is None and SOLVER_EXECUTOR != "inline":
+        _executor = _create_executor()
+        if SOLVER_EXECUTOR == "process":
+            for _ in range(SOLVER_WORKERS):
+                _executor.submit(_warm_worker, load_dataset().worker_path)
+        print(f"求解器执行器: {SOLVER_EXECUTOR}，{SOLVER_WORKERS} 个工作单元")
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def capacity() -> int:
+    """可以同时进行的求解器计算数量"""
+    return 1 if SOLVER_EXECUTOR == "inline" else SOLVER_WORKERS
+
+
+def status() -> Dict[str, Any]:
+    return {"executor": SOLVER_EXECUTOR, "workers": capacity(), "running": _executor is not None}
+
+
+async def _run(func: Callable, dataset: Dataset, *args):
+    """在执行器中按给定版本的数据计算
+
+    热替换后仍在进行的轮次使用旧版本，工作进程从该版本的副本（Dataset.worker_path）加载；
+    副本已被清理或进程池失效时改在线程中计算，不阻塞事件循环。
+    """
+    if SOLVER_EXECUTOR == "inline":
+        return func(dataset.players, *args)
+    if _executor is None:
+        start()
+    loop = asyncio.get_running_loop()
+    if SOLVER_EXECUTOR == "thread":
+        return await loop.run_in_executor(_executor, func, dataset.players, *args)
+    try:
+        result = await loop.run_in_executor(_executor, _in_worker, func, dataset.worker_path, dataset.version, *args)
+        if result is not None:
+            return result
+        print(f"工作进程无法加载玩家数据版本 {dataset.version}，改在线程中计算")
+    except BrokenProcessPool:
+        print("求解器进程池已失效，重新创建")
+        shutdown()
+    return await loop.run_in_executor(None, func, dataset.players, *args)
+
+
+async def rank_players(guessed_ids: Iterable[str], constraints: Dict[str, Any], countries: Dict[str, Any],
+                       dataset: Optional[Dataset] = None) -> List[Dict[str, Any]]:
+    """排除已猜测的玩家，按约束条件筛选（无匹配时不筛选）并按熵值降序排列"""
+    dataset = dataset or load_dataset()
+    indices = await _run(_rank, dataset, list(guessed_ids), constraints, countries)
+    return [dataset.players[index] for index in indices]
+
+
+async def select_next_guess(guessed_ids: Iterable[str], constraints: Dict[str, Any], strategy: str,
+                            countries: Dict[str, Any],
+                            dataset: Optional[Dataset] = None) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+    """按软约束和排序策略选择下一个猜测，返回候选人及其加权违反数"""
+    dataset = dataset or load_dataset()
+    index, violations = await _run(_select, dataset, list(guessed_ids), constraints, strategy, countries,
+                                   dataset.version)
+    if index is None:
+        return None, None
+    return dataset.players[index], violations
+
+
+async def feedback_outcomes(guess: Dict[str, Any], guessed_ids: Iterable[str], constraints: Dict[str, Any],
+                            countries: Dict[str, Any], dataset: Optional[Dataset] = None) -> List[Feedback]:
+    """候选集合中各玩家作为答案时猜测会得到的反馈，按出现次数降序排列"""
+    dataset = dataset or load_dataset()
+    return await _run(_outcomes, dataset, dict(guess), list(guessed_ids), constraints, countries)
@@ -0,0 +1,81 @@
+import os
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+# 置换表的内存上限，超出后按最近最少使用的顺序淘汰
+TABLE_MAX_BYTES = int(float(os.environ.get("LOOKAHEAD_TABLE_MB", "64")) * 1024 * 1024)
+# 每个表项除键以外的大致开销（OrderedDict节点、值元组、浮点数和ID字符串）
+ENTRY_OVERHEAD = 200
+
+# 玩家ID -> 位序号，同一进程中所有房间和轮次共用，相同的候选集合得到相同的键
+_bit_index: Dict[str, int] = {}
+
+
+def candidate_key(player_ids: Iterable[str]) -> int:
+    """把候选集合编码为位集合（Python整数），与集合中元素的顺序无关"""
+    key = 0
+    for player_id in player_ids:
+        bit = _bit_index.get(player_id)
+        if bit is None:
+            bit = _bit_index[player_id] = len(_bit_index)
+        key |= 1 << bit
+    return key
+
+
+class TranspositionTable:
+    """按候选集合缓存搜索结果的LRU表，按估算的内存占用淘汰旧表项"""
+
+    def __init__(self, max_bytes: int = TABLE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self._entries[key] = value
+            return
+        size = sys.getsizeof(key[0] if isinstance(key, tuple) else key) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        self._entries[key] = value
+        self._sizes[key] = size
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            old_key, _ = self._entries.popitem(last=False)
+            self.bytes -= self._sizes.pop(old_key)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._sizes.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
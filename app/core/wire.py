@@ -0,0 +1,134 @@
+import json
+import struct
+from collections.abc import Mapping
+from typing import Any, Union
+
+# 浏览器WebSocket的消息编码，通过 /ws/{room_id}?encoding=msgpack 协商，默认JSON
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+ENCODINGS = (ENCODING_JSON, ENCODING_MSGPACK)
+
+# 二进制编码中用短整数代替的字段名，连接建立时通过PROTOCOL消息发给浏览器。
+# 只能在末尾追加，已有字段的序号不能改变
+FIELDS = (
+    "type", "game_phase", "best_of", "player_wins", "required_wins", "remaining_guesses",
+    "result", "id", "firstName", "lastName", "nickname", "nationality", "team", "age", "role",
+    "majorAppearances", "isRetired", "isSuccess", "value", "data", "constraints",
+    "exact", "exclude", "exclude_list", "min", "max", "region", "nationality_region",
+    "base_etag", "etag", "removed", "added", "order", "total", "next_cursor",
+    "game_metadata", "current_wins", "current_phase",
+    "player_id", "first_name", "last_name", "is_retired", "entropy_value", "image_url",
+    "name", "shortName", "playerId",
+)
+FIELD_IDS = {name: index for index, name in enumerate(FIELDS)}
+
+_pack_double = struct.Struct(">d").pack
+_pack_u16 = struct.Struct(">H").pack
+_pack_u32 = struct.Struct(">I").pack
+
+
+def _pack_int(value: int, out: bytearray):
+    if 0 <= value < 0x80:
+        out.append(value)
+    elif -32 <= value < 0:
+        out.append(value & 0xFF)
+    elif 0 <= value <= 0xFF:
+        out += b"\xcc" + bytes((value,))
+    elif 0 <= value <= 0xFFFF:
+        out += b"\xcd" + _pack_u16(value)
+    elif 0 <= value <= 0xFFFFFFFF:
+        out += b"\xce" + _pack_u32(value)
+    elif value > 0:
+        out += b"\xcf" + struct.pack(">Q", value)
+    elif value >= -0x80:
+        out += b"\xd0" + struct.pack(">b", value)
+    elif value >= -0x8000:
+        out += b"\xd1" + struct.pack(">h", value)
+    elif value >= -0x80000000:
+        out += b"\xd2" + struct.pack(">i", value)
+    else:
+        out += b"\xd3" + struct.pack(">q", value)
+
+
+def _pack_header(size: int, fix: int, fix_limit: int, code16: bytes, code32: bytes, out: bytearray):
+    if size < fix_limit:
+        out.append(fix | size)
+    elif size <= 0xFFFF:
+        out += code16 + _pack_u16(size)
+    else:
+        out += code32 + _pack_u32(size)
+
+
+def _pack(value: Any, out: bytearray):
+    if value is None:
+        out.append(0xC0)
+    elif value is True:
+        out.append(0xC3)
+    elif value is False:
+        out.append(0xC2)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        size = len(data)
+        if size < 32:
+            out.append(0xA0 | size)
+        elif size <= 0xFF:
+            out += b"\xd9" + bytes((size,))
+        elif size <= 0xFFFF:
+            out += b"\xda" + _pack_u16(size)
+        else:
+            out += b"\xdb" + _pack_u32(size)
+        out += data
+    elif isinstance(value, int):
+        _pack_int(value, out)
+    elif isinstance(value, float):
+        out += b"\xcb" + _pack_double(value)
+    elif isinstance(value, Mapping):
+        _pack_header(len(value), 0x80, 16, b"\xde", b"\xdf", out)
+        for key, item in value.items():
+            field_id = FIELD_IDS.get(key)
+            if field_id is None:
+                _pack(str(key), out)
+            else:
+                _pack_int(field_id, out)
+            _pack(item, out)
+    elif isinstance(value, (list, tuple, set)):
+        _pack_header(len(value), 0x90, 16, b"\xdc", b"\xdd", out)
+        for item in value:
+            _pack(item, out)
+    else:
+        _pack(str(value), out)
+
+
+def pack(value: Any) -> bytes:
+    """按MessagePack格式编码，字典中已知的字段名编码为FIELDS中的序号"""
+    out = bytearray()
+    _pack(value, out)
+    return bytes(out)
+
+
+def protocol_message(encoding: str) -> dict:
+    """连接建立时发送的协商结果（始终为JSON文本）"""
+    message = {"type": "PROTOCOL", "encoding": encoding}
+    if encoding == ENCODING_MSGPACK:
+        message["fields"] = list(FIELDS)
+    return message
+
+
+def websocket_encoding(websocket) -> str:
+    """从连接的查询参数中读取浏览器请求的编码"""
+    params = getattr(websocket, "query_params", None)
+    encoding = params.get("encoding") if params else None
+    return encoding if encoding in ENCODINGS else ENCODING_JSON
+
+
+def encode_frame(message: Any, encoding: str) -> Union[str, bytes]:
+    if encoding == ENCODING_MSGPACK:
+        return pack(message)
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+
+
+async def send_frame(websocket, frame: Union[str, bytes]):
+    if isinstance(frame, bytes):
+        await websocket.send_bytes(frame)
+    else:
+        await websocket.send_text(frame)
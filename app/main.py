@@ -5,7 +5,10 @@ from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from fastapi import Request
 from app.api.routes import router as api_router
-import concurrent.futures
+from app.api.scheduler import router as scheduler_router
+from app.core.profiling import PROFILING_ENABLED, PROFILE_HEADER, start_session
+from app.core.wire import ENCODING_JSON, encode_frame, protocol_message, send_frame, websocket_encoding
+from app.core import player_data, solver_pool
 
 # 根应用配置
 app = FastAPI(
@@ -14,15 +17,47 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# 添加启动事件，设置适当的并发限制和任务配置
+# 启动时创建求解器执行器，过滤和排序在执行器中进行，事件循环只处理网络I/O；
+# 同时在后台检查玩家数据的新版本，构建完成后热替换
 @app.on_event("startup")
 async def startup_event():
-    # 设置更大的任务队列大小，以适应WebSocket连接
-    import asyncio
-    loop = asyncio.get_event_loop()
-    loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(max_workers=20))
+    # 先启动数据检查，求解器工作进程加载的是当前版本的副本
+    player_data.start_watcher()
+    solver_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    player_data.stop_watcher()
+    solver_pool.shutdown()
 
 app.include_router(api_router)
+app.include_router(scheduler_router)
+
+# 按需性能分析: 仅在设置ENABLE_PROFILING时注册，未启用时没有任何开销
+if PROFILING_ENABLED:
+    from app.api.admin import router as admin_router
+    app.include_router(admin_router)
+
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        """带有X-Profile请求头的/api/*请求会被完整采集"""
+        if not request.url.path.startswith("/api/") or not request.headers.get(PROFILE_HEADER):
+            return await call_next(request)
+        
+        session = start_session(f"{request.method}-{request.url.path}")
+        if session is None:
+            response = await call_next(request)
+            response.headers["X-Profile-Skipped"] = "busy"
+            return response
+        
+        try:
+            with session.capture():
+                response = await call_next(request)
+        except Exception:
+            session.discard()
+            raise
+        response.headers["X-Profile-Id"] = session.save()
+        return response
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
@@ -41,6 +76,11 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
         await websocket.accept()
         print(f"WebSocket连接已接受 - 房间: {room_id}")
         
+        # 浏览器可以通过?encoding=msgpack请求紧凑的二进制编码，默认仍为JSON
+        encoding = websocket_encoding(websocket)
+        if encoding != ENCODING_JSON:
+            await websocket.send_json(protocol_message(encoding))
+        
         # 将此WebSocket添加到给定房间的连接列表中
         if not hasattr(GameService, 'ws_connections'):
             GameService.ws_connections = {}
@@ -64,7 +104,7 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
                 "remaining_guesses": remaining_guesses
             }
             print(f"发送初始状态: {initial_state}")
-            await websocket.send_json(initial_state)
+            await send_frame(websocket, encode_frame(initial_state, encoding))
         
         # 保持连接打开，等待断开
         while True:
@@ -8,11 +8,56 @@ class PlayerGuess(BaseModel):
     player_id: str
     room_id: str
 
+class StrategyUpdate(BaseModel):
+    room_id: str
+    strategy: str  # entropy | minimax | lookahead
+
+class AutoGuessBatch(BaseModel):
+    room_ids: List[str]
+    max_guesses: int = 8
+
+class RoomProfileRequest(BaseModel):
+    room_id: str
+    frames: int = 20  # 采集的上游消息数量
+
 class GuessResult(BaseModel):
     success: bool
     result: Optional[Dict[str, Any]] = None
     message: Optional[str] = None
 
+class PacingStatus(BaseModel):
+    interval: float  # 当前两次猜测之间的间隔（秒）
+    floor: float  # 从拒绝信号中学习到的安全下限
+    latency: Optional[float] = None  # 猜测结果延迟的移动平均
+    accepted: int = 0
+    rejected: int = 0
+    errors: int = 0
+    last_signal: Optional[str] = None
+
+class PacingResponse(BaseModel):
+    success: bool
+    pacing: Optional[PacingStatus] = None
+    message: Optional[str] = None
+
+class QueueStatsResponse(BaseModel):
+    success: bool
+    stats: Optional[Dict[str, int]] = None  # enqueued, processed, overflows, max_depth, depth, capacity
+    message: Optional[str] = None
+
+class DatasetStatus(BaseModel):
+    version: str  # 当前生效的玩家数据版本，新一轮开始时使用
+    path: str
+    players: int
+    loaded_at: float
+    retained_versions: List[str] = []
+    watching: bool = False  # 是否在后台检查新版本
+    rooms: Dict[str, Optional[str]] = {}  # 各房间本轮使用的数据版本
+
+class DatasetStatusResponse(BaseModel):
+    success: bool
+    dataset: Optional[DatasetStatus] = None
+    message: Optional[str] = None
+
 class Recommendation(BaseModel):
     player_id: str
     first_name: str
@@ -26,6 +71,12 @@ class Recommendation(BaseModel):
     entropy_value: Optional[float] = None
     image_url: Optional[str] = None
 
+class PlayerSearchResponse(BaseModel):
+    success: bool
+    results: List[Recommendation] = []
+    total: int = 0
+    message: Optional[str] = None
+
 # class RecommendationResponse(BaseModel):
 #     success: bool
 #     recommendations: List[Recommendation] = []
@@ -41,9 +92,19 @@ class GameMetadata(BaseModel):
     current_phase: Optional[str] = None
     remaining_guesses: int = 8
 
+class RecommendationRequest(BaseModel):
+    room_id: str
+    cursor: Optional[str] = None  # 上一页返回的next_cursor
+    limit: int = 20
+    etag: Optional[str] = None  # 客户端已持有的推荐列表版本号
+
 class RecommendationResponse(BaseModel):
     success: bool
     recommendations: List[Recommendation] = []
     game_metadata: Optional[GameMetadata] = None
     constraints: Optional[Dict[str, Any]] = None
-    message: Optional[str] = None
\ No newline at end of file
+    message: Optional[str] = None
+    etag: Optional[str] = None
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+    not_modified: bool = False
\ No newline at end of file
@@ -2,41 +2,111 @@ from fastapi import HTTPException, WebSocket, WebSocketDisconnect, Depends
 from typing import List, Dict, Any, Optional
 import json
 import asyncio
+import base64
+import contextlib
+import hashlib
 import os
+from app.core import solver_pool
 from app.core.game_client import BlastTvGameClient
+from app.core.player_data import dataset_status
+from app.core.player_search import get_search_index
+from app.core.wire import encode_frame, send_frame, websocket_encoding
+from app.core.solver import RANKING_STRATEGIES
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+DELTA_WINDOW = 100  # 推送增量时覆盖的推荐列表前N名，与前端每页加载的数量一致
+
+
+def _encode_cursor(etag: str, offset: int) -> str:
+    """分页游标绑定推荐列表版本，列表变化后旧游标自动失效"""
+    return base64.urlsafe_b64encode(f"{etag}:{offset}".encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor: str):
+    try:
+        etag, offset = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit(':', 1)
+        return etag, max(0, int(offset))
+    except Exception:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
 
 class GameService:
     # 存储活动客户端的字典
     active_clients: Dict[str, BlastTvGameClient] = {}
+    pending_clients: Dict[str, asyncio.Task] = {}  # 正在连接的房间，并发调用共用同一个连接任务
     ws_connections = {}  # 用于存储每个房间的WebSocket连接
+    recommendation_cache: Dict[str, Dict[str, Any]] = {}  # 每个房间最近一次排序的候选列表
+    # 按请求指定的约束条件排序的结果，单独缓存，不影响房间共用的推荐版本和增量推送
+    custom_recommendation_cache: Dict[str, Dict[str, Any]] = {}
     
     @classmethod
     async def get_client(cls, room_id: str) -> BlastTvGameClient:
-        """获取或创建游戏客户端"""
-        if room_id not in cls.active_clients:
-            client = BlastTvGameClient(room_id)
-            client.register_handler("all", client.process_game_messages)
+        """获取或创建游戏客户端
+
+        同一房间的并发调用（如页面加载时的WebSocket、/api/connect和/api/recommendations）
+        等待同一个进行中的连接，每个房间只会建立一个上游连接
+        """
+        client = cls.active_clients.get(room_id)
+        if client is not None:
+            return client
+        
+        task = cls.pending_clients.get(room_id)
+        if task is None:
+            task = asyncio.ensure_future(cls._create_client(room_id))
+            cls.pending_clients[room_id] = task
+            task.add_done_callback(lambda done: cls._creation_done(room_id, done))
+        # 单个调用方被取消（如浏览器断开）时不取消其他调用方共用的连接
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                # 连接过程中房间被close_client关闭，等待的调用方收到普通错误而不是被取消
+                raise HTTPException(status_code=409, detail="房间连接已关闭") from None
+            raise
+    
+    @classmethod
+    def _creation_done(cls, room_id: str, task: asyncio.Task):
+        if cls.pending_clients.get(room_id) is task:
+            del cls.pending_clients[room_id]
+        if not task.cancelled():
+            task.exception()  # 所有调用方都已取消时避免"exception was never retrieved"警告
+    
+    @classmethod
+    async def _create_client(cls, room_id: str) -> BlastTvGameClient:
+        """连接游戏服务器并启动消息接收器，完成后登记到active_clients"""
+        client = BlastTvGameClient(room_id)
+        # 注册消息处理器
+        client.register_handler("all", client.process_game_messages)
+        try:
             connected = await client.connect()
             if not connected:
                 raise HTTPException(status_code=500, detail="无法连接到游戏服务器")
             
             # 启动消息接收器
             await client.start_receiver()
-            
-            # 注册消息处理器
-            client.register_handler("all", client.process_game_messages)
-            
-            cls.active_clients[room_id] = client
+        except BaseException:
+            await client.close()
+            raise
         
-        return cls.active_clients[room_id]
+        cls.active_clients[room_id] = client
+        return client
     
     @classmethod
     async def close_client(cls, room_id: str) -> bool:
         """关闭并移除客户端"""
+        task = cls.pending_clients.pop(room_id, None)
+        if task is not None:
+            # 连接尚未完成时取消，避免关闭后仍登记新的客户端
+            task.cancel()
+            with contextlib.suppress(BaseException):
+                await task
         if room_id in cls.active_clients:
             client = cls.active_clients[room_id]
             await client.close()
             del cls.active_clients[room_id]
+            cls.recommendation_cache.pop(room_id, None)
+            cls.custom_recommendation_cache.pop(room_id, None)
             return True
         return False
     
@@ -45,8 +115,13 @@ class GameService:
         """发送手动猜测"""
         client = await cls.get_client(room_id)
         
+        # 确保注册适当的处理器
+        client.register_handler("GUESS_RESULT", client.handle_guess_result)
+        client.register_handler("all", client.process_game_messages)
+        
         # 设置猜测状态
         client.guessing = True
+        client.guess_result_event.clear()
         
         # 发送猜测
         result = await client.send_guess(player_id)
@@ -54,26 +129,8 @@ class GameService:
             client.guessing = False
             return {"success": False, "message": "发送猜测失败"}
         
-        # 等待猜测结果
-        max_wait = 15  # 最多等待15秒
-        wait_time = 0
-        
-        # 确保注册适当的处理器
-        client.register_handler("GUESS_RESULT", client.handle_guess_result)
-        client.register_handler("all", client.process_game_messages)
-        
-        while client.guessing and wait_time < max_wait:
-            await asyncio.sleep(0.5)  # 缩短等待间隔，提高检查频率
-            wait_time += 0.5
-            
-            # 主动处理消息队列中的消息
-            if len(client.message_queue) > 0:
-                messages = list(client.message_queue)  # 复制队列而不清空
-                for msg in messages:
-                    if msg.get('type') == 'GUESS_RESULT' or 'players' in msg:
-                        await client.handle_guess_result(msg)
-        
-        if wait_time >= max_wait:
+        # 猜测结果由房间的消息处理任务按顺序处理，这里只等待处理完成
+        if not await client.wait_for_guess_result(timeout=15):  # 最多等待15秒
             client.guessing = False
             return {"success": False, "message": "等待猜测结果超时"}
         
@@ -104,98 +161,197 @@ class GameService:
     
     
     @classmethod
-    async def get_recommendations(cls, room_id: str, constraints: Dict[str, Any] = None) -> Dict[str, Any]:
-        """获取推荐玩家列表以及游戏元数据"""
+    async def set_ranking_strategy(cls, room_id: str, strategy: str) -> Dict[str, Any]:
+        """设置房间自动猜测使用的排序策略"""
+        if strategy not in RANKING_STRATEGIES:
+            return {"success": False, "message": f"未知的排序策略: {strategy}，可选: {', '.join(RANKING_STRATEGIES)}"}
+        
+        client = await cls.get_client(room_id)
+        client.ranking_strategy = strategy
+        return {"success": True, "message": f"房间 {room_id} 的排序策略已设置为 {strategy}"}
+    
+    @classmethod
+    def get_pacing(cls, room_id: str) -> Dict[str, Any]:
+        """返回房间当前的自动猜测间隔及其依据"""
+        client = cls.active_clients.get(room_id)
+        if not client:
+            raise HTTPException(status_code=404, detail="没有找到指定房间的连接")
+        return client.pacer.snapshot()
+    
+    @classmethod
+    async def _rank_recommendations(cls, room_id: str, client: BlastTvGameClient,
+                                    constraints: Dict[str, Any] = None) -> Dict[str, Any]:
+        """计算房间当前的推荐排序，版本号未变化时复用缓存的排序结果"""
+        # 创建已猜测玩家ID集合（包括对手猜错的玩家），用于排除
+        guessed_player_ids = client.excluded_player_ids()
+        
+        # 未指定约束条件时，使用客户端内部累积的约束条件
+        combined_constraints = constraints if constraints else client.combined_constraints()
+        
+        # 添加游戏元数据
+        game_metadata = {
+            'best_of': getattr(client, 'best_of', 'best_of_3'),
+            'current_wins': getattr(client, 'player_wins', 0),
+            'required_wins': client._calculate_required_wins(getattr(client, 'best_of', 'best_of_3')),
+            'current_phase': client.current_game_phase,
+            'remaining_guesses': 8 - len(client.guess_results) if client.current_game_phase == 'game' else 8
+        }
+        
+        # 游戏阶段使用本轮开始时的数据集版本，数据集热替换不影响进行中的轮次
+        dataset = client.players_dataset()
+        
+        # 推荐结果只取决于数据版本、已猜测玩家、约束条件和元数据，据此生成版本号
+        version_source = json.dumps({
+            'dataset': dataset.version,
+            'guessed': sorted(guessed_player_ids),
+            'constraints': combined_constraints,
+            'metadata': game_metadata
+        }, sort_keys=True, ensure_ascii=False, default=str)
+        current_etag = hashlib.sha1(version_source.encode('utf-8')).hexdigest()[:16]
+        
+        # 版本未变化时复用已排序的候选列表，避免重复过滤和排序
+        cache = cls.custom_recommendation_cache if constraints else cls.recommendation_cache
+        cached = cache.get(room_id)
+        if cached and cached['etag'] == current_etag:
+            ranked_players = cached['players']
+        else:
+            # 排除已猜测的玩家，按约束条件过滤（没有匹配时不过滤）并按熵值排序；
+            # 计算在求解器执行器中进行，不阻塞其他房间的消息处理
+            ranked_players = await solver_pool.rank_players(
+                guessed_player_ids, combined_constraints, client.countries_data, dataset)
+            print(f"排除已猜测的 {len(guessed_player_ids)} 名玩家并应用约束条件后，共 {len(ranked_players)} 名可推荐玩家")
+            cache[room_id] = {'etag': current_etag, 'players': ranked_players}
+        
+        return {
+            'etag': current_etag,
+            'players': ranked_players,
+            'game_metadata': game_metadata,
+            'constraints': combined_constraints
+        }
+    
+    @classmethod
+    def get_queue_stats(cls, room_id: str) -> Dict[str, Any]:
+        """返回房间上游消息处理队列的深度和溢出统计"""
+        client = cls.active_clients.get(room_id)
+        if not client:
+            raise HTTPException(status_code=404, detail="没有找到指定房间的连接")
+        return client.queue_stats()
+    
+    @classmethod
+    def get_dataset_status(cls) -> Dict[str, Any]:
+        """返回当前数据集版本以及各房间本轮使用的版本"""
+        status = dataset_status()
+        status['rooms'] = {room_id: client.dataset.version if client.dataset else None
+                           for room_id, client in cls.active_clients.items()}
+        return status
+    
+    @classmethod
+    async def get_recommendations(cls, room_id: str, constraints: Dict[str, Any] = None,
+                                  cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                                  etag: Optional[str] = None) -> Dict[str, Any]:
+        """获取推荐玩家列表以及游戏元数据，支持游标分页和版本号条件请求"""
         client = await cls.get_client(room_id)
         
         try:
-            # 加载玩家数据
-            with open("players_with_entropy.json", 'r', encoding='utf-8') as f:
-                all_players = json.load(f)
-            
-            # 创建已猜测玩家ID集合，用于排除
-            guessed_player_ids = set()
-            for result in client.guess_results:
-                if 'id' in result:
-                    guessed_player_ids.add(result['id'])
-            
-            # 先排除已猜测的玩家
-            available_players = [p for p in all_players if p.get('id') not in guessed_player_ids]
-            print(f"排除已猜测的 {len(guessed_player_ids)} 名玩家后，剩余 {len(available_players)} 名可推荐玩家")
+            ranking = await cls._rank_recommendations(room_id, client, constraints)
+            current_etag = ranking['etag']
+            ranked_players = ranking['players']
             
-            # 再应用约束条件过滤
-            if constraints:
-                filtered_players = client.filter_players(available_players, constraints)
-            else:
-                # 使用客户端内部累积的约束条件
-                combined_constraints = {}
-
-                # 从以往猜测中提取约束条件
-                combined_constraints = client.accumulated_constraints.copy()  # 使用累积的约束条件
-
-                # 从当前轮次添加额外约束条件
-                current_round_constraints = {}
-                for result in client.guess_results:
-                    if 'constraints' in result:
-                        # 使用客户端的merge_constraints方法进行智能合并
-                        current_round_constraints = client.merge_constraints(
-                            current_round_constraints,
-                            result['constraints']
-                        )
-
-                # 合并当前轮次和累积的约束条件
-                combined_constraints = client.merge_constraints(
-                    combined_constraints,
-                    current_round_constraints
-                )
-
-                filtered_players = client.filter_players(available_players, combined_constraints)
+            # 客户端持有的版本未变化，且不是翻页请求，直接返回空响应
+            if etag == current_etag and not cursor:
+                return {'not_modified': True, 'etag': current_etag}
             
-            # 按熵值排序
-            filtered_players.sort(key=lambda p: p.get('entropy_value', 0), reverse=True)
+            offset = 0
+            if cursor:
+                cursor_etag, offset = _decode_cursor(cursor)
+                if cursor_etag != current_etag:
+                    raise HTTPException(status_code=409, detail="推荐列表已更新，分页游标已失效，请重新加载")
             
-            # 如果过滤后没有玩家，尝试放宽约束条件
-            if not filtered_players and available_players:
-                print("严格约束条件下没有玩家匹配，返回未经过滤的可用玩家")
-                available_players.sort(key=lambda p: p.get('entropy_value', 0), reverse=True)
-                filtered_players = available_players[:20]  # 返回熵值最高的20个
+            limit = max(1, min(limit, MAX_PAGE_SIZE))
+            page = ranked_players[offset:offset + limit]
+            next_offset = offset + len(page)
+            next_cursor = _encode_cursor(current_etag, next_offset) if next_offset < len(ranked_players) else None
             
             # 转换字段名称以匹配Pydantic模型
-            transformed_players = []
-            for player in filtered_players[:20]:  # 仅返回前20个
-                transformed_players.append({
-                    'player_id': player.get('id', ''),
-                    'first_name': player.get('firstName', ''),
-                    'last_name': player.get('lastName', ''),
-                    'nickname': player.get('nickname', ''),
-                    'nationality': player.get('nationality', ''),
-                    'team': player.get('team', {}).get('name') if isinstance(player.get('team'), dict) else player.get('team'),
-                    'age': player.get('age'),
-                    'role': player.get('role', ''),
-                    'is_retired': player.get('isRetired', False),
-                    'entropy_value': player.get('entropy_value'),
-                    'image_url': player.get('image_url', '')
-                })
-            
-            # 添加游戏元数据
-            game_metadata = {
-                'best_of': getattr(client, 'best_of', 'best_of_3'),
-                'current_wins': getattr(client, 'player_wins', 0),
-                'required_wins': client._calculate_required_wins(getattr(client, 'best_of', 'best_of_3')),
-                'current_phase': client.current_game_phase,
-                'remaining_guesses': 8 - len(client.guess_results) if client.current_game_phase == 'game' else 8
-            }
+            transformed_players = [cls._to_recommendation(player) for player in page]
             
             return {
                 'recommendations': transformed_players, 
-                'game_metadata': game_metadata,
-                'constraints': combined_constraints if not constraints else constraints
+                'game_metadata': ranking['game_metadata'],
+                'constraints': ranking['constraints'],
+                'etag': current_etag,
+                'next_cursor': next_cursor,
+                'total': len(ranked_players),
+                'not_modified': False
             }
+        except HTTPException:
+            raise
         except Exception as e:
             import traceback
             traceback.print_exc()
             raise HTTPException(status_code=500, detail=f"获取推荐失败: {str(e)}")
     
+    @classmethod
+    async def push_recommendation_delta(cls, room_id: str):
+        """猜测结果处理完成后，为房间计算一次新的推荐排序，并把前DELTA_WINDOW名的变化推送给所有浏览器"""
+        if not cls.ws_connections.get(room_id) or room_id not in cls.active_clients:
+            return
+        
+        try:
+            client = cls.active_clients[room_id]
+            previous = cls.recommendation_cache.get(room_id)
+            ranking = await cls._rank_recommendations(room_id, client)
+            if previous and previous['etag'] == ranking['etag']:
+                return
+            
+            window = ranking['players'][:DELTA_WINDOW]
+            new_ids = [player.get('id') for player in window]
+            old_ids = [player.get('id') for player in previous['players'][:DELTA_WINDOW]] if previous else []
+            old_set = set(old_ids)
+            new_set = set(new_ids)
+            
+            delta = {
+                "type": "RECOMMENDATIONS_DELTA",
+                # 浏览器持有的版本与base_etag一致时才能应用增量，否则重新加载
+                "base_etag": previous['etag'] if previous else None,
+                "etag": ranking['etag'],
+                "removed": [player_id for player_id in old_ids if player_id not in new_set],
+                "added": [cls._to_recommendation(player) for player in window if player.get('id') not in old_set],
+                "order": new_ids,
+                "total": len(ranking['players']),
+                "next_cursor": _encode_cursor(ranking['etag'], len(window)) if len(window) < len(ranking['players']) else None,
+                "constraints": ranking['constraints'],
+                "game_metadata": ranking['game_metadata']
+            }
+        except Exception as e:
+            print(f"计算推荐增量失败: {str(e)}")
+            return
+        await cls.broadcast_update(room_id, delta)
+    
+    @classmethod
+    def search_players(cls, query: str, limit: int = DEFAULT_PAGE_SIZE, offset: int = 0) -> Dict[str, Any]:
+        """按昵称和姓名搜索全部玩家（不区分大小写和重音符号）"""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        players, total = get_search_index().search(query, limit=limit, offset=max(0, offset))
+        return {'results': [cls._to_recommendation(p) for p in players], 'total': total}
+    
+    @staticmethod
+    def _to_recommendation(player: Dict[str, Any]) -> Dict[str, Any]:
+        """将玩家数据转换为推荐条目"""
+        return {
+            'player_id': player.get('id', ''),
+            'first_name': player.get('firstName', ''),
+            'last_name': player.get('lastName', ''),
+            'nickname': player.get('nickname', ''),
+            'nationality': player.get('nationality', ''),
+            'team': player.get('team', {}).get('name') if isinstance(player.get('team'), dict) else player.get('team'),
+            'age': player.get('age'),
+            'role': player.get('role', ''),
+            'is_retired': player.get('isRetired', False),
+            'entropy_value': player.get('entropy_value'),
+            'image_url': player.get('image_url', '')
+        }
+    
     @classmethod
     async def broadcast_update(cls, room_id: str, update: Dict[str, Any]):
         """向房间内所有连接的WebSocket客户端广播更新"""
@@ -211,10 +367,14 @@ class GameService:
         if room_id in cls.ws_connections and cls.ws_connections[room_id]:
             print(f"📣 广播消息类型: {update.get('type')} 到 {len(cls.ws_connections[room_id])} 个客户端")
             
-            # 向所有连接的客户端发送消息
+            # 每种编码只序列化一次，再发送给所有使用该编码的客户端
+            frames = {}
             for i, websocket in list(enumerate(cls.ws_connections[room_id])):
                 try:
-                    await websocket.send_json(update)
+                    encoding = websocket_encoding(websocket)
+                    if encoding not in frames:
+                        frames[encoding] = encode_frame(update, encoding)
+                    await send_frame(websocket, frames[encoding])
                 except Exception as e:
                     print(f"⚠️ 向客户端 {i} 发送消息失败: {str(e)}")
                     # 标记断开连接的客户端
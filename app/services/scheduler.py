@@ -0,0 +1,202 @@
+import asyncio
+import contextlib
+import os
+import time
+from collections import Counter, OrderedDict, defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core import solver_pool
+from app.services.game_service import GameService
+
+# 同时运行自动猜测的房间数量上限，超出的房间排队等待
+MAX_CONCURRENT_ROOMS = int(os.environ.get("AUTO_GUESS_MAX_ROOMS", "50"))
+
+
+class SolverGate:
+    """求解器计算的公平执行权
+
+    同时进行的计算数量不超过求解器执行器的工作单元数（就地计算时为1）。等待中的房间
+    按轮转顺序获得执行权：每个房间每轮最多一次，计算量大的房间不会挤占其他房间。
+    """
+
+    def __init__(self, capacity: int = 1):
+        self._waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self.capacity = max(1, capacity)
+        self._active = 0
+        self.turns: Counter = Counter()
+        self.cpu_time: Dict[str, float] = defaultdict(float)
+
+    @contextlib.asynccontextmanager
+    async def turn(self, room_id: str):
+        if self._active >= self.capacity or self._waiting:
+            future = asyncio.get_running_loop().create_future()
+            self._waiting.setdefault(room_id, deque()).append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # 已经获得执行权但任务被取消，交给下一个房间
+                    self._release()
+                else:
+                    self._discard(room_id, future)
+                raise
+        else:
+            self._active += 1
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.cpu_time[room_id] += time.perf_counter() - start
+            self.turns[room_id] += 1
+            self._release()
+        # 让出事件循环，处理积压的网络消息
+        await asyncio.sleep(0)
+
+    def _discard(self, room_id: str, future: asyncio.Future):
+        queue = self._waiting.get(room_id)
+        if queue and future in queue:
+            queue.remove(future)
+            if not queue:
+                del self._waiting[room_id]
+
+    def _release(self):
+        """把执行权交给轮转顺序中的下一个房间，没有等待的房间时归还执行权"""
+        while self._waiting:
+            room_id, queue = next(iter(self._waiting.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiting.move_to_end(room_id)
+            else:
+                del self._waiting[room_id]
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    @property
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._waiting.values())
+
+    def forget(self, room_id: str):
+        self.turns.pop(room_id, None)
+        self.cpu_time.pop(room_id, None)
+
+
+class RoomSession:
+    """一个房间的自动猜测会话"""
+
+    def __init__(self, room_id: str, max_guesses: int):
+        self.room_id = room_id
+        self.max_guesses = max_guesses
+        self.state = "queued"  # queued | running | succeeded | failed | cancelled | error
+        self.message: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.state in ("queued", "running")
+
+
+class AutoGuessScheduler:
+    """并发运行多个房间的自动猜测，限制同时运行的房间数量并公平分配求解器计算"""
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_ROOMS):
+        self.max_concurrent = max_concurrent
+        self.gate = SolverGate(solver_pool.capacity())
+        self.sessions: Dict[str, RoomSession] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def submit(self, room_id: str, max_guesses: int = 8) -> RoomSession:
+        """提交房间的自动猜测；房间已在排队或运行时返回现有会话"""
+        session = self.sessions.get(room_id)
+        if session and session.active:
+            return session
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        session = RoomSession(room_id, max_guesses)
+        session.task = asyncio.create_task(self._run(session))
+        self.sessions[room_id] = session
+        return session
+
+    async def _run(self, session: RoomSession):
+        try:
+            async with self._slots:
+                session.state = "running"
+                session.started_at = time.time()
+                client = await GameService.get_client(session.room_id)
+                client.solver_gate = self.gate
+                success = await client.start_auto_guessing(session.max_guesses)
+                session.state = "succeeded" if success else "failed"
+        except asyncio.CancelledError:
+            session.state = "cancelled"
+            raise
+        except Exception as e:
+            session.state = "error"
+            session.message = getattr(e, "detail", None) or str(e)
+            print(f"房间 {session.room_id} 自动猜测出错: {session.message}")
+        finally:
+            session.finished_at = time.time()
+
+    async def cancel(self, room_id: str) -> bool:
+        session = self.sessions.get(room_id)
+        if not session or not session.active:
+            return False
+        session.task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await session.task
+        return True
+
+    def remove(self, room_id: str):
+        """移除已结束的会话记录"""
+        session = self.sessions.get(room_id)
+        if session and not session.active:
+            del self.sessions[room_id]
+            self.gate.forget(room_id)
+
+    def status(self, room_id: str) -> Optional[Dict[str, Any]]:
+        session = self.sessions.get(room_id)
+        if not session:
+            return None
+
+        status = {
+            "room_id": room_id,
+            "state": session.state,
+            "message": session.message,
+            "max_guesses": session.max_guesses,
+            "created_at": session.created_at,
+            "started_at": session.started_at,
+            "finished_at": session.finished_at,
+            "solver_turns": self.gate.turns.get(room_id, 0),
+            "solver_time": round(self.gate.cpu_time.get(room_id, 0.0), 4),
+        }
+        client = GameService.active_clients.get(room_id)
+        if client:
+            status.update({
+                "game_phase": client.current_game_phase,
+                "guesses": len(client.guess_results),
+                "player_wins": client.player_wins,
+                "pacing_interval": client.pacer.delay(),
+                "queue_depth": client.inbound.qsize(),
+                "queue_overflows": client.inbound_stats["overflows"],
+            })
+        return status
+
+    def summary(self) -> Dict[str, Any]:
+        states = Counter(session.state for session in self.sessions.values())
+        return {
+            "max_concurrent": self.max_concurrent,
+            "states": dict(states),
+            "solver_pending": self.gate.pending,
+            "solver": solver_pool.status(),
+        }
+
+    def all_status(self) -> List[Dict[str, Any]]:
+        return [self.status(room_id) for room_id in self.sessions]
+
+
+scheduler = AutoGuessScheduler()
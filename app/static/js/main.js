@@ -17,9 +17,27 @@ document.addEventListener('DOMContentLoaded', function () {
     let isConnected = false;
     let remainingGuesses = 8;
     let currentRecommendations = [];
+    let recommendationsEtag = null;
+    let recommendationsCursor = null;  // 推荐列表下一页的游标
+    let searchState = null;  // 服务端搜索的分页状态 {query, offset, total}
+    let loadingMore = false;
     let currentConstraints = {};
     let gameSocket = null;
     let currentRoomId = null;
+    let wireFields = null;  // 二进制编码的字段表，由服务端的PROTOCOL消息提供
+
+    const RECOMMENDATION_PAGE_SIZE = 100;
+    const SEARCH_PAGE_SIZE = 50;
+
+    // 选手列表只渲染可见的卡片，滚动到末尾时加载下一页
+    const playerListView = new VirtualPlayerList(playerList, {
+        rowHeight: 260,
+        minColumnWidth: 180,
+        gap: 12,
+        renderCard: playerCardHtml,
+        onSelect: playerId => sendManualGuess(playerId),
+        onNearEnd: loadMorePlayers
+    });
 
     // 建立WebSocket连接
     // 在connectWebSocket函数中添加连接状态监控
@@ -31,11 +49,14 @@ document.addEventListener('DOMContentLoaded', function () {
 
         // 构建WebSocket URL
         const wsProtocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-        const wsUrl = `${wsProtocol}//${window.location.host}/ws/${roomId}`;
+        // 请求紧凑的二进制编码，服务端会先发送字段表
+        const wsUrl = `${wsProtocol}//${window.location.host}/ws/${roomId}?encoding=msgpack`;
         console.log(`正在连接WebSocket: ${wsUrl}`);
 
         // 创建WebSocket连接
         gameSocket = new WebSocket(wsUrl);
+        gameSocket.binaryType = 'arraybuffer';
+        wireFields = null;
 
         // 连接打开时
         gameSocket.onopen = function (event) {
@@ -57,7 +78,16 @@ document.addEventListener('DOMContentLoaded', function () {
                     return;
                 }
 
-                const data = JSON.parse(event.data);
+                let data;
+                if (event.data instanceof ArrayBuffer) {
+                    data = decodeWireFrame(event.data, wireFields);
+                } else {
+                    data = JSON.parse(event.data);
+                    if (data.type === 'PROTOCOL') {
+                        wireFields = data.fields || null;
+                        return;
+                    }
+                }
                 console.log("📥 收到WebSocket消息:", data.type, data);
                 handleWebSocketMessage(data);
             } catch (error) {
@@ -143,8 +173,11 @@ document.addEventListener('DOMContentLoaded', function () {
                 remainingGuesses = data.remaining_guesses;
                 guessCounter.textContent = remainingGuesses;
 
-                // 刷新推荐列表
-                loadRecommendations(currentRoomId);
+                // 推荐列表的更新由服务端随后推送的RECOMMENDATIONS_DELTA完成
+                break;
+
+            case "RECOMMENDATIONS_DELTA":
+                applyRecommendationsDelta(data);
                 break;
 
             default:
@@ -152,6 +185,42 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
+    // 应用服务端推送的推荐列表增量；本地版本与增量的基准版本不一致时重新加载
+    function applyRecommendationsDelta(delta) {
+        if (delta.base_etag && delta.base_etag !== recommendationsEtag) {
+            loadRecommendations(currentRoomId);
+            return;
+        }
+
+        const playersById = new Map();
+        if (delta.base_etag) {
+            currentRecommendations.forEach(player => playersById.set(player.player_id, player));
+        }
+        delta.removed.forEach(playerId => playersById.delete(playerId));
+        delta.added.forEach(player => playersById.set(player.player_id, player));
+
+        const nextRecommendations = delta.order.map(playerId => playersById.get(playerId));
+        if (nextRecommendations.some(player => !player)) {
+            // 本地缺少部分选手数据（例如只加载了较少的条目），重新加载
+            recommendationsEtag = null;
+            loadRecommendations(currentRoomId);
+            return;
+        }
+
+        currentRecommendations = nextRecommendations;
+        recommendationsEtag = delta.etag;
+        recommendationsCursor = delta.next_cursor || null;
+        if (!searchPlayer.value.trim()) {
+            renderPlayerList(currentRecommendations);
+        }
+        if (delta.game_metadata) {
+            updateGameMetadata(delta.game_metadata);
+        }
+        if (delta.constraints) {
+            updateConstraintsDisplay(delta.constraints);
+        }
+    }
+
     // 更新updateGameMetadata函数，确保UI正确更新
     function updateGameMetadata(metadata) {
         console.log("更新游戏元数据:", metadata); // 添加调试日志
@@ -340,9 +409,21 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     });
 
-    // 搜索选手
+    // 搜索选手：先即时过滤当前推荐，稍后用服务端搜索全部选手
+    let searchTimer = null;
+    let searchController = null;
     searchPlayer.addEventListener('input', function () {
-        filterPlayers(this.value.toLowerCase());
+        const query = this.value.trim();
+        clearTimeout(searchTimer);
+        if (searchController) searchController.abort();
+
+        if (!query) {
+            searchState = null;
+            renderPlayerList(currentRecommendations);
+            return;
+        }
+        filterPlayers(query.toLowerCase());
+        searchTimer = setTimeout(() => searchAllPlayers(query), 150);
     });
 
     // 添加准备就绪按钮事件处理
@@ -393,20 +474,30 @@ document.addEventListener('DOMContentLoaded', function () {
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify({ room_id: roomId })
+                body: JSON.stringify({ room_id: roomId, etag: recommendationsEtag, limit: RECOMMENDATION_PAGE_SIZE })
             });
 
             const data = await response.json();
             console.log("API返回数据:", data); // 调试输出
 
+            // 推荐列表没有变化，保留当前显示
+            if (data.success && data.not_modified) {
+                return;
+            }
+
             if (data.success) {
+                recommendationsEtag = data.etag || null;
+                recommendationsCursor = data.next_cursor || null;
                 // 确保recommendations是一个数组
                 if (Array.isArray(data.recommendations)) {
                     currentRecommendations = data.recommendations;
-                    renderPlayerList(currentRecommendations);
+                    // 正在搜索时不覆盖搜索结果
+                    if (!searchPlayer.value.trim()) {
+                        renderPlayerList(currentRecommendations);
+                    }
                 } else {
                     console.error("API返回的推荐数据不是数组:", data.recommendations);
-                    playerList.innerHTML = `<div class="error-message">推荐数据格式错误</div>`;
+                    playerListView.showMessage('error-message', '推荐数据格式错误');
                     return;
                 }
 
@@ -420,11 +511,11 @@ document.addEventListener('DOMContentLoaded', function () {
                     updateConstraintsDisplay(data.constraints);
                 }
             } else {
-                playerList.innerHTML = `<div class="error-message">加载推荐失败: ${data.message}</div>`;
+                playerListView.showMessage('error-message', `加载推荐失败: ${data.message}`);
             }
         } catch (error) {
             console.error("加载推荐错误:", error);
-            playerList.innerHTML = `<div class="error-message">加载推荐错误: ${error.message}</div>`;
+            playerListView.showMessage('error-message', `加载推荐错误: ${error.message}`);
         }
     }
 
@@ -458,8 +549,10 @@ document.addEventListener('DOMContentLoaded', function () {
                     showSuccessMessage(data.result);
                 }
 
-                // 刷新推荐列表
-                loadRecommendations(roomId);
+                // 推荐列表通过WebSocket增量更新，连接不可用时才主动刷新
+                if (!gameSocket || gameSocket.readyState !== WebSocket.OPEN) {
+                    loadRecommendations(roomId);
+                }
             }
         } catch (error) {
             addGuessResult({
@@ -469,52 +562,90 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
-    // 渲染选手列表
-    function renderPlayerList(players) {
-        playerList.innerHTML = '';
-
-        if (!players || players.length === 0) {
-            playerList.innerHTML = '<div class="empty-message">没有可推荐的选手</div>';
-            return;
-        }
+    // 列表滚动到末尾时加载下一页：搜索结果按偏移分页，推荐列表按游标分页
+    async function loadMorePlayers() {
+        if (loadingMore) return;
+        if (searchState ? searchState.offset >= searchState.total : !recommendationsCursor) return;
 
-        players.forEach(player => {
-            const playerCard = document.createElement('div');
-            playerCard.className = 'player-card';
-            playerCard.dataset.playerId = player.player_id;
-
-            const imageUrl = player.image_url || 'https://via.placeholder.com/150?text=No+Image';
+        loadingMore = true;
+        try {
+            if (searchState) {
+                const query = searchState.query;
+                const params = new URLSearchParams({ q: query, limit: SEARCH_PAGE_SIZE, offset: searchState.offset });
+                const response = await fetch(`/api/players/search?${params}`);
+                const data = await response.json();
+                if (!searchState || searchState.query !== query || !data.success) return;
+
+                searchState.offset += data.results.length;
+                searchState.total = data.total;
+                playerListView.appendItems(data.results);
+            } else {
+                const response = await fetch('/api/recommendations', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json'
+                    },
+                    body: JSON.stringify({
+                        room_id: roomIdInput.value.trim(),
+                        cursor: recommendationsCursor,
+                        limit: RECOMMENDATION_PAGE_SIZE
+                    })
+                });
+                const data = await response.json();
 
-            // 处理团队显示
-            let teamDisplay = '无团队';
-            if (player.team) {
-                if (typeof player.team === 'object' && player.team !== null) {
-                    teamDisplay = player.team.name || '未知团队';
+                if (data.success) {
+                    recommendationsCursor = data.next_cursor || null;
+                    currentRecommendations = currentRecommendations.concat(data.recommendations);
+                    if (!searchPlayer.value.trim()) {
+                        playerListView.appendItems(data.recommendations);
+                    }
                 } else {
-                    teamDisplay = player.team;
+                    // 推荐列表已经更新，游标失效，重新加载第一页
+                    recommendationsCursor = null;
+                    recommendationsEtag = null;
+                    loadRecommendations(roomIdInput.value.trim());
                 }
             }
+        } catch (error) {
+            console.error("加载更多选手错误:", error);
+        } finally {
+            loadingMore = false;
+        }
+    }
 
-            playerCard.innerHTML = `
-                <img src="${imageUrl}" alt="${player.nickname || '未知选手'}">
-                <div class="player-name">${player.nickname || '未知选手'}</div>
-                <div class="player-info">
-                    ${player.first_name || ''} ${player.last_name || ''}<br>
-                    ${player.nationality || '未知国籍'} | ${teamDisplay}<br>
-                    ${player.role || '未知角色'} | ${player.age ? player.age + '岁' : '未知年龄'}
-                </div>
-                <div class="player-entropy">熵值: ${player.entropy_value ? player.entropy_value.toFixed(3) : 'N/A'}</div>
-            `;
+    // 渲染选手列表（未变化的卡片会被复用）
+    function renderPlayerList(players) {
+        if (!players || players.length === 0) {
+            playerListView.showMessage('empty-message', '没有可推荐的选手');
+            return;
+        }
+        playerListView.setItems(players);
+    }
 
-            playerCard.addEventListener('click', function () {
-                const playerId = this.dataset.playerId;
-                if (playerId) {
-                    sendManualGuess(playerId);
-                }
-            });
+    // 生成选手卡片内容
+    function playerCardHtml(player) {
+        const imageUrl = player.image_url || 'https://via.placeholder.com/150?text=No+Image';
 
-            playerList.appendChild(playerCard);
-        });
+        // 处理团队显示
+        let teamDisplay = '无团队';
+        if (player.team) {
+            if (typeof player.team === 'object' && player.team !== null) {
+                teamDisplay = player.team.name || '未知团队';
+            } else {
+                teamDisplay = player.team;
+            }
+        }
+
+        return `
+            <img src="${imageUrl}" alt="${player.nickname || '未知选手'}" loading="lazy">
+            <div class="player-name">${player.nickname || '未知选手'}</div>
+            <div class="player-info">
+                ${player.first_name || ''} ${player.last_name || ''}<br>
+                ${player.nationality || '未知国籍'} | ${teamDisplay}<br>
+                ${player.role || '未知角色'} | ${player.age ? player.age + '岁' : '未知年龄'}
+            </div>
+            <div class="player-entropy">熵值: ${player.entropy_value ? player.entropy_value.toFixed(3) : 'N/A'}</div>
+        `;
     }
 
     // 过滤选手列表
@@ -536,6 +667,28 @@ document.addEventListener('DOMContentLoaded', function () {
         renderPlayerList(filteredPlayers);
     }
 
+    // 在服务端搜索全部选手（不区分大小写和重音符号）
+    async function searchAllPlayers(query) {
+        searchController = new AbortController();
+        try {
+            const params = new URLSearchParams({ q: query, limit: 50, offset: 0 });
+            const response = await fetch(`/api/players/search?${params}`, { signal: searchController.signal });
+            const data = await response.json();
+
+            // 输入已经变化时丢弃过期的结果
+            if (searchPlayer.value.trim() !== query) return;
+            if (data.success) {
+                searchState = { query: query, offset: data.results.length, total: data.total };
+                renderPlayerList(data.results);
+                playerListView.scrollToTop();
+            }
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                console.error("搜索选手错误:", error);
+            }
+        }
+    }
+
     // 添加猜测结果
     function addGuessResult(data) {
         const resultElement = document.createElement('div');
@@ -688,12 +841,20 @@ document.addEventListener('DOMContentLoaded', function () {
                 case 'nationality_region':
                     if (value.region) {
                         constraintText = `必须在 ${value.region} 区域`;
+                    } else if (value.exclude_list) {
+                        constraintText = `不能在 ${value.exclude_list.join(', ')} 区域`;
+                    } else if (value.exclude) {
+                        constraintText = `不能在 ${value.exclude} 区域`;
                     }
                     break;
 
                 case 'team':
                     if (value.exact) {
-                        constraintText = `必须是 ${value.exact}`;
+                        constraintText = `必须是 ${value.name || value.exact}`;
+                    } else if (value.exclude_list) {
+                        constraintText = `排除 ${value.exclude_list.length} 支队伍`;
+                    } else if (value.exclude) {
+                        constraintText = '排除 1 支队伍';
                     }
                     break;
 
@@ -860,10 +1021,13 @@ document.addEventListener('DOMContentLoaded', function () {
     function resetGameState() {
         remainingGuesses = 8;
         guessCounter.textContent = remainingGuesses;
-        playerList.innerHTML = '';
+        playerListView.setItems([]);
         guessResults.innerHTML = '';
         constraints.innerHTML = '';
         currentRecommendations = [];
+        recommendationsEtag = null;
+        recommendationsCursor = null;
+        searchState = null;
         currentConstraints = {};
     }
 });
\ No newline at end of file
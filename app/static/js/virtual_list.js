@@ -0,0 +1,122 @@
+// 虚拟化的选手卡片网格：只渲染可见的行，按选手ID复用和更新卡片
+class VirtualPlayerList {
+    constructor(container, options) {
+        this.container = container;
+        this.rowHeight = options.rowHeight || 260;
+        this.minColumnWidth = options.minColumnWidth || 180;
+        this.gap = options.gap || 12;
+        this.overscan = options.overscan || 2;  // 可见区域上下额外渲染的行数
+        this.renderCard = options.renderCard;
+        this.onSelect = options.onSelect;
+        this.onNearEnd = options.onNearEnd;
+
+        this.items = [];
+        this.columns = 1;
+        this.cards = new Map();  // 选手ID -> {element, signature}
+        this.frameRequested = false;
+
+        this.container.classList.add('virtual-list');
+        this.container.innerHTML = '';
+        this.spacer = document.createElement('div');
+        this.spacer.className = 'virtual-spacer';
+        this.window = document.createElement('div');
+        this.window.className = 'virtual-window';
+        this.message = document.createElement('div');
+        this.container.append(this.spacer, this.window, this.message);
+
+        // 所有卡片共用一个点击监听器
+        this.window.addEventListener('click', (event) => {
+            const card = event.target.closest('.player-card');
+            if (card && card.dataset.playerId && this.onSelect) {
+                this.onSelect(card.dataset.playerId);
+            }
+        });
+        this.container.addEventListener('scroll', () => this.scheduleRender(), { passive: true });
+        if (window.ResizeObserver) {
+            new ResizeObserver(() => this.scheduleRender()).observe(this.container);
+        }
+    }
+
+    // 替换全部数据；ID相同且内容未变的卡片不会重建
+    setItems(items) {
+        this.items = items || [];
+        this.message.className = '';
+        this.message.innerHTML = '';
+        this.scheduleRender();
+    }
+
+    // 追加下一页数据
+    appendItems(items) {
+        const known = new Set(this.items.map(item => item.player_id));
+        this.items = this.items.concat((items || []).filter(item => !known.has(item.player_id)));
+        this.scheduleRender();
+    }
+
+    showMessage(className, text) {
+        this.items = [];
+        this.message.className = className;
+        this.message.textContent = text;
+        this.scheduleRender();
+    }
+
+    scrollToTop() {
+        this.container.scrollTop = 0;
+    }
+
+    scheduleRender() {
+        if (this.frameRequested) return;
+        this.frameRequested = true;
+        requestAnimationFrame(() => {
+            this.frameRequested = false;
+            this.render();
+        });
+    }
+
+    render() {
+        const width = this.container.clientWidth || this.minColumnWidth;
+        this.columns = Math.max(1, Math.floor((width + this.gap) / (this.minColumnWidth + this.gap)));
+        const totalRows = Math.ceil(this.items.length / this.columns);
+        this.spacer.style.height = `${totalRows * this.rowHeight}px`;
+        this.window.style.gridTemplateColumns = `repeat(${this.columns}, 1fr)`;
+
+        const viewportHeight = this.container.clientHeight || this.rowHeight;
+        const firstRow = Math.max(0, Math.floor(this.container.scrollTop / this.rowHeight) - this.overscan);
+        const lastRow = Math.min(totalRows, Math.ceil((this.container.scrollTop + viewportHeight) / this.rowHeight) + this.overscan);
+        const visible = this.items.slice(firstRow * this.columns, lastRow * this.columns);
+        this.window.style.transform = `translateY(${firstRow * this.rowHeight}px)`;
+
+        // 按ID复用卡片，只有内容变化的卡片才重新生成
+        const nextCards = new Map();
+        const elements = visible.map(player => {
+            const signature = JSON.stringify(player);
+            let entry = this.cards.get(player.player_id);
+            if (!entry) {
+                const element = document.createElement('div');
+                element.className = 'player-card';
+                element.dataset.playerId = player.player_id;
+                entry = { element: element, signature: null };
+            }
+            if (entry.signature !== signature) {
+                entry.element.innerHTML = this.renderCard(player);
+                entry.signature = signature;
+            }
+            nextCards.set(player.player_id, entry);
+            return entry.element;
+        });
+
+        // 只在顺序变化时移动节点
+        elements.forEach((element, index) => {
+            if (this.window.children[index] !== element) {
+                this.window.insertBefore(element, this.window.children[index] || null);
+            }
+        });
+        while (this.window.children.length > elements.length) {
+            this.window.lastChild.remove();
+        }
+        this.cards = nextCards;
+
+        if (this.onNearEnd && totalRows > 0 && lastRow >= totalRows - this.overscan) {
+            this.onNearEnd();
+        }
+    }
+}
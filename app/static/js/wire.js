@@ -0,0 +1,103 @@
+// 解码服务端发送的二进制WebSocket消息（MessagePack子集），整数键按字段表还原为字段名
+const wireTextDecoder = new TextDecoder();
+
+function decodeWireFrame(buffer, fields) {
+    const bytes = new Uint8Array(buffer);
+    const view = new DataView(buffer);
+    let offset = 0;
+
+    function uint8() {
+        return bytes[offset++];
+    }
+
+    function uint16() {
+        const value = view.getUint16(offset);
+        offset += 2;
+        return value;
+    }
+
+    function uint32() {
+        const value = view.getUint32(offset);
+        offset += 4;
+        return value;
+    }
+
+    function readString(length) {
+        const value = wireTextDecoder.decode(bytes.subarray(offset, offset + length));
+        offset += length;
+        return value;
+    }
+
+    function readArray(length) {
+        const items = new Array(length);
+        for (let i = 0; i < length; i++) {
+            items[i] = read();
+        }
+        return items;
+    }
+
+    function readMap(length) {
+        const object = {};
+        for (let i = 0; i < length; i++) {
+            let key = read();
+            if (typeof key === 'number') {
+                key = fields[key];
+            }
+            object[key] = read();
+        }
+        return object;
+    }
+
+    function read() {
+        const code = uint8();
+        if (code < 0x80) return code;
+        if (code < 0x90) return readMap(code & 0x0f);
+        if (code < 0xa0) return readArray(code & 0x0f);
+        if (code < 0xc0) return readString(code & 0x1f);
+        if (code >= 0xe0) return code - 0x100;
+
+        let value;
+        switch (code) {
+            case 0xc0: return null;
+            case 0xc2: return false;
+            case 0xc3: return true;
+            case 0xcb:
+                value = view.getFloat64(offset);
+                offset += 8;
+                return value;
+            case 0xcc: return uint8();
+            case 0xcd: return uint16();
+            case 0xce: return uint32();
+            case 0xcf:
+                value = Number(view.getBigUint64(offset));
+                offset += 8;
+                return value;
+            case 0xd0:
+                value = view.getInt8(offset);
+                offset += 1;
+                return value;
+            case 0xd1:
+                value = view.getInt16(offset);
+                offset += 2;
+                return value;
+            case 0xd2:
+                value = view.getInt32(offset);
+                offset += 4;
+                return value;
+            case 0xd3:
+                value = Number(view.getBigInt64(offset));
+                offset += 8;
+                return value;
+            case 0xd9: return readString(uint8());
+            case 0xda: return readString(uint16());
+            case 0xdb: return readString(uint32());
+            case 0xdc: return readArray(uint16());
+            case 0xdd: return readArray(uint32());
+            case 0xde: return readMap(uint16());
+            case 0xdf: return readMap(uint32());
+        }
+        throw new Error(`不支持的消息编码类型: 0x${code.toString(16)}`);
+    }
+
+    return read();
+}
@@ -0,0 +1,246 @@
+"""求解器与服务热点路径的微基准测试
+
+    python benchmarks/bench.py run --output benchmarks/baseline.json
+    python benchmarks/bench.py run --output current.json --baseline benchmarks/baseline.json
+    python benchmarks/bench.py compare benchmarks/baseline.json current.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# 测量求解器本身的计算量，不包含进程间通信的开销
+os.environ.setdefault("SOLVER_EXECUTOR", "inline")
+
+from synthetic import generate_players, play_guesses, write_players  # noqa: E402
+
+DEFAULT_SIZES = [300, 10_000, 100_000]
+CONSTRAINT_MIXES = [1, 3, 5]  # 构造约束组合时连续猜测的次数
+SOCKET_COUNTS = [10, 100, 1000]
+
+
+class FakeSocket:
+    """模拟浏览器WebSocket连接，只统计发送的消息"""
+
+    def __init__(self, encoding: str = "json"):
+        self.query_params = {"encoding": encoding}
+        self.sent = 0
+        self.bytes_sent = 0
+
+    async def send_text(self, data: str):
+        self.sent += 1
+        self.bytes_sent += len(data.encode('utf-8'))
+
+    async def send_bytes(self, data: bytes):
+        self.sent += 1
+        self.bytes_sent += len(data)
+
+
+def measure(fn: Callable[[], Any], min_time: float, min_runs: int = 3, max_runs: int = 1000) -> Dict[str, Any]:
+    """重复执行fn直到累计耗时超过min_time，返回毫秒级统计"""
+    fn()  # 预热
+    timings: List[float] = []
+    total = 0.0
+    while len(timings) < min_runs or (total < min_time and len(timings) < max_runs):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        timings.append(elapsed * 1000)
+        total += elapsed
+    return {
+        "median_ms": statistics.median(timings),
+        "min_ms": min(timings),
+        "mean_ms": statistics.fmean(timings),
+        "runs": len(timings),
+    }
+
+
+def run_benchmarks(sizes: List[int], min_time: float, only: str = None) -> Dict[str, Dict[str, Any]]:
+    from app.core import player_data
+    from app.core.game_client import BlastTvGameClient
+    from app.services.game_service import GameService
+
+    loop = asyncio.new_event_loop()
+    results: Dict[str, Dict[str, Any]] = {}
+    devnull = open(os.devnull, 'w')
+
+    def bench(name: str, fn: Callable[[], Any]):
+        if only and only not in name:
+            return
+        with contextlib.redirect_stdout(devnull):
+            results[name] = measure(fn, min_time)
+        print(f"{name:<60} {results[name]['median_ms']:>12.3f} ms  ({results[name]['runs']} 次)")
+
+    with contextlib.redirect_stdout(devnull):
+        client = BlastTvGameClient("bench")
+    countries = client.countries_data
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 服务端从默认路径加载玩家数据，基准测试期间指向合成数据
+        player_data.MANIFEST_FILE = os.path.join(tmp, "missing_manifest.json")
+
+        for size in sizes:
+            players = generate_players(size, countries, seed=size)
+            players_file = os.path.join(tmp, f"players_{size}.json")
+            write_players(players, players_file)
+            player_data.DEFAULT_PLAYERS_FILE = players_file
+
+            mixes = {n: play_guesses(players, countries, n, seed=size + n) for n in CONSTRAINT_MIXES}
+            with contextlib.redirect_stdout(devnull):
+                for guess_results in mixes.values():
+                    for result in guess_results:
+                        result['constraints'] = client.parse_guess_result(result)
+
+            def combined(n):
+                constraints = {}
+                with contextlib.redirect_stdout(devnull):
+                    for result in mixes[n]:
+                        constraints = client.merge_constraints(constraints, result['constraints'])
+                return constraints
+
+            if size == sizes[0]:
+                # 与玩家数量无关的用例只运行一次
+                sample = mixes[max(CONSTRAINT_MIXES)]
+                bench("parse_guess_result", lambda: [client.parse_guess_result(r) for r in sample])
+                bench("merge_constraints", lambda: combined(max(CONSTRAINT_MIXES)))
+
+            for n in CONSTRAINT_MIXES:
+                constraints = combined(n)
+                bench(f"filter_players/n={size}/guesses={n}", lambda c=constraints: client.filter_players(players, c))
+
+            constraints = combined(1)
+            for strategy in ("entropy", "minimax", "lookahead"):
+                def find_best(strategy=strategy):
+                    client.ranking_strategy = strategy
+                    return client.find_best_candidate(players, constraints)
+                bench(f"find_best_candidate/n={size}/strategy={strategy}", find_best)
+            client.ranking_strategy = "entropy"
+
+            # 模拟对局中途的客户端状态
+            client.guess_results = [dict(r) for r in mixes[3]]
+            client.current_game_phase = 'game'
+            # 游戏阶段的客户端固定使用本轮开始时的数据集，每个规模重新开始一轮
+            client.dataset = None
+            with contextlib.redirect_stdout(devnull):
+                dataset_size = len(client.players_dataset().players)
+            assert dataset_size == size, f"客户端使用的数据集有 {dataset_size} 名玩家，应为 {size}"
+            bench(f"get_next_guess/n={size}", lambda: loop.run_until_complete(client.get_next_guess(players_file)))
+
+            GameService.active_clients["bench"] = client
+
+            def recommendations_cold():
+                GameService.recommendation_cache.pop("bench", None)
+                return loop.run_until_complete(GameService.get_recommendations("bench"))
+
+            bench(f"get_recommendations/n={size}/cold", recommendations_cold)
+            bench(f"get_recommendations/n={size}/warm",
+                  lambda: loop.run_until_complete(GameService.get_recommendations("bench")))
+            client.guess_results = []
+
+        update = {
+            "type": "GUESS_RESULT",
+            "result": mixes[1][0],
+            "game_phase": "game",
+            "remaining_guesses": 7,
+            "player_wins": 0,
+        }
+        for count in SOCKET_COUNTS:
+            for encoding in ("json", "msgpack"):
+                GameService.ws_connections["bench"] = [FakeSocket(encoding) for _ in range(count)]
+                bench(f"broadcast_update/sockets={count}/encoding={encoding}",
+                      lambda: loop.run_until_complete(GameService.broadcast_update("bench", dict(update))))
+
+    GameService.active_clients.pop("bench", None)
+    GameService.ws_connections.pop("bench", None)
+    loop.close()
+    devnull.close()
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> bool:
+    """按中位数比较两次结果，返回是否存在超过阈值的性能退化"""
+    regressed = False
+    print(f"{'用例':<60} {'基线(ms)':>12} {'当前(ms)':>12} {'变化':>9}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base:
+            print(f"{name:<60} {'-':>12} {result['median_ms']:>12.3f} {'新增':>9}")
+            continue
+        ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  ⚠️ 退化"
+            regressed = True
+        elif ratio < 1 - threshold:
+            flag = "  ✅ 提升"
+        print(f"{name:<60} {base['median_ms']:>12.3f} {result['median_ms']:>12.3f} {ratio - 1:>+8.1%}{flag}")
+    return regressed
+
+
+def _load(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="求解器与服务热点路径的微基准测试")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="运行基准测试并保存结果")
+    run_parser.add_argument("--sizes", type=int, nargs="*", default=DEFAULT_SIZES, help="合成数据集的玩家数量")
+    run_parser.add_argument("--min-time", type=float, default=0.5, help="每个用例至少运行的秒数")
+    run_parser.add_argument("--only", default=None, help="只运行名称包含该字符串的用例")
+    run_parser.add_argument("--output", default="benchmarks/results.json", help="结果输出文件")
+    run_parser.add_argument("--baseline", default=None, help="运行后与该基线比较")
+    run_parser.add_argument("--threshold", type=float, default=0.10, help="判定退化的相对变化阈值")
+
+    compare_parser = subparsers.add_parser("compare", help="比较两次基准测试结果")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="判定退化的相对变化阈值")
+
+    args = parser.parse_args()
+    # 客户端从当前目录加载countries.json
+    os.chdir(ROOT)
+
+    if args.command == "run":
+        results = run_benchmarks(args.sizes, args.min_time, args.only)
+        output = {
+            "meta": {
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "sizes": args.sizes,
+            },
+            "results": results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2, ensure_ascii=False)
+        print(f"结果已保存到 {args.output}")
+        if args.baseline:
+            sys.exit(1 if compare(_load(args.baseline), output, args.threshold) else 0)
+    else:
+        sys.exit(1 if compare(_load(args.baseline), _load(args.current), args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import json
+import random
+import uuid
+from typing import Any, Dict, List
+
+from app.core.solver import feedback_to_result, rank_by_entropy, simulate_feedback
+
+# 按真实数据的大致分布生成玩家属性
+ROLES = ["rifler"] * 4 + ["awper"]
+COMMON_NATIONALITIES = ["RU", "UA", "DK", "SE", "FR", "BR", "US", "PL", "FI", "KZ", "BA", "TR", "CA", "AU", "MN"]
+
+
+def generate_players(count: int, countries: Dict[str, Any], seed: int = 0) -> List[Dict[str, Any]]:
+    """生成count名结构与players_with_entropy.json一致的合成玩家"""
+    rng = random.Random(seed)
+    all_nationalities = list(countries) or COMMON_NATIONALITIES
+    teams = [
+        {"id": str(uuid.UUID(int=rng.getrandbits(128))), "name": f"Team {i}", "shortName": f"team{i}"}
+        for i in range(max(1, count // 5))
+    ]
+
+    players = []
+    for i in range(count):
+        # 大部分玩家来自少数常见国家，其余分散在所有国家
+        if rng.random() < 0.7:
+            nationality = rng.choice(COMMON_NATIONALITIES)
+        else:
+            nationality = rng.choice(all_nationalities)
+        players.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "nickname": f"player{i}",
+            "firstName": f"First{i}",
+            "lastName": f"Last{i}",
+            "isRetired": rng.random() < 0.15,
+            "nationality": nationality,
+            "team": rng.choice(teams) if rng.random() < 0.8 else None,
+            "age": int(rng.triangular(16, 38, 24)),
+            "majorAppearances": int(rng.triangular(0, 20, 1)),
+            "role": rng.choice(ROLES),
+            "entropy_rank": None,
+            "entropy_value": rng.uniform(1.5, 4.0),
+        })
+    return players
+
+
+def play_guesses(players: List[Dict[str, Any]], countries: Dict[str, Any], guesses: int,
+                 seed: int = 0) -> List[Dict[str, Any]]:
+    """对随机答案按熵值连续猜测，返回与上游格式一致的猜测结果，用于构造真实的约束组合"""
+    rng = random.Random(seed)
+    secret = rng.choice(players)
+    remaining = list(players)
+    results = []
+    for _ in range(guesses):
+        guess = rank_by_entropy([p for p in remaining if p is not secret] or remaining, countries)
+        feedback = simulate_feedback(guess, secret, countries)
+        results.append(feedback_to_result(guess, feedback))
+        remaining = [p for p in remaining
+                     if p is not guess and simulate_feedback(guess, p, countries) == feedback] or remaining
+    return results
+
+
+def write_players(players: List[Dict[str, Any]], path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(players, f, ensure_ascii=False)
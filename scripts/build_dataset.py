@@ -0,0 +1,239 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from graphlib import TopologicalSorter
+from typing import Any, Callable, Dict, List
+
+from dataset_io import file_sha256, write_bytes_if_changed, write_json_if_changed
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+# 二进制快照的编码与服务端读取共用app.core.player_snapshot
+sys.path.insert(0, os.path.dirname(SCRIPTS_DIR))
+MANIFEST_VERSION = 1
+
+
+class Stage:
+    """构建流程中的一个阶段: 声明输入、输出、依赖的阶段和实际执行的函数"""
+
+    def __init__(self, name: str, inputs: List[str], outputs: List[str], run: Callable[[], Any],
+                 depends_on: List[str] = (), params: Dict[str, Any] = None, sources: List[str] = ()):
+        self.name = name
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.run = run
+        self.depends_on = list(depends_on)
+        self.params = params or {}
+        # 阶段实现所在的脚本，代码变化时也需要重新构建
+        self.sources = [os.path.join(SCRIPTS_DIR, source) for source in sources]
+
+    def input_key(self) -> str:
+        """根据输入文件内容、阶段参数和实现代码计算阶段指纹"""
+        digest = hashlib.sha256()
+        digest.update(self.name.encode('utf-8'))
+        digest.update(json.dumps(self.params, sort_keys=True).encode('utf-8'))
+        for path in self.inputs + self.sources:
+            digest.update(path.encode('utf-8'))
+            digest.update((file_sha256(path) or 'missing').encode('utf-8'))
+        return digest.hexdigest()
+
+
+def build_stages(config: Dict[str, Any], force: bool = False) -> Dict[str, Stage]:
+    """根据配置构建阶段DAG；force时获取阶段忽略已有检查点，重新获取所有玩家"""
+    import convert_entropy_to_json
+    import fetch_data
+    import merge_player_data
+
+    stages = [
+        Stage(
+            "fetch",
+            inputs=[config["players_list"]],
+            outputs=[config["players_details"]],
+            run=lambda: fetch_data.fetch_player_details(
+                config["players_list"], config["players_details"],
+                concurrency=config["fetch_concurrency"], rate=config["fetch_rate"],
+                url=config.get("fetch_url") or fetch_data.base_url, fresh=force),
+            sources=["fetch_data.py"],
+        ),
+    ]
+
+    if config.get("entropy_txt"):
+        # 提供了外部信息熵文件时沿用原来的转换流程
+        stages.append(Stage(
+            "entropy",
+            inputs=[config["entropy_txt"]],
+            outputs=[config["entropy_json"]],
+            run=lambda: convert_entropy_to_json.convert_entropy_to_json(
+                config["entropy_txt"], config["entropy_json"]),
+            sources=["convert_entropy_to_json.py"],
+        ))
+    else:
+        def compute_entropy():
+            with open(config["players_details"], 'r', encoding='utf-8') as f:
+                players = json.load(f)
+            entropy_data = merge_player_data.build_entropy_data(players, config["workers"])
+            write_json_if_changed(config["entropy_json"], entropy_data)
+
+        stages.append(Stage(
+            "entropy",
+            inputs=[config["players_details"]],
+            outputs=[config["entropy_json"]],
+            run=compute_entropy,
+            depends_on=["fetch"],
+            sources=["merge_player_data.py"],
+        ))
+
+    stages.append(Stage(
+        "merge",
+        inputs=[config["players_details"], config["entropy_json"]],
+        outputs=[config["output"]],
+        run=lambda: merge_player_data.merge_player_data(
+            config["players_details"], config["entropy_json"], config["output"], config["workers"]),
+        depends_on=["fetch", "entropy"],
+        sources=["merge_player_data.py"],
+    ))
+
+    if config.get("snapshot"):
+        def build_snapshot():
+            from app.core.player_snapshot import encode_snapshot
+
+            with open(config["output"], 'rb') as f:
+                raw = f.read()
+            version = hashlib.sha1(raw).hexdigest()[:12]
+            write_bytes_if_changed(config["snapshot"], encode_snapshot(json.loads(raw.decode('utf-8')), version))
+
+        stages.append(Stage(
+            "snapshot",
+            inputs=[config["output"]],
+            outputs=[config["snapshot"]],
+            run=build_snapshot,
+            depends_on=["merge"],
+            sources=[os.path.join(os.pardir, "app", "core", "player_snapshot.py")],
+        ))
+
+    return {stage.name: stage for stage in stages}
+
+
+def _load_state(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _is_up_to_date(stage: Stage, key: str, recorded: Dict[str, Any]) -> bool:
+    if not recorded or recorded.get("key") != key:
+        return False
+    # 输出文件被删除或被手工修改时也需要重新构建
+    return all(file_sha256(path) == recorded.get("outputs", {}).get(path) for path in stage.outputs)
+
+
+def run_pipeline(config: Dict[str, Any], force: bool = False, only: List[str] = None) -> Dict[str, Any]:
+    """按依赖顺序运行各阶段，跳过输入未变化的阶段，最后写入数据集清单"""
+    stages = build_stages(config, force)
+    state = _load_state(config["state_file"])
+    order = TopologicalSorter({name: stage.depends_on for name, stage in stages.items()}).static_order()
+
+    for name in order:
+        stage = stages[name]
+        key = stage.input_key()
+        if only and name not in only:
+            print(f"[{name}] 未选择，跳过")
+            continue
+        if not force and _is_up_to_date(stage, key, state.get(name)):
+            print(f"[{name}] 输入未变化，跳过")
+            continue
+
+        print(f"[{name}] 开始构建...")
+        start_time = time.time()
+        stage.run()
+        state[name] = {
+            "key": stage.input_key(),
+            "outputs": {path: file_sha256(path) for path in stage.outputs},
+        }
+        write_json_if_changed(config["state_file"], state)
+        print(f"[{name}] 完成，耗时 {time.time() - start_time:.2f} 秒")
+
+    return write_manifest(config, stages, state)
+
+
+def write_manifest(config: Dict[str, Any], stages: Dict[str, Stage], state: Dict[str, Any]) -> Dict[str, Any]:
+    """写入带版本号的数据集清单，服务端据此定位并校验玩家数据"""
+    output = config["output"]
+    with open(output, 'rb') as f:
+        raw = f.read()
+    players_count = len(json.loads(raw.decode('utf-8')))
+
+    manifest_dir = os.path.dirname(os.path.abspath(config["manifest"]))
+    files = {}
+    for stage in stages.values():
+        for path in stage.outputs:
+            if os.path.exists(path):
+                files[os.path.basename(path)] = {
+                    "path": os.path.relpath(os.path.abspath(path), manifest_dir).replace(os.sep, '/'),
+                    "sha256": file_sha256(path),
+                }
+
+    snapshot_name = os.path.basename(config["snapshot"]) if config.get("snapshot") else None
+    manifest = {
+        "manifest_version": MANIFEST_VERSION,
+        # 与服务端player_data.dataset_version的计算方式一致
+        "version": hashlib.sha1(raw).hexdigest()[:12],
+        "players_file": files[os.path.basename(output)]["path"],
+        "snapshot_file": files[snapshot_name]["path"] if snapshot_name in files else None,
+        "players": players_count,
+        "files": files,
+        "stages": {name: state.get(name, {}).get("key") for name in stages},
+    }
+
+    # 内容不变时保留原有的构建时间，避免清单无意义地变化
+    previous = _load_state(config["manifest"])
+    unchanged = {k: v for k, v in previous.items() if k != "built_at"} == manifest
+    manifest["built_at"] = previous.get("built_at") if unchanged else time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+    if write_json_if_changed(config["manifest"], manifest):
+        print(f"数据集清单已更新: {config['manifest']} (版本 {manifest['version']})")
+    else:
+        print(f"数据集清单未变化 (版本 {manifest['version']})")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建玩家数据集: 获取详细信息 -> 计算信息熵 -> 合并")
+    parser.add_argument("--data-dir", default="data", help="中间数据所在目录")
+    parser.add_argument("--players-list", default=None, help="玩家列表文件，默认为<data-dir>/players.json")
+    parser.add_argument("--entropy-txt", default=None, help="外部信息熵文本文件，不指定时直接计算信息熵")
+    parser.add_argument("--output", default="players_with_entropy.json", help="服务端使用的玩家数据文件")
+    parser.add_argument("--snapshot", default="players_with_entropy.bin", help="服务端内存映射读取的二进制快照，传空字符串则不生成")
+    parser.add_argument("--manifest", default="dataset_manifest.json", help="数据集清单文件")
+    parser.add_argument("--fetch-concurrency", type=int, default=4, help="获取玩家详细信息时的并发请求数")
+    parser.add_argument("--fetch-rate", type=float, default=1.0, help="获取玩家详细信息时每秒最多的请求数")
+    parser.add_argument("--fetch-url", default=None, help="猜测接口地址，测试时可指向本地服务")
+    parser.add_argument("--workers", type=int, default=None, help="计算信息熵使用的进程数")
+    parser.add_argument("--only", nargs="*", default=None, help="只运行指定的阶段")
+    parser.add_argument("--force", action="store_true", help="忽略缓存，重新运行所有阶段")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir
+    config = {
+        "players_list": args.players_list or os.path.join(data_dir, "players.json"),
+        "players_details": os.path.join(data_dir, "players_details.json"),
+        "entropy_txt": args.entropy_txt,
+        "entropy_json": os.path.join(data_dir, "infor_entropy.json"),
+        "output": args.output,
+        "snapshot": args.snapshot,
+        "manifest": args.manifest,
+        "state_file": os.path.join(data_dir, ".build_state.json"),
+        "fetch_concurrency": args.fetch_concurrency,
+        "fetch_rate": args.fetch_rate,
+        "fetch_url": args.fetch_url,
+        "workers": args.workers,
+    }
+    run_pipeline(config, force=args.force, only=args.only)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
-import json
+import argparse
 import re
 
+from dataset_io import write_json_if_changed
+
 def convert_entropy_to_json(input_file, output_file):
     players_data = []
     
@@ -32,14 +34,16 @@ def convert_entropy_to_json(input_file, output_file):
         "players": players_data
     }
     
-    # 写入JSON文件
-    with open(output_file, 'w') as f:
-        json.dump(data, f, indent=2)
-    
-    print(f"转换完成！数据已保存至 {output_file}")
+    # 写入JSON文件（内容未变化时不重写）
+    if write_json_if_changed(output_file, data, ensure_ascii=True):
+        print(f"转换完成！数据已保存至 {output_file}")
+    else:
+        print(f"转换完成！{output_file} 内容未变化")
     print(f"共处理 {len(players_data)} 名玩家数据")
 
 if __name__ == "__main__":
-    input_file = "c:\\Users\\Stesla\\Desktop\\CODE\\friberg\\infor_entropy.txt"
-    output_file = "c:\\Users\\Stesla\\Desktop\\CODE\\friberg\\infor_entropy.json"
-    convert_entropy_to_json(input_file, output_file)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="将信息熵文本文件转换为JSON")
+    parser.add_argument("--input", default="data/infor_entropy.txt", help="信息熵文本文件路径")
+    parser.add_argument("--output", default="data/infor_entropy.json", help="输出JSON文件路径")
+    args = parser.parse_args()
+    convert_entropy_to_json(args.input, args.output)
\ No newline at end of file
@@ -0,0 +1,37 @@
+import hashlib
+import json
+import os
+
+
+def file_sha256(path):
+    """计算文件内容的SHA-256，文件不存在时返回None"""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_bytes_if_changed(path, content):
+    """内容有变化时才原子地写入文件，返回是否写入"""
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if f.read() == content:
+                return False
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+
+def write_json_if_changed(path, data, indent=2, ensure_ascii=False):
+    """序列化为JSON并在内容变化时写入"""
+    content = json.dumps(data, indent=indent, ensure_ascii=ensure_ascii).encode('utf-8')
+    return write_bytes_if_changed(path, content)
@@ -1,7 +1,14 @@
+import argparse
+import asyncio
 import json
+import os
+import random
 import time
-import requests
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Set
+
+import aiohttp
+
+from dataset_io import write_json_if_changed
 
 headers = {
     "authority": "api.blast.tv",
@@ -26,12 +33,43 @@ headers = {
 
 base_url = "https://api.blast.tv/v1/counterstrikle/guesses"
 
-def guess(player_id: str) -> Dict[str, Any]:
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """令牌桶限速器: 平均每秒rate个请求，允许capacity个请求的突发"""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def penalize(self, seconds: float):
+        """服务端要求放慢时，在seconds秒内不再发放令牌"""
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+async def guess(session: aiohttp.ClientSession, player_id: str, url: str = base_url) -> Dict[str, Any]:
     """
     向Blast.tv API发送猜测请求并获取玩家信息
     
     Args:
+        session (aiohttp.ClientSession): 复用连接的HTTP会话
         player_id (str): 玩家的唯一ID，格式为UUID
+        url (str): 猜测接口地址
         
     Returns:
         Dict[str, Any]: 包含玩家信息和猜测结果的字典，包括:
@@ -48,23 +86,138 @@ def guess(player_id: str) -> Dict[str, Any]:
             - isSuccess: 猜测是否成功
     
     Raises:
-        requests.exceptions.RequestException: 当请求失败时抛出
+        aiohttp.ClientResponseError: 当响应状态码不是200时抛出
     """
     payload = {
         "playerId": player_id
     }
     
-    response = requests.post(base_url, headers=headers, json=payload)
-    response.raise_for_status()  # 如果响应状态码不是200，将引发异常
-    
-    return response.json()
+    async with session.post(url, headers=headers, json=payload) as response:
+        response.raise_for_status()  # 如果响应状态码不是200，将引发异常
+        return await response.json()
 
-def main():
+
+def extract_player_details(player_data: Dict[str, Any]) -> Dict[str, Any]:
+    """从猜测接口的响应中提取所需信息"""
+    return {
+        "id": player_data.get("id", ""),
+        "nickname": player_data.get("nickname", ""),
+        "firstName": player_data.get("firstName", ""),
+        "lastName": player_data.get("lastName", ""),
+        "isRetired": player_data.get("isRetired", False),
+        "nationality": player_data.get("nationality", {}).get("value"),
+        "team": player_data.get("team", {}).get("data"),
+        "age": player_data.get("age", {}).get("value"),
+        "majorAppearances": player_data.get("majorAppearances", {}).get("value"),
+        "role": player_data.get("role", {}).get("value")
+    }
+
+
+async def fetch_with_retry(session: aiohttp.ClientSession, bucket: TokenBucket, player_id: str,
+                           url: str, max_retries: int, backoff: float) -> Dict[str, Any]:
+    """限速后发送请求，遇到网络错误、限流或服务端错误时指数退避重试"""
+    attempt = 0
+    while True:
+        await bucket.acquire()
+        try:
+            return await guess(session, player_id, url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = getattr(e, 'status', None)
+            if attempt >= max_retries or (status is not None and status not in RETRYABLE_STATUS):
+                raise
+            delay = backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+            retry_after = getattr(e, 'headers', None) and e.headers.get("Retry-After")
+            if status == 429:
+                # 被限流时所有并发请求一起放慢
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                bucket.penalize(delay)
+            attempt += 1
+            print(f"请求 {player_id} 失败 ({status or e.__class__.__name__})，{delay:.1f} 秒后第 {attempt} 次重试")
+            await asyncio.sleep(delay)
+
+
+def load_checkpoint(checkpoint_file: str) -> Dict[str, Dict[str, Any]]:
+    """读取JSONL检查点，返回已获取的玩家详细信息；忽略中断时写了一半的最后一行"""
+    done = {}
+    if not os.path.exists(checkpoint_file):
+        return done
+    with open(checkpoint_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            done[record["id"]] = record
+    return done
+
+
+async def fetch_all(players: List[Dict[str, Any]], checkpoint_file: str, url: str = base_url,
+                    concurrency: int = 4, rate: float = 1.0, max_retries: int = 5,
+                    backoff: float = 1.0) -> Dict[str, Dict[str, Any]]:
+    """并发获取玩家详细信息，每获取一名玩家就追加写入检查点"""
+    done = load_checkpoint(checkpoint_file)
+    pending = [player for player in players if player["id"] not in done]
+    total_players = len(players)
+    print(f"共 {total_players} 名玩家，检查点中已有 {total_players - len(pending)} 名，待获取 {len(pending)} 名")
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for player in pending:
+        queue.put_nowait(player)
+
+    bucket = TokenBucket(rate, capacity=max(1, concurrency))
+    failed: Set[str] = set()
+
+    directory = os.path.dirname(checkpoint_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(checkpoint_file, 'a', encoding='utf-8') as checkpoint:
+        async def worker(session: aiohttp.ClientSession):
+            while True:
+                try:
+                    player = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                player_id = player["id"]
+                try:
+                    result = extract_player_details(
+                        await fetch_with_retry(session, bucket, player_id, url, max_retries, backoff))
+                except Exception as e:
+                    failed.add(player_id)
+                    print(f"获取 {player.get('nickname', player_id)} 的数据失败: {str(e)}")
+                    continue
+                done[player_id] = result
+                checkpoint.write(json.dumps(result, ensure_ascii=False) + "\n")
+                checkpoint.flush()
+                print(f"[{len(done)}/{total_players}] 已获取 {result['nickname']} 的数据")
+
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            await asyncio.gather(*(worker(session) for _ in range(max(1, concurrency))))
+
+    if failed:
+        print(f"⚠️ {len(failed)} 名玩家获取失败，重新运行即可从检查点继续")
+    return done
+
+
+def fetch_player_details(input_file: str, output_file: str, concurrency: int = 4, rate: float = 1.0,
+                         checkpoint_file: Optional[str] = None, url: str = base_url, fresh: bool = False):
     """
-    主函数：读取players.json中的所有玩家ID，调用API获取详细信息，并保存结果
+    读取玩家列表中的所有玩家ID，调用API获取详细信息，并保存结果
+    
+    中断后重新运行时从检查点继续；全部获取完成后删除检查点。
+    
+    Args:
+        input_file (str): 玩家列表JSON文件路径
+        output_file (str): 输出的玩家详细信息JSON文件路径
+        concurrency (int): 同时进行的请求数
+        rate (float): 每秒最多发送的请求数
+        checkpoint_file (str): JSONL检查点路径，默认为<output_file>.checkpoint.jsonl
+        url (str): 猜测接口地址，测试时可指向本地服务
+        fresh (bool): 忽略已有检查点，重新获取所有玩家
     """
     # 读取玩家数据
-    input_file = 'players.json'
     try:
         with open(input_file, 'r', encoding='utf-8') as f:
             players = json.load(f)
@@ -75,54 +228,52 @@ def main():
         print(f"错误: 无法解析 {input_file}, 确保它是有效的 JSON 格式")
         return
     
-    result_data = []
-    total_players = len(players)
+    checkpoint_file = checkpoint_file or f"{os.path.splitext(output_file)[0]}.checkpoint.jsonl"
+    if fresh and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
     
-    print(f"开始获取 {total_players} 名玩家的详细信息...")
+    print(f"开始获取 {len(players)} 名玩家的详细信息...")
     start_time = time.time()
     
-    for i, player in enumerate(players):
-        player_id = player["id"]
-        try:
-            # 调用 guess 函数获取玩家详细信息
-            player_data = guess(player_id)
-            
-            # 提取所需信息
-            result = {
-                "id": player_data.get("id", ""),
-                "nickname": player_data.get("nickname", ""),
-                "firstName": player_data.get("firstName", ""),
-                "lastName": player_data.get("lastName", ""),
-                "isRetired": player_data.get("isRetired", False),
-                "nationality": player_data.get("nationality", {}).get("value"),
-                "team": player_data.get("team", {}).get("data"),
-                "age": player_data.get("age", {}).get("value"),
-                "majorAppearances": player_data.get("majorAppearances", {}).get("value"),
-                "role": player_data.get("role", {}).get("value")
-            }
-            
-            result_data.append(result)
-            print(f"[{i+1}/{total_players}] 已获取 {result['nickname']} 的数据")
-        
-        except Exception as e:
-            print(f"[{i+1}/{total_players}] 获取 {player['nickname']} 的数据失败: {str(e)}")
-        
-        # 每次调用后暂停 1 秒
-        if i < total_players - 1:  # 最后一个玩家后不需要等待
-            time.sleep(1)
+    done = asyncio.run(fetch_all(players, checkpoint_file, url=url, concurrency=concurrency, rate=rate))
     
     elapsed_time = time.time() - start_time
     print(f"\n数据获取完成，耗时: {elapsed_time:.2f} 秒")
     
-    # 保存数据到新文件
-    output_file = 'players_details.json'
+    # 按玩家列表的顺序输出
+    result_data = [done[player["id"]] for player in players if player["id"] in done]
     
+    # 保存数据到新文件（内容未变化时不重写）
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(result_data, f, ensure_ascii=False, indent=2)
-        print(f"数据已保存到 {output_file}")
+        if write_json_if_changed(output_file, result_data):
+            print(f"数据已保存到 {output_file}")
+        else:
+            print(f"{output_file} 内容未变化")
     except Exception as e:
         print(f"保存数据时出错: {str(e)}")
+        return
+    
+    # 全部玩家都已获取并保存后删除检查点，下次运行重新获取最新数据，而不是沿用旧的结果
+    if len(result_data) == len(players) and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+        print(f"已获取全部玩家，删除检查点 {checkpoint_file}")
+
+def main():
+    """
+    主函数：解析命令行参数并获取玩家详细信息
+    """
+    parser = argparse.ArgumentParser(description="从Blast.tv API获取玩家详细信息")
+    parser.add_argument("--input", default="data/players.json", help="玩家列表JSON文件路径")
+    parser.add_argument("--output", default="data/players_details.json", help="输出文件路径")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时进行的请求数")
+    parser.add_argument("--rate", type=float, default=1.0, help="每秒最多发送的请求数")
+    parser.add_argument("--checkpoint", default=None, help="JSONL检查点文件路径")
+    parser.add_argument("--url", default=base_url, help="猜测接口地址")
+    parser.add_argument("--fresh", action="store_true", help="忽略已有检查点，重新获取所有玩家")
+    args = parser.parse_args()
+    
+    fetch_player_details(args.input, args.output, args.concurrency, args.rate,
+                         args.checkpoint, args.url, args.fresh)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,7 +1,20 @@
+import argparse
 import json
-import os
 import math
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dataset_io import write_json_if_changed
+
+# 每个比较维度的状态数: 队伍(0,1) 国籍(0,1) 年龄(-2..2) 职位(0,1) Major次数(-2..2)
+STATE_SIZES = (2, 2, 5, 2, 5)
+STATE_COUNT = int(np.prod(STATE_SIZES))
+# 向量化计算时每批处理的行数，控制中间矩阵的内存占用
+BLOCK_ROWS = 256
+# 玩家数量低于该值时不启动进程池
+PARALLEL_THRESHOLD = 2000
 
 def compare_players(player1, player2):
     """
@@ -92,22 +105,153 @@ def calculate_player_entropy(player, players_list):
     entropy = calculate_entropy(state_counter)
     return entropy
 
-def merge_player_data(players_file, entropy_file, output_file):
+def _state_code(team, nationality, age, role, major):
+    """把五元组状态(年龄和Major次数已偏移为非负)合并为一个整数编码"""
+    return (((team * 2 + nationality) * 5 + age) * 2 + role) * 5 + major
+
+
+# 完全相同的玩家之间的比较状态 (0, 0, 0, 0, 0)
+IDENTICAL_STATE = _state_code(0, 0, 2, 0, 2)
+
+
+def _encode_categories(values, empty_values):
+    """将类别字段编码为整数，空值编码为-1（与compare_players中的空值判断一致）"""
+    codes = {}
+    encoded = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        if value in empty_values:
+            encoded[i] = -1
+        else:
+            encoded[i] = codes.setdefault(value, len(codes))
+    return encoded
+
+
+def encode_players(players_list):
+    """把玩家列表编码为按列存储的数组，供向量化比较使用"""
+    team_ids = []
+    for player in players_list:
+        team = player.get("team", {})
+        team_ids.append(team.get("id") if isinstance(team, dict) else None)
+
+    # 完全相同的玩家字典在compare_players中比较结果全为0
+    fingerprints = [json.dumps(player, sort_keys=True, ensure_ascii=False, default=str) for player in players_list]
+
+    return {
+        "team": _encode_categories(team_ids, (None,)),
+        "nationality": _encode_categories([p.get("nationality", "") for p in players_list], ("",)),
+        "age": np.array([p.get("age", 0) or 0 for p in players_list], dtype=np.int32),
+        "role": _encode_categories([p.get("role", "") for p in players_list], ("",)),
+        "major": np.array([p.get("majorAppearances", 0) or 0 for p in players_list], dtype=np.int32),
+        "identity": _encode_categories(fingerprints, ()),
+    }
+
+
+def _numeric_status(values, rows, close_threshold):
+    """向量化的数值字段比较，规则与compare_players相同"""
+    v1 = values[rows][:, None]
+    v2 = values[None, :]
+    diff = v2 - v1
+    status = np.where(np.abs(diff) <= close_threshold, np.sign(diff), 2 * np.sign(diff))
+    status[(v1 == 0) | (v2 == 0)] = 0
+    return status
+
+
+def _category_status(values, rows):
+    v1 = values[rows][:, None]
+    v2 = values[None, :]
+    return np.where((v1 == v2) & (v1 >= 0), 0, 1)
+
+
+def entropy_block(encoded, start, stop):
+    """计算第start到stop行玩家与全部玩家比较时的信息熵"""
+    rows = np.arange(start, stop)
+    team = _category_status(encoded["team"], rows)
+    nationality = _category_status(encoded["nationality"], rows)
+    age = _numeric_status(encoded["age"], rows, 3) + 2
+    role = _category_status(encoded["role"], rows)
+    major = _numeric_status(encoded["major"], rows, 1) + 2
+
+    # 把五元组状态合并为一个整数编码
+    states = _state_code(team, nationality, age, role, major)
+    identity = encoded["identity"]
+    states[identity[rows][:, None] == identity[None, :]] = IDENTICAL_STATE
+
+    # 为每一行的状态加上偏移量，一次bincount得到所有行的状态分布
+    block_size = stop - start
+    offsets = (np.arange(block_size) * STATE_COUNT)[:, None]
+    counts = np.bincount((states + offsets).ravel(), minlength=block_size * STATE_COUNT)
+    counts = counts.reshape(block_size, STATE_COUNT).astype(np.float64)
+
+    probabilities = counts / states.shape[1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(probabilities > 0, probabilities * np.log2(probabilities), 0.0)
+    return -terms.sum(axis=1)
+
+
+_worker_encoded = None
+
+
+def _init_worker(encoded):
+    global _worker_encoded
+    _worker_encoded = encoded
+
+
+def _entropy_block_worker(bounds):
+    return entropy_block(_worker_encoded, *bounds)
+
+
+def calculate_all_entropies(players_list, workers=None):
+    """向量化计算每名玩家与整个候选名单比较时的信息熵，玩家较多时分块并行计算"""
+    total = len(players_list)
+    if total == 0:
+        return []
+
+    encoded = encode_players(players_list)
+    blocks = [(start, min(start + BLOCK_ROWS, total)) for start in range(0, total, BLOCK_ROWS)]
+
+    if workers == 1 or total < PARALLEL_THRESHOLD:
+        results = [entropy_block(encoded, start, stop) for start, stop in blocks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(encoded,)) as executor:
+            results = list(executor.map(_entropy_block_worker, blocks))
+
+    return np.concatenate(results).tolist()
+
+
+def build_entropy_data(players_list, workers=None):
+    """直接从玩家数据生成信息熵排名，格式与convert_entropy_to_json的输出一致"""
+    entropies = calculate_all_entropies(players_list, workers)
+    ranked = sorted(zip(players_list, entropies), key=lambda item: item[1], reverse=True)
+    return {
+        "title": "CS2 Players Information Entropy",
+        "total_players": len(ranked),
+        "players": [
+            {"rank": rank, "name": player.get("nickname", ""), "entropy": entropy}
+            for rank, (player, entropy) in enumerate(ranked, 1)
+        ]
+    }
+
+
+def merge_player_data(players_file, entropy_file, output_file, workers=None):
     """
     合并玩家详细信息和信息熵数据。
     
     Args:
         players_file (str): 玩家详细信息的JSON文件路径
-        entropy_file (str): 信息熵数据的JSON文件路径
+        entropy_file (str): 信息熵数据的JSON文件路径，为None时直接从玩家数据计算
         output_file (str): 输出合并结果的JSON文件路径
+        workers (int): 计算信息熵时使用的进程数，默认为CPU核心数
     """
     # 读取玩家详细信息
     with open(players_file, 'r', encoding='utf-8') as f:
         players_data = json.load(f)
     
-    # 读取信息熵数据
-    with open(entropy_file, 'r', encoding='utf-8') as f:
-        entropy_data = json.load(f)
+    # 读取信息熵数据，未提供时直接计算
+    if entropy_file:
+        with open(entropy_file, 'r', encoding='utf-8') as f:
+            entropy_data = json.load(f)
+    else:
+        entropy_data = build_entropy_data(players_data, workers)
     
     # 提取entropy_data中的玩家名称和对应的信息熵
     entropy_values = {}
@@ -132,9 +276,10 @@ def merge_player_data(players_file, entropy_file, output_file):
     # 匹配和合并数据
     matched_count = 0
     unmatched_players = []
+    calculated_entropies = None
     
     # 为每个玩家添加信息熵数据
-    for player in players_data:
+    for i, player in enumerate(players_data):
         nickname = player.get("nickname", "")
         if nickname in entropy_values:
             player["entropy_rank"] = entropy_values[nickname]["rank"]
@@ -142,17 +287,18 @@ def merge_player_data(players_file, entropy_file, output_file):
             matched_count += 1
         else:
             unmatched_players.append(player)
-            # 为未匹配的玩家计算信息熵
-            calculated_entropy = calculate_player_entropy(player, players_data)
+            # 为未匹配的玩家计算信息熵（所有玩家一次性向量化计算）
+            if calculated_entropies is None:
+                calculated_entropies = calculate_all_entropies(players_data, workers)
             player["entropy_rank"] = None
-            player["entropy_value"] = calculated_entropy
+            player["entropy_value"] = calculated_entropies[i]
             player["entropy_calculated"] = True  # 标记为计算得到的值
     
-    # 将合并后的数据写入新文件
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(players_data, f, indent=2, ensure_ascii=False)
-    
-    print(f"合并完成！结果已保存至 {output_file}")
+    # 将合并后的数据写入新文件（内容未变化时不重写）
+    if write_json_if_changed(output_file, players_data):
+        print(f"合并完成！结果已保存至 {output_file}")
+    else:
+        print(f"合并完成！{output_file} 内容未变化")
     print(f"总玩家数: {len(players_data)}")
     print(f"成功匹配: {matched_count}")
     print(f"未匹配(已计算信息熵): {len(unmatched_players)}")
@@ -168,9 +314,11 @@ def merge_player_data(players_file, entropy_file, output_file):
             print(f"...等共 {len(unmatched_players)} 名玩家")
 
 if __name__ == "__main__":
-    base_dir = r"c:\Users\Stesla\Desktop\CODE\friberg"
-    players_file = os.path.join(base_dir, "players_details.json")
-    entropy_file = os.path.join(base_dir, "infor_entropy.json")
-    output_file = os.path.join(base_dir, "players_with_entropy.json")
+    parser = argparse.ArgumentParser(description="合并玩家详细信息和信息熵数据")
+    parser.add_argument("--players", default="data/players_details.json", help="玩家详细信息JSON文件路径")
+    parser.add_argument("--entropy", default=None, help="信息熵JSON文件路径，不指定时直接从玩家数据计算")
+    parser.add_argument("--output", default="players_with_entropy.json", help="输出文件路径")
+    parser.add_argument("--workers", type=int, default=None, help="计算信息熵使用的进程数")
+    args = parser.parse_args()
     
-    merge_player_data(players_file, entropy_file, output_file)
\ No newline at end of file
+    merge_player_data(args.players, args.entropy, args.output, args.workers)
@@ -0,0 +1,63 @@
+"""离线回放录制的上游流量（设置RECORD_TRAFFIC=1时录制到recordings/）
+
+    python scripts/replay_traffic.py recordings/ROOM-20250101-120000.jsonl.gz --speed 0
+    python scripts/replay_traffic.py recordings/*.jsonl.gz --speed 0 --quiet --min-guesses 1  # 回放检查
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.core.recorder import replay  # noqa: E402
+
+
+async def replay_all(paths, speed, repeat, quiet):
+    results = {}
+    for path in paths:
+        runs = []
+        for _ in range(repeat):
+            # 每次回放使用新的客户端，保证结果可复现
+            with open(os.devnull, 'w') as devnull, \
+                    contextlib.redirect_stdout(devnull if quiet else sys.stdout):
+                runs.append(await replay(path, speed=speed))
+        results[path] = runs
+        best = min(run["handle_time"] for run in runs)
+        print(f"{path}: 下行 {runs[0]['inbound']} 帧, 上行 {runs[0]['outbound']} 帧, "
+              f"猜测 {runs[0]['guesses']} 次, 处理耗时 {best * 1000:.2f} ms (最优/{repeat} 次)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线回放录制的上游流量")
+    parser.add_argument("recordings", nargs="+", help="录制文件(.jsonl.gz)")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放倍速，0表示不等待尽快回放")
+    parser.add_argument("--repeat", type=int, default=1, help="每个文件回放的次数")
+    parser.add_argument("--quiet", action="store_true", help="不输出客户端的处理日志")
+    parser.add_argument("--output", default=None, help="把回放统计写入JSON文件")
+    parser.add_argument("--min-guesses", type=int, default=0,
+                        help="每次回放至少应还原出的猜测次数，不足时以非零状态退出")
+    args = parser.parse_args()
+
+    paths = [os.path.abspath(path) for path in args.recordings]
+    # 客户端从当前目录加载countries.json和玩家数据
+    os.chdir(ROOT)
+    results = asyncio.run(replay_all(paths, args.speed, args.repeat, args.quiet))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    # 回放检查: 猜测次数为0通常说明客户端没有认出录制消息中我方的猜测
+    failed = [path for path, runs in results.items() if any(run["guesses"] < args.min_guesses for run in runs)]
+    for path in failed:
+        print(f"❌ {path}: 回放还原的猜测次数少于 {args.min_guesses}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# 测试中在当前进程内运行求解器，不启动工作进程
+os.environ.setdefault("SOLVER_EXECUTOR", "inline")
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    """客户端按相对路径读取countries.json和玩家数据"""
+    monkeypatch.chdir(ROOT)
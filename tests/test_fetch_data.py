@@ -0,0 +1,147 @@
+"""用本地模拟的猜测接口测试玩家数据获取流程，不访问Blast.tv"""
+import asyncio
+import json
+import os
+import sys
+import threading
+from typing import Any, Dict, List
+
+import pytest
+from aiohttp import web
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+import build_dataset  # noqa: E402
+import fetch_data  # noqa: E402
+
+PLAYER_IDS = [f"player-{i}" for i in range(12)]
+
+
+class StandInServer:
+    """在后台线程中运行的模拟猜测接口: 按玩家ID返回当前的队伍，并可注入失败"""
+
+    def __init__(self, player_ids: List[str]):
+        self.teams = {player_id: "team-a" for player_id in player_ids}
+        self.missing = set()  # 返回404（不重试）的玩家，模拟中断
+        self.flaky = {}  # 玩家ID -> 剩余的429/500次数
+        self.requests: List[str] = []
+        self.url = None
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    async def _guess(self, request: web.Request) -> web.Response:
+        player_id = (await request.json())["playerId"]
+        self.requests.append(player_id)
+        if player_id in self.missing:
+            return web.Response(status=404)
+        remaining = self.flaky.get(player_id, 0)
+        if remaining:
+            self.flaky[player_id] = remaining - 1
+            return web.Response(status=429 if remaining % 2 else 500, headers={"Retry-After": "0"})
+        return web.json_response({
+            "id": player_id,
+            "nickname": f"nick-{player_id}",
+            "firstName": "First",
+            "lastName": "Last",
+            "isRetired": False,
+            "nationality": {"value": "DK", "result": "INCORRECT"},
+            "team": {"data": {"name": self.teams[player_id]}, "result": "INCORRECT"},
+            "age": {"value": 25, "result": "INCORRECT"},
+            "majorAppearances": {"value": 3, "result": "INCORRECT"},
+            "role": {"value": "rifler", "result": "INCORRECT"},
+            "isSuccess": False,
+        })
+
+    def _serve(self):
+        asyncio.set_event_loop(self._loop)
+        app = web.Application()
+        app.router.add_post("/guesses", self._guess)
+        runner = web.AppRunner(app)
+        self._loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        self._loop.run_until_complete(site.start())
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/guesses"
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def _teams(output_file: str) -> Dict[str, Any]:
+    with open(output_file, 'r', encoding='utf-8') as f:
+        return {player["id"]: (player["team"] or {}).get("name") for player in json.load(f)}
+
+
+@pytest.fixture
+def server():
+    server = StandInServer(PLAYER_IDS)
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def files(tmp_path):
+    input_file = tmp_path / "players.json"
+    input_file.write_text(json.dumps([{"id": player_id, "nickname": player_id} for player_id in PLAYER_IDS]),
+                          encoding='utf-8')
+    return {"input": str(input_file), "output": str(tmp_path / "players_details.json"),
+            "checkpoint": str(tmp_path / "players_details.checkpoint.jsonl")}
+
+
+def _teams(output_file: str) -> Dict[str, Any]:
+    with open(output_file, 'r', encoding='utf-8') as f:
+        return {player["id"]: (player["team"] or {}).get("name") for player in json.load(f)}
+
+
+def _fetch(server: StandInServer, files: Dict[str, str]):
+    server.requests.clear()
+    fetch_data.fetch_player_details(files["input"], files["output"], concurrency=3, rate=200, url=server.url)
+
+
+def test_resume_from_checkpoint_and_remove_it(server, files):
+    # 第一次运行: 部分玩家失败，检查点保留已获取的玩家
+    server.missing = set(PLAYER_IDS[:2])
+    server.flaky = {PLAYER_IDS[2]: 2, PLAYER_IDS[3]: 1}
+    _fetch(server, files)
+    assert os.path.exists(files["checkpoint"]), "未完成时应保留检查点"
+    assert len(fetch_data.load_checkpoint(files["checkpoint"])) == len(PLAYER_IDS) - 2
+    assert server.requests.count(PLAYER_IDS[2]) == 3, "限流和服务端错误后应重试"
+
+    # 第二次运行: 只请求缺少的玩家，完成后删除检查点
+    server.missing = set()
+    _fetch(server, files)
+    assert sorted(server.requests) == sorted(PLAYER_IDS[:2])
+    assert not os.path.exists(files["checkpoint"]), "全部完成后应删除检查点"
+    assert len(_teams(files["output"])) == len(PLAYER_IDS)
+
+    # 上游数据变化后再次运行: 重新获取全部玩家
+    server.teams = {player_id: "team-b" for player_id in PLAYER_IDS}
+    _fetch(server, files)
+    assert sorted(server.requests) == sorted(PLAYER_IDS), "完成后再次运行应重新获取全部玩家"
+    assert set(_teams(files["output"]).values()) == {"team-b"}
+
+
+def test_force_build_ignores_stale_checkpoint(server, files, tmp_path):
+    server.missing = {PLAYER_IDS[0]}
+    _fetch(server, files)
+    assert os.path.exists(files["checkpoint"])
+
+    server.missing = set()
+    server.teams = {player_id: "team-c" for player_id in PLAYER_IDS}
+    config = {"players_list": files["input"], "players_details": files["output"], "fetch_concurrency": 3,
+              "fetch_rate": 200, "fetch_url": server.url, "entropy_json": str(tmp_path / "entropy.json"),
+              "output": str(tmp_path / "out.json"), "workers": 1}
+    server.requests.clear()
+    build_dataset.build_stages(config, force=True)["fetch"].run()
+    assert sorted(server.requests) == sorted(PLAYER_IDS), "--force时应忽略检查点"
+    assert set(_teams(files["output"]).values()) == {"team-c"}
+    assert not os.path.exists(files["checkpoint"])
@@ -0,0 +1,139 @@
+import asyncio
+
+from app.core.game_client import BlastTvGameClient
+
+
+class RecordingBroadcaster:
+    def __init__(self):
+        self.updates = []
+
+    async def broadcast_update(self, room_id, update):
+        self.updates.append(update)
+
+    async def push_recommendation_delta(self, room_id):
+        pass
+
+
+def _guess(player_id, success=False):
+    return {
+        'id': player_id, 'firstName': "F", 'lastName': "L", 'nickname': player_id,
+        'nationality': {'value': "DK", 'result': "INCORRECT"},
+        'team': {'data': None, 'result': "INCORRECT"},
+        'age': {'value': 25, 'result': "HIGH_CLOSE"},
+        'role': {'value': "Rifler", 'result': "INCORRECT"},
+        'majorAppearances': {'value': 2, 'result': "LOW_CLOSE"},
+        'isSuccess': success,
+    }
+
+
+def test_round_win_completes_series():
+    """上游以我方的连接ID（未单独分配时为uuid）标记轮次获胜者"""
+    client = BlastTvGameClient("test-room")
+    client.player_wins = 1
+
+    assert client._handle_round_end({'meta': {'currentRoundWinnerId': "someone-else", 'bestOf': "best_of_3"}}) is False
+    assert not client.game_complete
+
+    assert client._handle_round_end({'meta': {'currentRoundWinnerId': client.uuid, 'bestOf': "best_of_3"}}) is True
+    assert client.game_complete
+    assert client.player_wins == 2
+
+
+def test_players_frame_is_handled_once():
+    """players消息中我方新增的猜测只处理一次，同一帧再次传入时不会重复记录"""
+    client = BlastTvGameClient("test-room")
+    client.broadcaster = RecordingBroadcaster()
+    frame = {'players': [{'id': client.uuid, 'guesses': [_guess("p1")]},
+                         {'id': "opponent", 'guesses': [_guess("p2")]}]}
+
+    client.guessing = True
+    assert asyncio.run(client.handle_guess_result(frame)) is True
+    assert [r['id'] for r in client.guess_results] == ["p1"]
+
+    # 同一帧再次传入：帧内的新增猜测仍在缓存中，但已处理过
+    client.guessing = True
+    assert asyncio.run(client.handle_guess_result(frame)) is False
+    assert client._new_guesses(frame)[client.uuid][-1]['id'] == "p1"
+
+    # 下一帧带有我方的新猜测
+    client.guessing = True
+    frame = {'players': [{'id': client.uuid, 'guesses': [_guess("p1"), _guess("p3")]}]}
+    assert asyncio.run(client.handle_guess_result(frame)) is True
+    assert [r['id'] for r in client.guess_results] == ["p1", "p3"]
+
+
+def test_dispatch_fingerprints_own_guesses():
+    """按我方（uuid）的猜测记录判断重复帧，没有新增猜测的players消息直接跳过"""
+    client = BlastTvGameClient("test-room")
+    handled = []
+    client.register_handler('all', handled.append)
+    guesses = [_guess("p1")]
+
+    client.dispatch_message({'players': [{'id': client.uuid, 'guesses': guesses}]})
+    client.dispatch_message({'players': [{'id': client.uuid, 'guesses': list(guesses)}]})
+    assert len(handled) == 1
+
+
+def test_follow_up_hits_with_upstream_team_data():
+    """上游队伍数据比数据集多出若干字段，预计算的下一个猜测仍然命中"""
+    from app.core.player_data import load_players
+    from app.core.solver import feedback_to_result, simulate_feedback
+
+    client = BlastTvGameClient("test-room")
+    players = list(load_players())
+    guess = next(p for p in players if isinstance(p.get('team'), dict)
+                 and any(o is not p and (o.get('team') or {}).get('id') == p['team']['id'] for o in players))
+    secret = next(p for p in players if p is not guess and (p.get('team') or {}).get('id') == guess['team']['id'])
+    feedback = simulate_feedback(guess, secret, client.countries_data)
+
+    hypothetical = feedback_to_result(guess, feedback)
+    table = {feedback: (client.parse_guess_result(hypothetical), secret)}
+
+    actual = feedback_to_result(guess, feedback)
+    actual['team'] = {'result': "CORRECT", 'data': dict(guess['team'], name=guess['team'].get('name', "").upper(),
+                                                          nationality="DK", gameId="cs2", socialLinks=[],
+                                                          externalId="42")}
+    actual['constraints'] = client.parse_guess_result(actual)
+    client.guess_results = [actual]
+
+    async def take():
+        task = asyncio.ensure_future(asyncio.sleep(0, result=table))
+        await task
+        return client._take_follow_up(task, guess, 0)
+
+    assert asyncio.run(take()) is secret
+
+
+def test_rejected_guesses_do_not_use_up_max_guesses():
+    """被上游拒绝的猜测不计入max_guesses，只有返回结果的猜测计数"""
+    from app.core.pacing import GuessPacer
+
+    client = BlastTvGameClient("test-room")
+    client.pacer = GuessPacer(initial=0, max_interval=0)
+    sent = []
+    rejections = iter([True, False, True, True, False, False])
+
+    async def next_guess(players_file=None):
+        return {'id': f"p{len(sent)}", 'nickname': f"p{len(sent)}"}
+
+    async def send_guess(player_id):
+        sent.append(player_id)
+        if next(rejections):
+            client.pacer.rejected_by_server("RATE_LIMITED")
+        else:
+            client.guess_results.append(_guess(player_id))
+        client.guessing = False
+        client.guess_result_event.set()
+        return True
+
+    async def no_follow_ups(guess, base_results):
+        return {}
+
+    client.get_next_guess = next_guess
+    client.send_guess = send_guess
+    client._precompute_follow_ups = no_follow_ups
+
+    assert asyncio.run(client.start_auto_guessing(max_guesses=3)) is False
+    assert len(sent) == 6
+    assert len(client.guess_results) == 3
+    assert client.pacer.snapshot()["rejected"] == 3
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.game_service import GameService
+
+
+def test_close_during_connect_fails_waiters_without_cancelling_them(monkeypatch):
+    """连接过程中关闭房间时，等待同一连接的调用方收到房间已关闭的错误"""
+    connecting = asyncio.Event()
+
+    async def slow_create(room_id):
+        connecting.set()
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(GameService, "_create_client", classmethod(lambda cls, room_id: slow_create(room_id)))
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(GameService.get_client("closing-room")) for _ in range(3)]
+        await connecting.wait()
+        assert await GameService.close_client("closing-room") is False
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, HTTPException) and r.status_code == 409 for r in results), results
+    assert "closing-room" not in GameService.pending_clients
+
+
+def test_cancelled_caller_does_not_cancel_shared_connect(monkeypatch):
+    async def create(room_id):
+        await asyncio.sleep(0.01)
+        return room_id
+
+    monkeypatch.setattr(GameService, "_create_client", classmethod(lambda cls, room_id: create(room_id)))
+
+    async def scenario():
+        first = asyncio.ensure_future(GameService.get_client("shared-room"))
+        second = asyncio.ensure_future(GameService.get_client("shared-room"))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "shared-room"
+
+
+def test_custom_constraints_do_not_replace_room_ranking():
+    """按请求指定约束条件的推荐不覆盖房间共用的推荐缓存，浏览器的增量基准版本保持不变"""
+    from app.core.game_client import BlastTvGameClient
+
+    client = BlastTvGameClient("custom-room")
+
+    async def scenario():
+        room = await GameService._rank_recommendations("custom-room", client)
+        custom = await GameService._rank_recommendations("custom-room", client, {'role': {'exact': "awper"}})
+        return room, custom
+
+    try:
+        room, custom = asyncio.run(scenario())
+        assert custom['etag'] != room['etag']
+        assert GameService.recommendation_cache["custom-room"]['etag'] == room['etag']
+        assert all(player['role'] == "awper" for player in custom['players'])
+    finally:
+        GameService.recommendation_cache.pop("custom-room", None)
+        GameService.custom_recommendation_cache.pop("custom-room", None)
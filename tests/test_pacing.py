@@ -0,0 +1,38 @@
+from app.core import pacing
+from app.core.pacing import GuessPacer
+
+
+def test_interval_shrinks_until_rejected_then_backs_off():
+    pacer = GuessPacer(initial=1.0)
+    for _ in range(3):
+        pacer.guess_sent()
+        pacer.result_received()
+    assert pacer.delay() == 0.125
+    assert pacer.accepted == 3
+
+    pacer.rejected_by_server("RATE_LIMITED")
+    assert pacer.rejected == 1
+    assert pacer.floor == 0.125 * pacing.FLOOR_MARGIN
+    assert pacer.delay() == 0.5
+
+    # 成功后不会低于学习到的下限
+    for _ in range(4):
+        pacer.result_received()
+    assert pacer.delay() == pacer.floor
+
+
+def test_floor_decays_after_a_streak():
+    pacer = GuessPacer(initial=1.0)
+    pacer.rejected_by_server("RATE_LIMITED")
+    floor = pacer.floor
+    for _ in range(pacing.FLOOR_DECAY_AFTER):
+        pacer.result_received()
+    assert pacer.floor == floor * pacing.FLOOR_DECAY
+
+
+def test_local_errors_do_not_raise_the_floor():
+    pacer = GuessPacer(initial=0.2)
+    pacer.error("发送失败")
+    assert pacer.floor == pacer.min_interval
+    assert pacer.delay() == 0.5
+    assert pacer.snapshot()["errors"] == 1
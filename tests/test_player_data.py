@@ -0,0 +1,18 @@
+import json
+
+from app.core import player_data
+
+
+def test_manifest_file_is_read_at_call_time(tmp_path, monkeypatch):
+    players_file = tmp_path / "players.json"
+    players_file.write_text(json.dumps([{"id": "a"}]), encoding='utf-8')
+    manifest_file = tmp_path / "manifest.json"
+    manifest_file.write_text(json.dumps({"players_file": "players.json", "version": "v1"}), encoding='utf-8')
+
+    monkeypatch.setattr(player_data, "MANIFEST_FILE", str(manifest_file))
+    assert player_data.load_manifest()["version"] == "v1"
+    assert player_data.resolve_players_file() == str(players_file)
+
+    monkeypatch.setattr(player_data, "MANIFEST_FILE", str(tmp_path / "missing.json"))
+    assert player_data.load_manifest() is None
+    assert player_data.resolve_players_file() == player_data.DEFAULT_PLAYERS_FILE
@@ -0,0 +1,38 @@
+from app.core.player_data import load_players
+from app.core.player_search import SEARCH_FIELDS, PlayerSearchIndex, normalize
+
+
+def _text(player):
+    return " ".join(normalize(player.get(field)) for field in SEARCH_FIELDS)
+
+
+def _brute_force(players, query):
+    """三个字符以上按任意位置包含匹配，更短的查询只匹配词的前缀"""
+    query = normalize(query)
+    if len(query) >= 3:
+        return {player['id'] for player in players if query in _text(player)}
+    return {player['id'] for player in players if any(token.startswith(query) for token in _text(player).split())}
+
+
+def test_search_matches_scan():
+    players = list(load_players())
+    index = PlayerSearchIndex(players)
+    for query in ("s", "ni", "kov", "niko", "KOVAC", "ander", "ola ko", "zzzz"):
+        page, total = index.search(query, limit=len(players))
+        assert total == len(page)
+        assert {player['id'] for player in page} == _brute_force(players, query), query
+
+
+def test_search_ranks_exact_nickname_first_and_pages():
+    players = list(load_players())
+    index = PlayerSearchIndex(players)
+    exact = [player for player in players if normalize(player['nickname']) == "niko"]
+    page, _ = index.search("NIKO")
+    assert {player['id'] for player in page[:len(exact)]} == {player['id'] for player in exact}
+    # 去掉重音符号后匹配
+    assert any(player['lastName'] == "Kovač" for player in index.search("kovac")[0])
+
+    first, _ = index.search("a", limit=5)
+    second, _ = index.search("a", limit=5, offset=5)
+    everything, _ = index.search("a", limit=10)
+    assert first + second == everything
@@ -0,0 +1,18 @@
+from app.core.player_data import load_players
+from app.core.player_snapshot import PLAYER_FIELDS, PlayerSnapshot, encode_snapshot
+
+
+def test_snapshot_round_trip(tmp_path):
+    players = list(load_players())
+    players[0] = dict(players[0], team=None, age=None)
+    path = tmp_path / "players.bin"
+    path.write_bytes(encode_snapshot(players, "v-test"))
+
+    snapshot = PlayerSnapshot(str(path))
+    assert snapshot.version == "v-test"
+    assert len(snapshot) == len(players)
+    # 快照只保存PLAYER_FIELDS中的字段
+    assert [record.to_dict() for record in snapshot] == [
+        {key: value for key, value in player.items() if key in PLAYER_FIELDS} for player in players]
+    assert snapshot[-1]['id'] == players[-1]['id']
+    assert snapshot[0].get('image_url') is None
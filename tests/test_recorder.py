@@ -0,0 +1,45 @@
+import asyncio
+import gzip
+import json
+
+from app.core.game_client import BlastTvGameClient
+from app.core.recorder import TrafficRecorder, read_recording, recorded_connection_id, replay
+from test_game_client import RecordingBroadcaster, _guess
+
+
+def _record(directory, connection_id="conn-1"):
+    recorder = TrafficRecorder("room/1", connection_id, directory=str(directory))
+    recorder.record("out", {"type": "GUESS", "payload": {"playerId": "p1", "connectionId": connection_id}})
+    recorder.record("in", {"players": [{"id": connection_id, "guesses": [_guess("p1")]}]})
+    recorder.close()
+    return recorder.path
+
+
+def test_recording_round_trip(tmp_path):
+    path = _record(tmp_path)
+    entries = list(read_recording(path))
+    assert [entry["dir"] for entry in entries] == ["out", "in"]
+    assert entries[0]["t"] <= entries[1]["t"]
+    assert recorded_connection_id(path) == "conn-1"
+
+
+def test_old_recordings_take_connection_id_from_guess(tmp_path):
+    path = _record(tmp_path, connection_id="conn-2")
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        lines = f.readlines()
+    header = json.loads(lines[0])
+    del header["connection_id"]
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.writelines([json.dumps(header) + "\n"] + lines[1:])
+    assert recorded_connection_id(path) == "conn-2"
+
+
+def test_replay_counts_our_guesses(tmp_path):
+    path = _record(tmp_path)
+    client = BlastTvGameClient("replay")
+    client.broadcaster = RecordingBroadcaster()
+    stats = asyncio.run(replay(path, client, speed=None))
+    assert client.uuid == "conn-1"
+    assert stats["inbound"] == 1 and stats["outbound"] == 1
+    assert stats["guesses"] == 1
+    assert [result['id'] for result in client.guess_results] == ["p1"]
@@ -0,0 +1,50 @@
+from app.core.game_client import BlastTvGameClient
+from app.core.player_data import load_players
+from app.core.solver import _partition, constraint_violations, feedback_to_result, simulate_feedback
+
+
+def _client():
+    return BlastTvGameClient("test-room")
+
+
+def test_partition_matches_parsed_constraints():
+    """每种反馈对应的候选分组与解析该反馈得到的约束筛选出的玩家一致"""
+    client = _client()
+    players = list(load_players())
+    for guess in players[::3]:
+        others = [player for player in players if player['id'] != guess['id']]
+        for feedback, group in _partition(guess, others, client.countries_data).items():
+            constraints = client.parse_guess_result(feedback_to_result(guess, feedback))
+            expected = sorted(player['id'] for player in group)
+            assert sorted(player['id'] for player in client.filter_players(others, constraints)) == expected, \
+                (guess['nickname'], feedback, constraints)
+            assert sorted(player['id'] for player in others
+                          if constraint_violations(player, constraints, client.countries_data) == 0) == expected
+
+
+def test_team_constraints_use_team_id():
+    """上游结果中的队伍数据带有数据集中没有的字段，按队伍ID比较"""
+    client = _client()
+    players = list(load_players())
+    guess = next(player for player in players if isinstance(player.get('team'), dict))
+    upstream_team = dict(guess['team'], nationality="DK", gameId="cs2", socialLinks=[], externalId="42")
+
+    result = feedback_to_result(guess, simulate_feedback(guess, guess, client.countries_data))
+    result['team'] = {'data': upstream_team, 'result': "CORRECT"}
+    constraints = client.parse_guess_result(result)
+    assert constraints['team']['exact'] == guess['team']['id']
+    teammates = client.filter_players(players, {'team': constraints['team']})
+    assert guess in teammates
+    assert all(player['team']['id'] == guess['team']['id'] for player in teammates)
+
+    result['team']['result'] = "INCORRECT"
+    others = client.filter_players(players, client.parse_guess_result(result))
+    assert all((player.get('team') or {}).get('id') != guess['team']['id'] for player in others)
+
+
+def test_exclusions_merge_into_list():
+    client = _client()
+    merged = client.merge_constraints({'team': {'exclude': "a"}, 'nationality': {'exact': "DK"}},
+                                      {'team': {'exclude': "b"}, 'nationality': {'exclude': "SE"}})
+    assert sorted(merged['team']['exclude_list']) == ["a", "b"]
+    assert merged['nationality'] == {'exact': "DK"}